@@ -1,41 +1,115 @@
+"""Application factory.
+
+``create_app`` only configures the app: it opens no database connection,
+creates no tables and does not load ReportLab, which is imported on the
+first render. Create or upgrade the schema with ``flask --app main
+db-upgrade`` before starting the server.
+"""
 import os
 import logging
 from flask import Flask
-from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy.orm import DeclarativeBase
 from werkzeug.middleware.proxy_fix import ProxyFix
+import commands
+import db_profile
+import http_cache
+import metrics
+import routes
+from extensions import db
+from settings_cache import settings_cache
+from utils import document_number_allocator
+
+
+def create_app(config=None):
+    """Build the app from the environment; ``config`` overrides any setting"""
+    logging.basicConfig(level=os.environ.get("LOG_LEVEL", "DEBUG").upper())
+
+    # Create the app
+    app = Flask(__name__)
+    app.secret_key = os.environ.get("SESSION_SECRET", "dev-secret-key-change-in-production")
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)
+
+    # Configure the database
+    database_url = os.environ.get("DATABASE_URL", "sqlite:///business_docs.db")
+    if database_url.startswith("postgres://"):
+        database_url = database_url.replace("postgres://", "postgresql://", 1)
+
+    app.config["SQLALCHEMY_DATABASE_URI"] = database_url
+
+    # Pooling, timeouts and SQLite pragmas (see db_profile.py)
+    db_profile.load_config(app.config)
+
+    # BusinessSettings cache: writers touch the stamp file to invalidate every worker
+    app.config["SETTINGS_STAMP_PATH"] = os.environ.get("SETTINGS_STAMP_PATH", os.path.join(app.instance_path, "settings.stamp"))
+    app.config["SETTINGS_CACHE_TTL"] = int(os.environ.get("SETTINGS_CACHE_TTL", 60))
+
+    # Document numbers are reserved from the shared counter this many at a time per process
+    app.config["DOCUMENT_NUMBER_BLOCK_SIZE"] = int(os.environ.get("DOCUMENT_NUMBER_BLOCK_SIZE", 20))
+
+    # Bulk document creation: request size limit and rows per transaction
+    app.config["BULK_MAX_DOCUMENTS"] = int(os.environ.get("BULK_MAX_DOCUMENTS", 5000))
+    app.config["BULK_CHUNK_SIZE"] = int(os.environ.get("BULK_CHUNK_SIZE", 500))
+    app.config["IMPORT_CHUNK_SIZE"] = int(os.environ.get("IMPORT_CHUNK_SIZE", 1000))
+
+    # Response compression (brotli if installed, else gzip) and static asset caching
+    app.config["COMPRESS_MIN_SIZE"] = int(os.environ.get("COMPRESS_MIN_SIZE", 1024))
+    app.config["COMPRESS_LEVEL"] = int(os.environ.get("COMPRESS_LEVEL", 6))
+    app.config["STATIC_MAX_AGE"] = int(os.environ.get("STATIC_MAX_AGE", 365 * 24 * 3600))
+
+    # Requests slower than this are logged with their SQL totals (0 disables)
+    app.config["SLOW_REQUEST_MS"] = int(os.environ.get("SLOW_REQUEST_MS", 1000))
+
+    # Page size limits for paginated list APIs
+    app.config["API_PAGE_SIZE"] = int(os.environ.get("API_PAGE_SIZE", 50))
+    app.config["API_MAX_PAGE_SIZE"] = int(os.environ.get("API_MAX_PAGE_SIZE", 200))
+
+    # Results per page of /api/documents/search
+    app.config["SEARCH_PAGE_SIZE"] = int(os.environ.get("SEARCH_PAGE_SIZE", 20))
+    app.config["SEARCH_MAX_PAGE_SIZE"] = int(os.environ.get("SEARCH_MAX_PAGE_SIZE", 100))
+    # Matches scored per search (the newest ones; older matches follow unranked); bounds the cost of very common terms
+    app.config["SEARCH_MAX_CANDIDATES"] = int(os.environ.get("SEARCH_MAX_CANDIDATES", 10000))
 
-# Configure logging
-logging.basicConfig(level=logging.DEBUG)
+    # /api/sync: change log entries per page, and records per upload
+    app.config["SYNC_PAGE_SIZE"] = int(os.environ.get("SYNC_PAGE_SIZE", 500))
+    app.config["SYNC_MAX_PAGE_SIZE"] = int(os.environ.get("SYNC_MAX_PAGE_SIZE", 5000))
+    app.config["SYNC_MAX_UPLOAD"] = int(os.environ.get("SYNC_MAX_UPLOAD", 1000))
 
-class Base(DeclarativeBase):
-    pass
+    # PDF rendering: a process pool with a bounded queue (0 workers renders inline)
+    app.config["PDF_OUTPUT_DIR"] = os.environ.get("PDF_OUTPUT_DIR", os.path.join(os.getcwd(), "temp_pdfs"))
+    app.config["PDF_RENDER_WORKERS"] = int(os.environ.get("PDF_RENDER_WORKERS", os.cpu_count() or 1))
+    app.config["PDF_RENDER_QUEUE_SIZE"] = int(os.environ.get("PDF_RENDER_QUEUE_SIZE", 16))
+    app.config["PDF_RENDER_TIMEOUT"] = float(os.environ.get("PDF_RENDER_TIMEOUT", 60))
+    app.config["PDF_RENDER_RETRY_AFTER"] = int(os.environ.get("PDF_RENDER_RETRY_AFTER", 5))
+    app.config["PDF_BATCH_MAX_DOCUMENTS"] = int(os.environ.get("PDF_BATCH_MAX_DOCUMENTS", 1000))
+    # Documents with at least this many line items use the paged large-document layout
+    app.config["PDF_LARGE_DOCUMENT_ITEMS"] = int(os.environ.get("PDF_LARGE_DOCUMENT_ITEMS", 500))
+    # Repeat the letterhead at the top of every page (requests may override per document)
+    app.config["PDF_LETTERHEAD_EVERY_PAGE"] = os.environ.get("PDF_LETTERHEAD_EVERY_PAGE", "").lower() in ("1", "true", "yes")
 
-db = SQLAlchemy(model_class=Base)
+    # Generated PDF retention (0 disables a limit) and delivery
+    app.config["PDF_RETENTION_MAX_BYTES"] = int(os.environ.get("PDF_RETENTION_MAX_BYTES", 512 * 1024 * 1024))
+    app.config["PDF_RETENTION_MAX_AGE"] = int(os.environ.get("PDF_RETENTION_MAX_AGE", 7 * 24 * 3600))
+    app.config["PDF_RETENTION_INTERVAL"] = int(os.environ.get("PDF_RETENTION_INTERVAL", 300))
+    app.config["USE_X_SENDFILE"] = os.environ.get("USE_X_SENDFILE", "").lower() in ("1", "true", "yes")
 
-# Create the app
-app = Flask(__name__)
-app.secret_key = os.environ.get("SESSION_SECRET", "dev-secret-key-change-in-production")
-app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)
+    # Logo/signature image cache shared by all renders in this process
+    app.config["IMAGE_CACHE_MAX_BYTES"] = int(os.environ.get("IMAGE_CACHE_MAX_BYTES", 32 * 1024 * 1024))
+    app.config["IMAGE_CACHE_FRESH_FOR"] = int(os.environ.get("IMAGE_CACHE_FRESH_FOR", 300))
 
-# Configure the database
-database_url = os.environ.get("DATABASE_URL", "sqlite:///business_docs.db")
-if database_url.startswith("postgres://"):
-    database_url = database_url.replace("postgres://", "postgresql://", 1)
+    if config:
+        app.config.update(config)
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = db_profile.engine_options(app.config["SQLALCHEMY_DATABASE_URI"], app.config)
 
-app.config["SQLALCHEMY_DATABASE_URI"] = database_url
-app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
-    "pool_recycle": 300,
-    "pool_pre_ping": True,
-}
+    # Initialize the app with the extension
+    db.init_app(app)
 
-# Initialize the app with the extension
-db.init_app(app)
+    with app.app_context():
+        # Before anything opens a connection
+        db_profile.install(db.engine, app.config)
+        metrics.init_app(app, db.engine)
 
-with app.app_context():
-    # Import models and routes
-    import models  # noqa: F401
-    import routes  # noqa: F401
-    
-    # Create all tables
-    db.create_all()
+    http_cache.init_app(app)
+    routes.init_app(app)
+    commands.init_app(app)
+    settings_cache.init_app(app)
+    document_number_allocator.init_app(app)
+    return app
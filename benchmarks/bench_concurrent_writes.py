@@ -0,0 +1,125 @@
+"""Concurrent write benchmark for the database profiles.
+
+Runs the same workload against a fresh SQLite database once per
+DB_PROFILE: several processes (standing in for gunicorn workers), each
+with a few threads creating documents through POST /api/documents while
+other threads list documents. Reports throughput, latency percentiles and
+how many requests failed (typically "database is locked").
+
+    python benchmarks/bench_concurrent_writes.py --processes 4 --threads 4 --writes 200
+"""
+import argparse
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import get_context
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def _configure(environ):
+    os.environ.update(environ)
+    # Keep the app's DEBUG logging out of the timings
+    logging.disable(logging.INFO)
+
+
+def _prepare(environ):
+    """Create the schema and one client; runs in its own process"""
+    _configure(environ)
+    from main import app
+    app.test_cli_runner().invoke(args=['db-upgrade'])
+    response = app.test_client().post('/api/clients', json={'name': 'Benchmark client'})
+    return response.get_json()['client']['id']
+
+
+def _worker(args):
+    writes, threads, client_id = args
+    from main import app
+
+    def write(i):
+        client = app.test_client()
+        started = time.perf_counter()
+        response = client.post('/api/documents', json={
+            'document_type': 'invoice',
+            'client_id': client_id,
+            'issue_date': '2026-01-01',
+            'status': 'sent',
+            'items': [{'description': 'Widget', 'quantity': 1, 'unit_price': 10}]
+        })
+        return 'write', response.status_code, time.perf_counter() - started
+
+    def read(i):
+        client = app.test_client()
+        started = time.perf_counter()
+        response = client.get('/api/documents?limit=50&include=client')
+        return 'read', response.status_code, time.perf_counter() - started
+
+    # One reader per process alongside the writers
+    jobs = [(write, i) for i in range(writes)] + [(read, i) for i in range(writes // 4)]
+    with ThreadPoolExecutor(threads + 1) as pool:
+        return list(pool.map(lambda job: job[0](job[1]), jobs))
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    return statistics.quantiles(values, n=100, method='inclusive')[q - 1] if len(values) > 1 else values[0]
+
+
+def run(profile, args):
+    directory = tempfile.mkdtemp(prefix=f"bench-{profile}-")
+    environ = {
+        'DB_PROFILE': profile,
+        'DATABASE_URL': f"sqlite:///{os.path.join(directory, 'bench.db')}",
+        'SETTINGS_STAMP_PATH': os.path.join(directory, 'settings.stamp'),
+        'PDF_OUTPUT_DIR': os.path.join(directory, 'pdfs'),
+        'PDF_RENDER_WORKERS': '0',
+    }
+    context = get_context('spawn')
+    with ProcessPoolExecutor(1, mp_context=context) as pool:
+        client_id = pool.submit(_prepare, environ).result()
+
+    started = time.perf_counter()
+    with ProcessPoolExecutor(args.processes, mp_context=context, initializer=_configure, initargs=(environ,)) as pool:
+        results = [r for batch in pool.map(_worker, [(args.writes, args.threads, client_id)] * args.processes) for r in batch]
+    elapsed = time.perf_counter() - started
+
+    summary = {'profile': profile, 'seconds': round(elapsed, 2)}
+    for kind in ('write', 'read'):
+        latencies = [latency * 1000 for k, status, latency in results if k == kind and status == 200]
+        failed = sum(1 for k, status, _ in results if k == kind and status != 200)
+        summary[kind] = {
+            'ok': len(latencies),
+            'failed': failed,
+            'per_second': round(len(latencies) / elapsed, 1),
+            'p50_ms': round(percentile(latencies, 50), 1),
+            'p95_ms': round(percentile(latencies, 95), 1),
+            'p99_ms': round(percentile(latencies, 99), 1),
+        }
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--processes', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--writes', type=int, default=200, help='documents created per process')
+    parser.add_argument('--profiles', default='baseline,tuned')
+    args = parser.parse_args()
+
+    for profile in args.profiles.split(','):
+        summary = run(profile, args)
+        print(f"{summary['profile']}: {summary['seconds']}s")
+        for kind in ('write', 'read'):
+            stats = summary[kind]
+            print(f"  {kind:5} ok={stats['ok']} failed={stats['failed']} {stats['per_second']}/s "
+                  f"p50={stats['p50_ms']}ms p95={stats['p95_ms']}ms p99={stats['p99_ms']}ms")
+
+
+if __name__ == '__main__':
+    main()
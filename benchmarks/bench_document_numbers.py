@@ -0,0 +1,80 @@
+"""Concurrency check for the document number allocator.
+
+Creates documents in parallel from several processes (each with several
+threads) through POST /api/documents against one database, then verifies
+that every request succeeded and every stored number is unique. It runs
+against a throwaway SQLite database unless DATABASE_URL names one (use a
+PostgreSQL database to exercise its sequence path).
+
+    python benchmarks/bench_document_numbers.py --documents 2000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def create_documents(args):
+    count, threads, client_id = args
+    from main import app
+
+    def create(i):
+        client = app.test_client()
+        response = client.post('/api/documents', json={
+            'document_type': ('invoice', 'quote', 'receipt')[i % 3],
+            'client_id': client_id,
+            'issue_date': '2026-01-01',
+            'items': [{'description': 'Widget', 'quantity': 1, 'unit_price': 10}]
+        })
+        return response.status_code
+
+    with ThreadPoolExecutor(threads) as pool:
+        return list(pool.map(create, range(count)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--documents', type=int, default=2000)
+    parser.add_argument('--processes', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=8)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix='bench-numbers-') as directory:
+        # Worker processes inherit the environment, so they share this database
+        os.environ.setdefault('DATABASE_URL', f"sqlite:///{os.path.join(directory, 'bench.db')}")
+        os.environ.setdefault('SETTINGS_STAMP_PATH', os.path.join(directory, 'settings.stamp'))
+        os.environ.setdefault('PDF_OUTPUT_DIR', os.path.join(directory, 'pdfs'))
+        from main import app
+        from extensions import db
+        from models import Client, Document
+        app.test_cli_runner().invoke(args=['db-upgrade'])
+        with app.app_context():
+            client = Client(name='Allocator Benchmark')
+            db.session.add(client)
+            db.session.commit()
+            client_id = client.id
+            before = Document.query.count()
+
+        per_process = args.documents // args.processes
+        started = time.perf_counter()
+        with ProcessPoolExecutor(args.processes) as pool:
+            statuses = [s for chunk in pool.map(create_documents, [(per_process, args.threads, client_id)] * args.processes) for s in chunk]
+        elapsed = time.perf_counter() - started
+
+        with app.app_context():
+            numbers = [n for (n,) in db.session.query(Document.document_number)]
+
+        failures = [s for s in statuses if s != 200]
+        print(f"created {len(statuses) - len(failures)}/{len(statuses)} documents in {elapsed:.2f}s "
+              f"({len(statuses) / elapsed:.0f}/s), {len(failures)} failures")
+        print(f"{len(numbers) - before} new rows, {len(numbers) - len(set(numbers))} duplicate numbers")
+        if failures or len(numbers) != len(set(numbers)) or len(numbers) - before != len(statuses):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+"""Latency of /api/documents/search on a large generated dataset.
+
+Fills an empty database with --documents documents of --items line items
+each (descriptions drawn from a Zipf-distributed vocabulary, so some terms
+match most documents and some almost none), rebuilds the search index, then
+times each query through the endpoint and fails if a median exceeds
+--max-ms. Before timing it checks that matches beyond the scoring cap
+(SEARCH_MAX_CANDIDATES) are still returned: a status filter whose matches
+are all older than the cap, and every page of a query matching more.
+
+The data goes into a throwaway SQLite database unless DATABASE_URL names
+one; a named database that already holds documents is reused as is.
+
+    python benchmarks/bench_document_search.py --documents 100000 --items 20
+    DATABASE_URL=sqlite:////tmp/search.db python benchmarks/bench_document_search.py --documents 100000 --items 20
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+VOCABULARY_SIZE = 5000
+BATCH_SIZE = 20000
+# Every PAID_EVERY-th document is paid, the rest sent
+PAID_EVERY = 1000
+
+
+def words(rng, count):
+    # Zipf-like: word i is drawn with weight 1 / (i + 1)
+    return [f"w{min(int(rng.paretovariate(1.0)) - 1, VOCABULARY_SIZE - 1)}" for _ in range(count)]
+
+
+def populate(documents, items, seed):
+    from sqlalchemy import insert
+    from extensions import db
+    from models import Client, Document, DocumentItem
+
+    rng = random.Random(seed)
+    clients = db.session.execute(insert(Client).returning(Client.id), [
+        {'name': f"Client {i} {' '.join(words(rng, 1))}", 'company': f"Company {i}", 'email': '', 'phone': '', 'address': ''}
+        for i in range(max(documents // 50, 1))
+    ]).scalars().all()
+
+    start = date(2020, 1, 1)
+    for offset in range(0, documents, BATCH_SIZE // items or 1):
+        batch = range(offset, min(offset + (BATCH_SIZE // items or 1), documents))
+        ids = db.session.execute(insert(Document).returning(Document.id, sort_by_parameter_order=True), [
+            {'document_type': 'invoice', 'document_number': f"INV-{i:08d}", 'client_id': rng.choice(clients),
+             'issue_date': start + timedelta(days=i % 2000), 'status': 'paid' if i % PAID_EVERY == 0 else 'sent',
+             'notes': ' '.join(words(rng, 4)), 'subtotal': 0, 'tax_amount': 0, 'total_amount': 0}
+            for i in batch
+        ]).scalars().all()
+        db.session.execute(insert(DocumentItem), [
+            {'document_id': document_id, 'description': ' '.join(words(rng, rng.randint(2, 5))),
+             'quantity': 1, 'unit_price': 1, 'total_price': 1, 'order_index': position}
+            for document_id in ids for position in range(items)
+        ])
+        db.session.commit()
+
+
+def search_ids(client, **params):
+    """Ids of every page of a search"""
+    ids, cursor = [], None
+    while True:
+        response = client.get('/api/documents/search', query_string=dict(params, fields='id', **({'cursor': cursor} if cursor else {})))
+        assert response.status_code == 200, response.get_data(as_text=True)
+        ids.extend(document['id'] for document in response.json['documents'])
+        cursor = response.json['next_cursor']
+        if cursor is None:
+            return ids
+
+
+def check_beyond_cap(app, client, documents):
+    """Fail unless capping the scored candidates leaves older matches reachable"""
+    from extensions import db
+    from models import Document
+
+    with app.app_context():
+        paid = set(db.session.execute(db.select(Document.id).where(Document.status == 'paid')).scalars())
+    cap = app.config['SEARCH_MAX_CANDIDATES']
+    # Every document matches 'Client'; the paid ones are spread over the whole table
+    app.config['SEARCH_MAX_CANDIDATES'] = 5
+    try:
+        found = search_ids(client, q='Client', status='paid', limit=100)
+        assert sorted(found) == sorted(paid), f"status filter found {len(found)} of {len(paid)} paid documents"
+        found = search_ids(client, q='w100', limit=100)
+        app.config['SEARCH_MAX_CANDIDATES'] = documents
+        expected = search_ids(client, q='w100', limit=100)
+        assert len(expected) > 5 and sorted(found) == sorted(expected), \
+            f"pages beyond the cap found {len(found)} of {len(expected)} matches"
+    finally:
+        app.config['SEARCH_MAX_CANDIDATES'] = cap
+    print(f"beyond the cap: {len(paid)} paid documents and {len(expected)} 'w100' matches all reachable")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--documents', type=int, default=100000)
+    parser.add_argument('--items', type=int, default=20, help='line items per document')
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--limit', type=int, default=20)
+    parser.add_argument('--max-ms', type=float, default=50)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix='bench-search-') as directory:
+        os.environ.setdefault('DATABASE_URL', f"sqlite:///{os.path.join(directory, 'bench.db')}")
+        os.environ.setdefault('SETTINGS_STAMP_PATH', os.path.join(directory, 'settings.stamp'))
+        os.environ.setdefault('PDF_OUTPUT_DIR', os.path.join(directory, 'pdfs'))
+        from main import app
+        from extensions import db
+        from models import Document
+        from document_search import rebuild_document_search
+        app.test_cli_runner().invoke(args=['db-upgrade'])
+
+        with app.app_context():
+            if db.session.query(Document.id).first() is None:
+                started = time.perf_counter()
+                populate(args.documents, args.items, args.seed)
+                print(f"populated {args.documents} documents / {args.documents * args.items} items "
+                      f"in {time.perf_counter() - started:.1f}s")
+            started = time.perf_counter()
+            with db.engine.begin() as conn:
+                rebuild_document_search(conn)
+            print(f"rebuilt search index in {time.perf_counter() - started:.1f}s")
+
+        queries = {
+            'common term': 'w0',
+            'mid-frequency term': 'w40',
+            'rare term': 'w300',
+            'two common terms': 'w1 w2',
+            'prefix': 'w12',
+            'document number': f"INV-{args.documents // 2:08d}",
+            'client name': 'Client 7',
+            'no match': 'zzzz',
+        }
+        client = app.test_client()
+        check_beyond_cap(app, client, args.documents)
+        failed = False
+        print(f"{'query':<20} {'p50 ms':>8} {'p95 ms':>8} {'results':>8}")
+        for name, q in queries.items():
+            timings = []
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                response = client.get('/api/documents/search', query_string={'q': q, 'limit': args.limit, 'fields': 'id,document_number'})
+                timings.append((time.perf_counter() - started) * 1000)
+                assert response.status_code == 200, response.get_data(as_text=True)
+            timings.sort()
+            p50 = statistics.median(timings)
+            p95 = timings[int(len(timings) * 0.95) - 1]
+            print(f"{name:<20} {p50:>8.1f} {p95:>8.1f} {len(response.json['documents']):>8}", flush=True)
+            failed = failed or p50 > args.max_ms
+        sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""Render time, size and peak memory of PDFs with many line items.
+
+Each (items, mode) pair renders in a fresh process so peak RSS is measured
+per render. "standard" is the single-table layout, "large" the paged
+layout used for large documents (pdf_renderer.ItemRows). The standard
+layout gets slow quickly, so it is skipped above --standard-max items.
+
+    python benchmarks/bench_large_documents.py --items 100,1000,10000,50000
+"""
+import argparse
+import os
+import re
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def make_spec(items, large):
+    return {
+        'business_name': 'Benchmark Ltd', 'business_email': 'bench@example.com',
+        'business_address': '1 Bench Street', 'document_type': 'invoice',
+        'document_number': f"LARGE-{items}", 'issue_date': '2026-01-01', 'due_date': '2026-01-31',
+        'client': {'name': 'Client 1', 'company': 'Company 1'},
+        'items': [{'description': f"Line item {i}" + ("\nwith a second line" if i % 10 == 0 else ''),
+                   'quantity': i % 7 + 1, 'unit_price': 9.99} for i in range(items)],
+        'totals': {'tax_amount': 0, 'tax_rate': 0},
+        'large_document': large,
+    }
+
+
+def render(items, large):
+    """Runs in a child process; returns seconds, pages, bytes and peak RSS in MB"""
+    from pdf_renderer import render_pdf
+    from pdf_templates import preload_templates
+    preload_templates()
+    spec = make_spec(items, large)
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    started = time.perf_counter()
+    pdf = render_pdf(spec)
+    elapsed = time.perf_counter() - started
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {
+        'seconds': elapsed,
+        'pages': len(re.findall(rb'/Type /Page\b', pdf)),
+        'bytes': len(pdf),
+        'peak_rss_mb': peak / 1024,
+        'render_rss_mb': (peak - baseline) / 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--items', default='100,1000,10000,50000',
+                        type=lambda value: [int(count) for count in value.split(',')])
+    parser.add_argument('--standard-max', type=int, default=10000,
+                        help='largest item count rendered with the standard layout')
+    args = parser.parse_args()
+
+    print(f"{'items':>7} {'mode':<9} {'seconds':>8} {'pages':>6} {'KB':>8} {'peak MB':>8} {'render MB':>9}")
+    for items in args.items:
+        for mode in ('standard', 'large'):
+            if mode == 'standard' and items > args.standard_max:
+                continue
+            with ProcessPoolExecutor(1, mp_context=get_context('spawn')) as pool:
+                result = pool.submit(render, items, mode == 'large').result()
+            print(f"{items:>7} {mode:<9} {result['seconds']:>8.2f} {result['pages']:>6} "
+                  f"{result['bytes'] / 1024:>8.0f} {result['peak_rss_mb']:>8.1f} {result['render_rss_mb']:>9.1f}",
+                  flush=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,41 @@
+"""Microbenchmark: per-render style setup cost before and after the template registry.
+
+"before" builds the classic template from scratch (stylesheet, paragraph
+styles and table styles, as api_generate_pdf used to on every request);
+"after" looks the prebuilt template up in the registry.
+
+    python benchmarks/bench_pdf_setup.py [--number 2000]
+"""
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pdf_templates import get_template, build_classic
+
+
+def per_render_setup():
+    """Style setup as it ran inline for every PDF"""
+    build_classic('classic', 0)
+
+
+def registry_lookup():
+    get_template('classic')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--number', type=int, default=2000)
+    args = parser.parse_args()
+
+    get_template('classic')  # first build happens once per process
+
+    for label, func in (('before (per render)', per_render_setup), ('after (registry)', registry_lookup)):
+        seconds = min(timeit.repeat(func, number=args.number, repeat=3))
+        print(f"{label:<22} {seconds / args.number * 1e6:10.2f} us/render")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""Query budget check for the document and client endpoints.
+
+Seeds a database with documents spread over several clients, then calls
+each endpoint through the test client and counts the SQL statements it
+runs. Exits non-zero if any endpoint exceeds its budget, so an N+1
+regression (one query per listed row) fails loudly. It runs against a
+throwaway SQLite database unless DATABASE_URL names one.
+
+    python benchmarks/bench_query_counts.py --documents 500
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Endpoint -> maximum number of SQL statements per request
+BUDGETS = {
+    '/api/documents?limit={limit}': 1,
+    '/api/documents?limit={limit}&include=client': 1,
+    '/api/documents?limit={limit}&include=client,items': 2,
+    '/api/documents?limit={limit}&include=items&fields=id,document_number,total_amount': 2,
+    '/api/documents/{document_id}': 1,
+    '/api/clients?limit={limit}': 1,
+}
+
+
+def seed(app, documents, items):
+    client = app.test_client()
+    client_ids = [
+        client.post('/api/clients', json={'name': f"Client {i}", 'company': f"Company {i}"}).get_json()['client']['id']
+        for i in range(20)
+    ]
+    payload = [{
+        'document_type': 'invoice',
+        'client_id': client_ids[i % len(client_ids)],
+        'issue_date': f"2026-{i % 12 + 1:02d}-01",
+        'items': [{'description': f"Item {j}", 'quantity': 1, 'unit_price': 10} for j in range(items)]
+    } for i in range(documents)]
+    response = client.post('/api/documents/bulk', json={'documents': payload}).get_json()
+    return response['results'][0]['id']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--documents', type=int, default=500)
+    parser.add_argument('--items', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix='bench-queries-') as directory:
+        os.environ.setdefault('DATABASE_URL', f"sqlite:///{os.path.join(directory, 'bench.db')}")
+        os.environ.setdefault('SETTINGS_STAMP_PATH', os.path.join(directory, 'settings.stamp'))
+        os.environ.setdefault('PDF_OUTPUT_DIR', os.path.join(directory, 'pdfs'))
+        # Let one page hold every seeded document
+        os.environ.setdefault('API_MAX_PAGE_SIZE', str(args.documents))
+        from main import app
+        from extensions import db
+        from query_counter import count_queries
+        app.test_cli_runner().invoke(args=['db-upgrade'])
+
+        with app.app_context():
+            document_id = seed(app, args.documents, args.items)
+            engine = db.engine
+
+        client = app.test_client()
+        failed = False
+        for template, budget in BUDGETS.items():
+            url = template.format(limit=args.documents, document_id=document_id)
+            # Warm up once so the settings cache and similar one-off loads are not counted
+            client.get(url)
+            started = time.perf_counter()
+            with count_queries(engine) as counter:
+                response = client.get(url)
+            elapsed = (time.perf_counter() - started) * 1000
+
+            ok = response.status_code == 200 and counter.count <= budget
+            failed = failed or not ok
+            print(f"[{'ok' if ok else 'FAIL'}] {url}: {counter.count} queries (budget {budget}), {elapsed:.1f} ms")
+            if not ok:
+                for statement in counter.statements:
+                    print(f"    {statement.splitlines()[0]}")
+
+        sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
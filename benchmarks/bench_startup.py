@@ -0,0 +1,87 @@
+"""Cold-start benchmark: how long ``import main`` (building the app) takes.
+
+Each run is a fresh interpreter started with ``python -X importtime``. The
+script reports the median wall time, the slowest packages by cumulative
+import time from the last run, and fails if a module that should load lazily (the PDF
+stack, ``requests``) was imported at startup or if the median exceeds
+--max-ms.
+
+    python benchmarks/bench_startup.py --runs 10 --top 15 --max-ms 1500
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Only needed once something renders a PDF or fetches a remote image
+LAZY_MODULES = ('reportlab', 'requests', 'pdf_renderer', 'pyarrow')
+
+IMPORTTIME_LINE = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+PROBE = (
+    "import sys, main; "
+    f"print(','.join(m for m in {LAZY_MODULES!r} if m in sys.modules))"
+)
+
+
+def run_once(environ):
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', PROBE], cwd=ROOT, env=environ,
+                            capture_output=True, text=True, check=True)
+    elapsed = (time.perf_counter() - started) * 1000
+
+    imports = []
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            own, cumulative, indent, name = match.groups()
+            imports.append((name, int(own) / 1000, int(cumulative) / 1000, len(indent) // 2))
+    loaded = [name for name in result.stdout.strip().split(',') if name]
+    return elapsed, imports, loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--top', type=int, default=15, help='slowest imports to list')
+    parser.add_argument('--max-ms', type=float, help='fail if the median startup is slower')
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix='bench-startup-')
+    environ = dict(os.environ, LOG_LEVEL='WARNING',
+                   DATABASE_URL=f"sqlite:///{os.path.join(directory, 'bench.db')}",
+                   SETTINGS_STAMP_PATH=os.path.join(directory, 'settings.stamp'),
+                   PDF_OUTPUT_DIR=os.path.join(directory, 'pdfs'))
+
+    timings = []
+    for _ in range(args.runs):
+        elapsed, imports, loaded = run_once(environ)
+        timings.append(elapsed)
+
+    total = next((cumulative for name, _, cumulative, depth in imports if name == 'main' and depth == 0), 0.0)
+    print(f"startup: median {statistics.median(timings):.0f} ms, min {min(timings):.0f} ms, "
+          f"max {max(timings):.0f} ms over {args.runs} runs (import main: {total:.0f} ms)")
+    print("slowest packages (cumulative ms, own ms; last run):")
+    packages = sorted((entry for entry in imports if '.' not in entry[0] and entry[0] not in ('main', 'app')),
+                      key=lambda entry: -entry[2])
+    for name, own, cumulative, _ in packages[:args.top]:
+        print(f"  {cumulative:8.1f} {own:8.1f}  {name}")
+
+    failed = False
+    if loaded:
+        print(f"FAIL: imported at startup: {', '.join(loaded)}")
+        failed = True
+    if args.max_ms and statistics.median(timings) > args.max_ms:
+        print(f"FAIL: median startup above {args.max_ms:.0f} ms")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
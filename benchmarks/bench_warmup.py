@@ -0,0 +1,87 @@
+"""First-PDF latency of a fresh process, with and without warmup.warm_up.
+
+Each run starts a new interpreter (like a new gunicorn worker), optionally
+warms it up, then times the first POST /api/generate-pdf against the median
+of the following ones. Renders use distinct document numbers so the render
+cache never answers. The database (unless DATABASE_URL names one) and the
+rendered PDFs live in a temporary directory removed afterwards.
+
+    python benchmarks/bench_warmup.py --runs 3 --render-workers 0,1
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def first_renders(environ, warm, render_workers, renders):
+    """Runs in a fresh process; returns (warm-up seconds, list of render seconds)"""
+    os.environ.update(environ, PDF_RENDER_WORKERS=str(render_workers))
+    from main import app
+    from warmup import warm_up
+
+    warm_seconds = 0.0
+    if warm:
+        started = time.perf_counter()
+        warm_up(app)
+        warm_seconds = time.perf_counter() - started
+
+    client = app.test_client()
+    timings = []
+    for _ in range(renders):
+        started = time.perf_counter()
+        response = client.post('/api/generate-pdf', json={
+            'document_type': 'invoice', 'document_number': f"WARM-{uuid.uuid4().hex[:12]}",
+            'client': {'name': 'Client'}, 'issue_date': '2026-01-01',
+            'items': [{'description': 'Widget', 'quantity': 2, 'unit_price': 10}],
+            'totals': {'subtotal': 20, 'tax_amount': 0, 'total': 20},
+        })
+        timings.append(time.perf_counter() - started)
+        assert response.status_code == 200, response.get_data(as_text=True)
+    app.extensions['render_pool'].shutdown()
+    return warm_seconds, timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--renders', type=int, default=6, help='renders per process')
+    parser.add_argument('--render-workers', default='0,1',
+                        type=lambda value: [int(count) for count in value.split(',')])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix='bench-warmup-') as directory:
+        # Set here and in every spawned child, before it imports main
+        environ = {
+            'DATABASE_URL': os.environ.get('DATABASE_URL', f"sqlite:///{os.path.join(directory, 'bench.db')}"),
+            'SETTINGS_STAMP_PATH': os.path.join(directory, 'settings.stamp'),
+            'PDF_OUTPUT_DIR': os.path.join(directory, 'pdfs'),
+        }
+        os.environ.update(environ)
+        from main import app
+        app.test_cli_runner().invoke(args=['db-upgrade'])
+
+        print(f"{'pool':>4} {'mode':<6} {'warm-up ms':>10} {'first ms':>9} {'steady ms':>10} {'ratio':>6}")
+        for render_workers in args.render_workers:
+            for warm in (False, True):
+                warm_ups, firsts, steadies = [], [], []
+                for _ in range(args.runs):
+                    with ProcessPoolExecutor(1, mp_context=get_context('spawn')) as pool:
+                        warm_seconds, timings = pool.submit(first_renders, environ, warm, render_workers, args.renders).result()
+                    warm_ups.append(warm_seconds)
+                    firsts.append(timings[0])
+                    steadies.append(statistics.median(timings[1:]))
+                first, steady = statistics.median(firsts), statistics.median(steadies)
+                print(f"{render_workers:>4} {'warm' if warm else 'cold':<6} {statistics.median(warm_ups) * 1000:>10.0f} "
+                      f"{first * 1000:>9.0f} {steady * 1000:>10.0f} {first / steady:>6.1f}", flush=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,271 @@
+"""Endpoint benchmark suite with regression thresholds.
+
+For each scale (number of seeded documents) a fresh SQLite database is
+built in a child process, which then drives the Flask test client through
+the main endpoints and records per-scenario latency percentiles,
+throughput and the process's peak RSS. Results are written as JSON.
+
+    python benchmarks/run.py --scales 100,10000 --output bench.json
+    python benchmarks/run.py --scales 100,10000 --compare bench.json --threshold 0.2
+    python benchmarks/run.py --compare bench.json --current other.json
+
+With --compare, a scenario regresses when its p95 latency grows, or its
+throughput drops, by more than the threshold; the exit status is 1 if any
+scenario regressed. Seeding 1,000,000 documents (--scales 1000000) takes a
+few minutes and a few GB of disk.
+"""
+import argparse
+import io
+import itertools
+import json
+import logging
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import date, timedelta
+from multiprocessing import get_context
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+CLIENTS_PER_SCALE = 0.1
+ITEMS_PER_DOCUMENT = 3
+SEED_CHUNK = 10000
+
+
+def seed(db, documents):
+    """Insert clients, documents and items directly, in large executemany chunks"""
+    from sqlalchemy import insert
+    from models import Client, Document, DocumentItem
+
+    clients = max(10, int(documents * CLIENTS_PER_SCALE))
+    for start in range(0, clients, SEED_CHUNK):
+        db.session.execute(insert(Client), [
+            {'name': f"Client {i}", 'company': f"Company {i % 997}", 'email': f"client{i}@example.com"}
+            for i in range(start, min(start + SEED_CHUNK, clients))
+        ])
+    db.session.commit()
+
+    first_day = date(2025, 1, 1)
+    document_id = 0
+    for start in range(0, documents, SEED_CHUNK):
+        rows, items = [], []
+        for i in range(start, min(start + SEED_CHUNK, documents)):
+            document_id += 1
+            rows.append({
+                'id': document_id,
+                'document_type': ('invoice', 'quote', 'receipt')[i % 3],
+                'document_number': f"BENCH-{i:08d}",
+                'client_id': i % clients + 1,
+                'issue_date': first_day + timedelta(days=i % 730),
+                'status': ('draft', 'sent', 'paid')[i % 3],
+                'currency_code': 'USD',
+                'subtotal': 30.0, 'tax_amount': 0.0, 'total_amount': 30.0,
+            })
+            items.extend({
+                'document_id': document_id, 'description': f"Item {j}", 'quantity': 1.0,
+                'unit_price': 10.0, 'total_price': 10.0, 'order_index': j
+            } for j in range(ITEMS_PER_DOCUMENT))
+        db.session.execute(insert(Document), rows)
+        db.session.execute(insert(DocumentItem), items)
+        db.session.commit()
+    return clients
+
+
+def pdf_payload(number, lines):
+    return {
+        'business_name': 'Benchmark Ltd', 'business_email': 'bench@example.com',
+        'business_address': '1 Bench Street', 'document_type': 'invoice',
+        'document_number': number, 'issue_date': '2026-01-01', 'due_date': '2026-01-31',
+        'client': {'name': 'Client 1', 'company': 'Company 1', 'email': 'client1@example.com'},
+        'items': [{'description': f"Line {i}", 'quantity': 1, 'unit_price': 9.99} for i in range(lines)],
+        'totals': {'subtotal': 9.99 * lines, 'tax_amount': 0, 'total': 9.99 * lines, 'tax_rate': 0},
+    }
+
+
+def pdf_batch(client, i):
+    """POST a batch render and read the whole streamed ZIP, failing on a broken archive"""
+    response = client.post('/api/generate-pdf/batch', json={'documents': [
+        pdf_payload(f"BENCH-B-{i}-{n}-{time.time_ns()}", 5) for n in range(3)
+    ]})
+    with zipfile.ZipFile(io.BytesIO(response.get_data())) as archive:
+        if len([name for name in archive.namelist() if name.endswith('.pdf')]) != 3:
+            raise RuntimeError(f"Batch ZIP is missing PDFs: {archive.namelist()}")
+    return response
+
+
+def scenarios(app, clients, documents, requests):
+    """Yield (name, request count, callable(i) -> response)"""
+    client = app.test_client()
+    counter = itertools.count()
+    pdf = client.post('/api/generate-pdf', json=pdf_payload('BENCH-DOWNLOAD', 5)).get_json()
+
+    yield 'clients_page', requests, lambda i: client.get('/api/clients?limit=50')
+    yield 'clients_search', requests, lambda i: client.get(f"/api/clients?q=Client {i % clients}")
+    yield 'documents_page', requests, lambda i: client.get('/api/documents?limit=50&include=client,items')
+    yield 'document_detail', requests, lambda i: client.get(f"/api/documents/{i * 7919 % documents + 1}")
+    yield 'document_create', requests, lambda i: client.post('/api/documents', json={
+        'document_type': 'invoice', 'client_id': i % clients + 1, 'issue_date': '2026-01-01',
+        'items': [{'description': 'Widget', 'quantity': 2, 'unit_price': 5}]
+    })
+    # Unique numbers so every request renders instead of hitting the render cache
+    yield 'generate_pdf_small', requests, lambda i: client.post(
+        '/api/generate-pdf', json=pdf_payload(f"BENCH-S-{next(counter)}-{time.time_ns()}", 5))
+    yield 'generate_pdf_cached', requests, lambda i: client.post(
+        '/api/generate-pdf', json=pdf_payload('BENCH-CACHED', 5))
+    yield 'generate_pdf_1000_lines', max(3, requests // 10), lambda i: client.post(
+        '/api/generate-pdf', json=pdf_payload(f"BENCH-L-{next(counter)}-{time.time_ns()}", 1000))
+    yield 'generate_pdf_batch', max(3, requests // 10), lambda i: pdf_batch(client, i)
+    yield 'download_pdf', requests, lambda i: client.get(f"/api/download-pdf/{pdf['filename']}")
+
+
+def percentile(values, q):
+    if len(values) < 2:
+        return values[0] if values else 0.0
+    return statistics.quantiles(values, n=100, method='inclusive')[q - 1]
+
+
+def measure(call, count, concurrency):
+    """Run ``call`` count times; return latency percentiles, throughput and errors"""
+    def timed(i):
+        started = time.perf_counter()
+        response = call(i)
+        response.close()
+        return time.perf_counter() - started, response.status_code < 400
+
+    call(0).close()  # warm up
+    started = time.perf_counter()
+    if concurrency > 1:
+        with ThreadPoolExecutor(concurrency) as pool:
+            results = list(pool.map(timed, range(count)))
+    else:
+        results = [timed(i) for i in range(count)]
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(latency * 1000 for latency, _ in results)
+    return {
+        'requests': count,
+        'errors': sum(1 for _, ok in results if not ok),
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p95_ms': round(percentile(latencies, 95), 3),
+        'p99_ms': round(percentile(latencies, 99), 3),
+        'throughput_rps': round(count / elapsed, 2),
+        'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+def run_scale(documents, requests, concurrency, directory):
+    """Seed one database and benchmark every scenario; runs in a child process"""
+    os.environ.update({
+        'DATABASE_URL': f"sqlite:///{os.path.join(directory, 'bench.db')}",
+        'SETTINGS_STAMP_PATH': os.path.join(directory, 'settings.stamp'),
+        'PDF_OUTPUT_DIR': os.path.join(directory, 'pdfs'),
+        'PDF_RENDER_WORKERS': '0',  # render inline so RSS and timings include it
+    })
+    logging.disable(logging.INFO)
+    from main import app
+    from extensions import db
+    app.test_cli_runner().invoke(args=['db-upgrade'])
+
+    with app.app_context():
+        started = time.perf_counter()
+        clients = seed(db, documents)
+        seed_seconds = time.perf_counter() - started
+
+    results = {'_seed_seconds': round(seed_seconds, 2)}
+    for name, count, call in scenarios(app, clients, documents, requests):
+        results[name] = measure(call, count, concurrency)
+        print(f"  {documents:>9} {name:<24} p50={results[name]['p50_ms']:.1f}ms "
+              f"p95={results[name]['p95_ms']:.1f}ms {results[name]['throughput_rps']:.1f}/s "
+              f"rss={results[name]['peak_rss_mb']}MB errors={results[name]['errors']}", flush=True)
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    report = {
+        'meta': {
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'started_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'requests': args.requests,
+            'concurrency': args.concurrency,
+        },
+        'results': {},
+    }
+    for scale in args.scales:
+        directory = tempfile.mkdtemp(prefix=f"bench-{scale}-")
+        # A fresh interpreter per scale: main builds the app from the environment at import
+        with ProcessPoolExecutor(1, mp_context=get_context('spawn')) as pool:
+            report['results'][str(scale)] = pool.submit(
+                run_scale, scale, args.requests, args.concurrency, directory).result()
+    return report
+
+
+def compare(baseline, current, threshold):
+    """Return a list of regression descriptions"""
+    regressions = []
+    for scale, scenarios_ in current['results'].items():
+        for name, result in scenarios_.items():
+            before = baseline['results'].get(scale, {}).get(name)
+            if name.startswith('_') or not before:
+                continue
+            if result['p95_ms'] > before['p95_ms'] * (1 + threshold):
+                regressions.append(f"{scale}/{name}: p95 {before['p95_ms']}ms -> {result['p95_ms']}ms")
+            if result['throughput_rps'] < before['throughput_rps'] * (1 - threshold):
+                regressions.append(f"{scale}/{name}: throughput {before['throughput_rps']}/s -> {result['throughput_rps']}/s")
+            if result['errors'] > before['errors']:
+                regressions.append(f"{scale}/{name}: errors {before['errors']} -> {result['errors']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scales', default='100,10000',
+                        type=lambda value: [int(scale) for scale in value.split(',')],
+                        help='comma-separated document counts to seed (e.g. 100,10000,1000000)')
+    parser.add_argument('--requests', type=int, default=100, help='requests per scenario')
+    parser.add_argument('--concurrency', type=int, default=1, help='client threads per scenario')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--compare', help='baseline JSON to compare against')
+    parser.add_argument('--current', help='compare this results file instead of running the suite')
+    parser.add_argument('--threshold', type=float, default=0.2, help='allowed relative regression (0.2 = 20%%)')
+    args = parser.parse_args()
+
+    if args.current:
+        with open(args.current) as f:
+            report = json.load(f)
+    else:
+        report = run(args)
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(report, f, indent=2)
+            print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, report, args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        print(f"{len(regressions)} regression(s) beyond {args.threshold:.0%}")
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,176 @@
+"""Validation and batched insertion of documents with their line items.
+
+``prepare_document`` validates one payload and computes its totals in a
+single pass over the items. ``insert_documents`` then writes prepared
+documents in chunks: one multi-row INSERT ... RETURNING for the documents,
+one executemany for all their items, one commit per chunk. If a chunk hits
+a constraint violation it is retried one document at a time so only the
+offending documents fail. Each chunk also updates the reporting
+summaries, the sync change log and the search index in the same
+transaction.
+"""
+from datetime import datetime
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+from extensions import db
+from models import Client, Document, DocumentItem, SyncRef
+from utils import generate_document_number
+from reporting import record_documents
+from changelog import record_changes
+from document_search import index_documents
+
+DOCUMENT_TYPES = ('invoice', 'quote', 'receipt')
+DOCUMENT_STATUSES = ('draft', 'sent', 'paid', 'cancelled')
+
+
+class DocumentValidationError(ValueError):
+    """Raised when a document payload cannot be stored"""
+
+
+def _parse_date(value, field):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        raise DocumentValidationError(f"{field} must be a YYYY-MM-DD date")
+
+
+def prepare_document(data, tax_rate, currency_code='USD'):
+    """Validate a document payload; return (document values, item values)"""
+    if not isinstance(data, dict):
+        raise DocumentValidationError('Document must be an object')
+
+    document_type = data.get('document_type')
+    if document_type not in DOCUMENT_TYPES:
+        raise DocumentValidationError(f"document_type must be one of {', '.join(DOCUMENT_TYPES)}")
+
+    status = data.get('status') or 'draft'
+    if status not in DOCUMENT_STATUSES:
+        raise DocumentValidationError(f"status must be one of {', '.join(DOCUMENT_STATUSES)}")
+
+    try:
+        client_id = int(data.get('client_id'))
+    except (TypeError, ValueError):
+        raise DocumentValidationError('client_id is required')
+
+    if data.get('tax_rate') not in (None, ''):
+        try:
+            tax_rate = float(data['tax_rate'])
+        except (TypeError, ValueError):
+            raise DocumentValidationError('tax_rate must be a number')
+
+    items = []
+    subtotal = 0.0
+    for index, item_data in enumerate(data.get('items') or []):
+        try:
+            quantity = float(item_data['quantity'])
+            unit_price = float(item_data['unit_price'])
+            description = item_data['description']
+            order_index = item_data.get('order_index')
+            order_index = index if order_index in (None, '') else int(order_index)
+        except (KeyError, TypeError, ValueError):
+            raise DocumentValidationError(f"Item {index} needs description, quantity and unit_price")
+
+        total_price = quantity * unit_price
+        subtotal += total_price
+        items.append({
+            'description': description,
+            'quantity': quantity,
+            'unit_price': unit_price,
+            'total_price': total_price,
+            'order_index': order_index
+        })
+
+    tax_amount = subtotal * (tax_rate / 100)
+    document = {
+        'document_type': document_type,
+        'document_number': data.get('document_number') or None,
+        'client_id': client_id,
+        'issue_date': _parse_date(data.get('issue_date'), 'issue_date'),
+        'due_date': _parse_date(data['due_date'], 'due_date') if data.get('due_date') else None,
+        'notes': data.get('notes', ''),
+        'status': status,
+        'currency_code': data.get('currency_code') or currency_code,
+        'subtotal': subtotal,
+        'tax_amount': tax_amount,
+        'total_amount': subtotal + tax_amount
+    }
+    return document, items
+
+
+def check_clients_exist(prepared):
+    """Return the set of referenced client IDs that do not exist"""
+    client_ids = {document['client_id'] for document, _ in prepared}
+    if not client_ids:
+        return set()
+    found = set(db.session.execute(select(Client.id).where(Client.id.in_(client_ids))).scalars())
+    return client_ids - found
+
+
+def insert_documents(prepared, chunk_size=500, refs=None):
+    """Insert prepared (document, items) pairs; return one result dict per pair
+
+    ``refs``, parallel to ``prepared``, are stored as SyncRefs in the same
+    transaction as their documents (see /api/sync uploads).
+    """
+    results = []
+    for start in range(0, len(prepared), chunk_size):
+        chunk = prepared[start:start + chunk_size]
+        chunk_refs = refs[start:start + chunk_size] if refs is not None else None
+        # Results count only once their commit succeeds; a failed commit retries the chunk
+        try:
+            inserted = _insert_chunk(chunk, chunk_refs)
+            db.session.commit()
+            results.extend(inserted)
+        except IntegrityError:
+            db.session.rollback()
+            # Find the offending rows by retrying one document at a time
+            for position, pair in enumerate(chunk):
+                ref = chunk_refs[position] if chunk_refs is not None else None
+                try:
+                    inserted = _insert_chunk([pair], [ref] if ref is not None else None)
+                    db.session.commit()
+                    results.extend(inserted)
+                except IntegrityError:
+                    db.session.rollback()
+                    error = f"Document number {pair[0]['document_number']} is already in use"
+                    if ref is not None:
+                        error += f", or record {ref} is being uploaded concurrently"
+                    results.append({
+                        'success': False,
+                        'document_number': pair[0]['document_number'],
+                        'error': error
+                    })
+    return results
+
+
+def _insert_chunk(chunk, refs=None):
+    rows = []
+    for document, _ in chunk:
+        if not document['document_number']:
+            document['document_number'] = generate_document_number(document['document_type'])
+        rows.append(document)
+
+    inserted = db.session.execute(
+        insert(Document).returning(Document.id, sort_by_parameter_order=True),
+        rows
+    ).scalars().all()
+
+    item_rows = []
+    for document_id, (_, items) in zip(inserted, chunk):
+        for item in items:
+            item_rows.append(dict(item, document_id=document_id))
+    if item_rows:
+        db.session.execute(insert(DocumentItem), item_rows)
+    if refs is not None:
+        db.session.execute(insert(SyncRef), [
+            {'entity': 'document', 'ref': ref, 'entity_id': document_id} for ref, document_id in zip(refs, inserted)
+        ])
+
+    record_documents(rows)
+    record_changes('document', inserted)
+    index_documents(db.session.connection(), inserted)
+
+    return [
+        {'success': True, 'id': document_id, 'document_number': document['document_number']}
+        for document_id, (document, _) in zip(inserted, chunk)
+    ]
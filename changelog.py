@@ -0,0 +1,153 @@
+"""Change feed behind /api/sync.
+
+Every create, update or delete of a client, document (including its line
+items) or the settings row appends a ``change_log`` row; its autoincrement
+id is the sync cursor. ORM writes are logged by an ``after_flush`` hook in
+the same transaction; Core bulk writes (``bulk_documents``, client
+imports) call ``record_changes`` themselves. Deletes stay hard deletes in
+their own tables, and the ``delete`` entry left here is the tombstone.
+
+``changes_since`` collapses a page of entries to the latest operation per
+row and loads the current state of everything still present, so a client
+that was offline for a month receives each changed row once.
+
+On PostgreSQL concurrent transactions can commit their log rows out of id
+order, so an id cursor could move past a row that is still about to
+appear. There each entry also records its transaction id (``txid``, set by
+a column default, see migration 7), the feed is ordered by (txid, id) and
+only serves entries of transactions older than the snapshot's xmin, i.e.
+of transactions that have finished along with every one before them. Any
+entry committed later has a txid at or above that xmin, so it sorts after
+every cursor already handed out. SQLite serializes writers, so there the
+id alone is the cursor.
+"""
+from sqlalchemy import event, func, insert, literal, select, text, tuple_
+from sqlalchemy.orm import selectinload
+from extensions import db
+from models import BusinessSettings, ChangeLog, Client, Document, DocumentItem, SyncRef
+
+ENTITIES = {Client: 'client', Document: 'document', BusinessSettings: 'settings'}
+
+
+def record_changes(entity, ids, operation='upsert'):
+    """Log ``operation`` for the given row ids in the current transaction"""
+    rows = [{'entity': entity, 'entity_id': entity_id, 'operation': operation} for entity_id in ids]
+    if rows:
+        db.session.execute(insert(ChangeLog.__table__), rows)
+
+
+@event.listens_for(db.session, 'after_flush')
+def log_flushed_changes(session, flush_context):
+    changes = {}
+    for obj in session.new:
+        _collect(changes, obj, 'upsert')
+    for obj in session.dirty:
+        if session.is_modified(obj, include_collections=False):
+            _collect(changes, obj, 'upsert')
+    for obj in session.deleted:
+        _collect(changes, obj, 'delete')
+
+    if changes:
+        session.connection().execute(insert(ChangeLog.__table__), [
+            {'entity': entity, 'entity_id': entity_id, 'operation': operation}
+            for (entity, entity_id), operation in changes.items()
+        ])
+
+
+def _collect(changes, obj, operation):
+    if isinstance(obj, DocumentItem):
+        # An item change is a change to its document, unless that is being deleted
+        key = ('document', obj.document_id)
+        changes.setdefault(key, 'upsert')
+        return
+    entity = ENTITIES.get(type(obj))
+    if entity is not None and obj.id is not None:
+        key = (entity, obj.id)
+        if operation == 'delete' or changes.get(key) != 'delete':
+            changes[key] = operation
+
+
+def changes_since(since, limit):
+    """Current state of rows changed after cursor ``since``, at most ``limit`` log entries
+
+    ``since`` holds the values of a previous ``cursor`` ([] for a full
+    snapshot): [txid, id] on PostgreSQL, [id] elsewhere.
+    """
+    columns = (ChangeLog.id, ChangeLog.txid, ChangeLog.entity, ChangeLog.entity_id, ChangeLog.operation)
+    postgresql = db.session.get_bind().dialect.name == 'postgresql'
+    if postgresql:
+        # A bare id cursor predates txids; (0, id) may resend entries but never skips one
+        since = list(since) if len(since) == 2 else [0, since[0] if since else 0]
+        xmin = db.session.execute(text("SELECT pg_snapshot_xmin(pg_current_snapshot())::text::bigint")).scalar()
+        query = select(*columns).where(tuple_(ChangeLog.txid, ChangeLog.id) > tuple(since), ChangeLog.txid < xmin).order_by(
+            ChangeLog.txid, ChangeLog.id)
+    else:
+        since = [since[-1] if since else 0]
+        query = select(*columns).where(ChangeLog.id > since[0]).order_by(ChangeLog.id)
+    entries = db.session.execute(query.limit(limit + 1)).all()
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+
+    latest = {}
+    for entry in entries:
+        latest[(entry.entity, entry.entity_id)] = entry.operation
+
+    def ids(entity, operation):
+        return [entity_id for (kind, entity_id), op in latest.items() if kind == entity and op == operation]
+
+    clients = db.session.execute(select(Client).where(Client.id.in_(ids('client', 'upsert')))).scalars().all()
+    documents = db.session.execute(
+        select(Document).where(Document.id.in_(ids('document', 'upsert'))).options(selectinload(Document.items))
+    ).scalars().all()
+    settings = None
+    if ids('settings', 'upsert'):
+        settings = db.session.execute(select(BusinessSettings).order_by(BusinessSettings.id).limit(1)).scalar()
+
+    # Rows deleted after this page's entries are reported now; their own entry repeats it later
+    found_clients = {client.id for client in clients}
+    found_documents = {document.id for document in documents}
+    deleted_clients = ids('client', 'delete') + [i for i in ids('client', 'upsert') if i not in found_clients]
+    deleted_documents = ids('document', 'delete') + [i for i in ids('document', 'upsert') if i not in found_documents]
+
+    return {
+        'clients': [client.to_dict() for client in clients],
+        'documents': [_document_dict(document) for document in documents],
+        'settings': settings.to_dict() if settings else None,
+        'deleted': {'clients': sorted(deleted_clients), 'documents': sorted(deleted_documents)},
+        'cursor': (([entries[-1].txid] if postgresql else []) + [entries[-1].id]) if entries else since,
+        'has_more': has_more,
+    }
+
+
+def _document_dict(document):
+    data = document.to_dict()
+    data['items'] = [item.to_dict() for item in sorted(document.items, key=lambda item: (item.order_index or 0, item.id))]
+    return data
+
+
+def seed_changelog(conn):
+    """Log an upsert for every existing row so a first sync from cursor 0 sees them"""
+    if conn.execute(select(func.count()).select_from(ChangeLog.__table__)).scalar():
+        return
+    columns = ['entity', 'entity_id', 'operation', 'changed_at']
+    for model, entity in ENTITIES.items():
+        conn.execute(insert(ChangeLog.__table__).from_select(columns, select(
+            literal(entity), model.id, literal('upsert'), func.coalesce(model.updated_at, func.current_timestamp())
+        ).order_by(model.id)))
+
+
+def compact(before):
+    """Drop entries older than ``before`` that a later entry for the same row supersedes"""
+    latest = select(func.max(ChangeLog.id)).group_by(ChangeLog.entity, ChangeLog.entity_id)
+    result = db.session.execute(
+        ChangeLog.__table__.delete().where(ChangeLog.changed_at < before, ChangeLog.id.not_in(latest))
+    )
+    db.session.commit()
+    return result.rowcount
+
+
+def prune_sync_refs(before):
+    """Forget upload refs older than ``before``; a retry of those uploads would create new records"""
+    result = db.session.execute(SyncRef.__table__.delete().where(SyncRef.created_at < before))
+    db.session.commit()
+    return result.rowcount
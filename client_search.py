@@ -0,0 +1,104 @@
+"""Prefix/full-text search over client name, company and email.
+
+SQLite databases get an external-content FTS5 table kept in sync by
+triggers; PostgreSQL gets a GIN index over a ``simple`` tsvector of the same
+columns. Anything else (or SQLite built without FTS5) falls back to
+case-insensitive prefix matching with LIKE. The strategy is picked on the
+first search, once the schema can be inspected.
+"""
+import logging
+import re
+from sqlalchemy import and_, or_, text
+from extensions import db
+from models import Client
+
+_backend = None
+
+# Must match the indexed expression exactly for PostgreSQL to use the index
+PG_TSVECTOR = ("to_tsvector('simple', coalesce(client.name, '') || ' ' || "
+               "coalesce(client.company, '') || ' ' || coalesce(client.email, ''))")
+
+SQLITE_SETUP = [
+    """CREATE VIRTUAL TABLE client_fts USING fts5(
+        name, company, email, content='client', content_rowid='id', prefix='2 3'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS client_fts_ai AFTER INSERT ON client BEGIN
+        INSERT INTO client_fts(rowid, name, company, email) VALUES (new.id, new.name, new.company, new.email);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS client_fts_ad AFTER DELETE ON client BEGIN
+        INSERT INTO client_fts(client_fts, rowid, name, company, email) VALUES ('delete', old.id, old.name, old.company, old.email);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS client_fts_au AFTER UPDATE ON client BEGIN
+        INSERT INTO client_fts(client_fts, rowid, name, company, email) VALUES ('delete', old.id, old.name, old.company, old.email);
+        INSERT INTO client_fts(rowid, name, company, email) VALUES (new.id, new.name, new.company, new.email);
+    END""",
+    # Index rows that existed before the search table
+    "INSERT INTO client_fts(client_fts) VALUES ('rebuild')",
+]
+
+
+def create_client_search_index(conn):
+    """Create the search index for the current database if it is missing"""
+    dialect = conn.dialect.name
+
+    if dialect == 'sqlite':
+        if not conn.execute(text("SELECT sqlite_compileoption_used('ENABLE_FTS5')")).scalar():
+            # Searches fall back to LIKE
+            logging.warning("SQLite was built without FTS5; client search will use LIKE")
+        elif not _sqlite_fts_exists(conn):
+            for statement in SQLITE_SETUP:
+                conn.execute(text(statement))
+    elif dialect == 'postgresql':
+        conn.execute(text(f"CREATE INDEX IF NOT EXISTS ix_client_search ON client USING gin ({PG_TSVECTOR})"))
+
+
+def detect_client_search(engine):
+    """Pick the search strategy for this process based on what the schema provides"""
+    global _backend
+    dialect = engine.dialect.name
+
+    if dialect == 'sqlite':
+        with engine.connect() as conn:
+            _backend = 'fts5' if _sqlite_fts_exists(conn) else 'like'
+    elif dialect == 'postgresql':
+        _backend = 'tsvector'
+    else:
+        _backend = 'like'
+
+
+def _sqlite_fts_exists(conn):
+    return conn.execute(text(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'client_fts'"
+    )).first() is not None
+
+
+def search_terms(query):
+    return re.findall(r'\w+', query or '')
+
+
+def client_search_filter(query):
+    """SQL condition matching clients whose name, company or email start with every term"""
+    terms = search_terms(query)
+    if not terms:
+        return None
+
+    if _backend is None:
+        detect_client_search(db.engine)
+
+    if _backend == 'fts5':
+        match = ' '.join(f'"{term}"*' for term in terms)
+        return Client.id.in_(
+            text("SELECT rowid FROM client_fts WHERE client_fts MATCH :match").bindparams(match=match)
+        )
+
+    if _backend == 'tsvector':
+        tsquery = ' & '.join(f'{term}:*' for term in terms)
+        return text(f"{PG_TSVECTOR} @@ to_tsquery('simple', :tsquery)").bindparams(tsquery=tsquery)
+
+    conditions = []
+    for term in terms:
+        pattern = f"{term}%"
+        conditions.append(or_(
+            Client.name.ilike(pattern), Client.company.ilike(pattern), Client.email.ilike(pattern)
+        ))
+    return and_(*conditions)
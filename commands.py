@@ -0,0 +1,59 @@
+"""Flask CLI commands (``flask --app main <command>``)."""
+import sys
+import click
+from flask.cli import with_appcontext
+from extensions import db
+
+
+def init_app(app):
+    for command in (db_upgrade, check_query_plans_command, rebuild_summaries_command,
+                    compact_changelog_command):
+        app.cli.add_command(command)
+
+
+@click.command('db-upgrade')
+@with_appcontext
+def db_upgrade():
+    """Create missing tables and apply pending schema migrations; run before starting the app."""
+    from migrations import run_migrations
+    db.create_all()
+    applied = run_migrations(db.engine)
+    click.echo(f"Applied migrations: {', '.join(map(str, applied))}" if applied else 'Schema is up to date')
+
+
+@click.command('check-query-plans')
+@with_appcontext
+def check_query_plans_command():
+    """EXPLAIN the main queries and fail if any needs a full table scan."""
+    from query_plans import check_query_plans
+    failed = False
+    for name, (plan, scans) in check_query_plans(db.engine).items():
+        status = 'FULL SCAN' if scans else 'ok'
+        click.echo(f"[{status}] {name}")
+        for line in plan:
+            click.echo(f"    {line}")
+        failed = failed or bool(scans)
+    sys.exit(1 if failed else 0)
+
+
+@click.command('rebuild-summaries')
+@with_appcontext
+def rebuild_summaries_command():
+    """Recompute the revenue and receivables summary tables from the documents."""
+    from reporting import rebuild_summaries
+    with db.engine.begin() as conn:
+        rebuild_summaries(conn)
+    click.echo('Summaries rebuilt')
+
+
+@click.command('compact-changelog')
+@click.option('--days', default=90, show_default=True, help='keep every entry younger than this')
+@with_appcontext
+def compact_changelog_command(days):
+    """Drop superseded /api/sync change log entries and upload refs older than --days."""
+    from datetime import datetime, timedelta
+    from changelog import compact, prune_sync_refs
+    before = datetime.utcnow() - timedelta(days=days)
+    removed = compact(before)
+    pruned = prune_sync_refs(before)
+    click.echo(f"Removed {removed} change log entries and {pruned} upload refs")
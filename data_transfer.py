@@ -0,0 +1,432 @@
+"""Streaming CSV/NDJSON import and export of clients and documents.
+
+Exports are generators over a server-side cursor (``yield_per``), encoded
+one row at a time, so the response never holds the whole file. Imports
+parse the uploaded file incrementally, validate each record, write it in
+chunked transactions and yield NDJSON progress/error lines as they go, so
+memory stays bounded by the chunk size whatever the file size.
+
+``export_accounting`` is the flat, filterable document/line-item export for
+bookkeeping, also available as Parquet when pyarrow is installed.
+"""
+import csv
+import io
+import json
+from sqlalchemy import case, insert, select, text, update
+from sqlalchemy.exc import IntegrityError
+from extensions import db
+from utils import ZipStreamBuffer
+from models import Client, Document, DocumentItem
+from changelog import record_changes
+from document_search import index_client_documents
+from bulk_documents import DocumentValidationError, check_clients_exist, insert_documents, prepare_document
+
+FORMATS = ('csv', 'ndjson')
+MIMETYPES = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson', 'parquet': 'application/vnd.apache.parquet'}
+
+CLIENT_COLUMNS = ('id', 'name', 'email', 'phone', 'company', 'address')
+CLIENT_LIMITS = {'name': 200, 'email': 120, 'phone': 50, 'company': 200}
+
+DOCUMENT_COLUMNS = ('document_number', 'document_type', 'client_id', 'issue_date', 'due_date', 'status',
+                    'currency_code', 'tax_rate', 'subtotal', 'tax_amount', 'total_amount', 'notes')
+ITEM_COLUMNS = ('description', 'quantity', 'unit_price', 'total_price', 'order_index')
+# Documents in CSV are one row per line item with the document columns repeated
+DOCUMENT_CSV_COLUMNS = DOCUMENT_COLUMNS + tuple(f"item_{name}" for name in ITEM_COLUMNS)
+
+EXPORT_BATCH_SIZE = 1000
+
+
+def import_format(file, requested=None):
+    """Pick csv/ndjson from an explicit format or the upload's extension"""
+    if requested:
+        return requested if requested in FORMATS else None
+    name = (file.filename or '').lower()
+    if name.endswith('.csv'):
+        return 'csv'
+    if name.endswith(('.ndjson', '.jsonl')):
+        return 'ndjson'
+    return None
+
+
+def csv_lines(columns, rows):
+    """Encode rows as CSV text one line at a time"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for row in rows:
+        writer.writerow(row)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    # Header only, for an empty export
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def ndjson_lines(objects):
+    for obj in objects:
+        yield json.dumps(obj, default=str) + '\n'
+
+
+def detach_upload(file):
+    """Take the upload's spooled stream so it outlives the request.
+
+    The request closes its files when the view returns, before a streamed
+    response has been generated; the caller now closes the stream instead.
+    """
+    stream = file.stream
+    file.stream = io.BytesIO()
+    return stream
+
+
+def read_records(stream, format):
+    """Yield (line number, record dict or None, error or None) from an uploaded stream; close it when done"""
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='' if format == 'csv' else None)
+    try:
+        if format == 'csv':
+            reader = csv.DictReader(text)
+            for record in reader:
+                yield reader.line_num, record, None
+            return
+
+        for line_number, line in enumerate(text, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield line_number, None, f"Invalid JSON: {e}"
+                continue
+            if not isinstance(record, dict):
+                yield line_number, None, 'Each line must be a JSON object'
+                continue
+            yield line_number, record, None
+    finally:
+        text.close()
+
+
+def export_clients(format):
+    query = select(*(getattr(Client, name) for name in CLIENT_COLUMNS)).order_by(Client.id)
+    rows = db.session.execute(query.execution_options(yield_per=EXPORT_BATCH_SIZE))
+
+    if format == 'csv':
+        return csv_lines(CLIENT_COLUMNS, rows)
+    return ndjson_lines(dict(zip(CLIENT_COLUMNS, row)) for row in rows)
+
+
+def _document_rows():
+    """Documents joined to their items in one ordered pass"""
+    tax_rate = case((Document.subtotal != 0, Document.tax_amount * 100.0 / Document.subtotal), else_=None)
+    query = select(
+        Document.id, Document.document_number, Document.document_type, Document.client_id,
+        Document.issue_date, Document.due_date, Document.status, Document.currency_code,
+        tax_rate, Document.subtotal, Document.tax_amount, Document.total_amount, Document.notes,
+        *(getattr(DocumentItem, name) for name in ITEM_COLUMNS)
+    ).outerjoin(DocumentItem, DocumentItem.document_id == Document.id).order_by(
+        Document.id, DocumentItem.order_index, DocumentItem.id
+    )
+    return db.session.execute(query.execution_options(yield_per=EXPORT_BATCH_SIZE))
+
+
+def _grouped_documents(rows):
+    """Fold consecutive item rows of the same document into one object"""
+    document_id = None
+    document = None
+    width = len(DOCUMENT_COLUMNS) + 1
+    for row in rows:
+        if row[0] != document_id:
+            if document is not None:
+                yield document
+            document_id = row[0]
+            document = dict(zip(DOCUMENT_COLUMNS, row[1:width]), items=[])
+            if document['tax_rate'] is not None:
+                document['tax_rate'] = round(document['tax_rate'], 4)
+        if row[width] is not None:
+            document['items'].append(dict(zip(ITEM_COLUMNS, row[width:])))
+    if document is not None:
+        yield document
+
+
+def export_documents(format):
+    if format == 'csv':
+        def flat_rows():
+            for row in _document_rows():
+                row = list(row[1:])
+                if row[7] is not None:
+                    row[7] = round(row[7], 4)
+                yield row
+        return csv_lines(DOCUMENT_CSV_COLUMNS, flat_rows())
+    return ndjson_lines(_grouped_documents(_document_rows()))
+
+
+# One row per line item; documents without items get a single row with empty item columns
+ACCOUNTING_COLUMNS = (
+    ('document_number', Document.document_number, 'string'),
+    ('document_type', Document.document_type, 'string'),
+    ('status', Document.status, 'string'),
+    ('issue_date', Document.issue_date, 'date'),
+    ('due_date', Document.due_date, 'date'),
+    ('currency_code', Document.currency_code, 'string'),
+    ('client_id', Document.client_id, 'int'),
+    ('client_name', Client.name, 'string'),
+    ('client_company', Client.company, 'string'),
+    ('line_number', DocumentItem.order_index, 'int'),
+    ('description', DocumentItem.description, 'string'),
+    ('quantity', DocumentItem.quantity, 'float'),
+    ('unit_price', DocumentItem.unit_price, 'float'),
+    ('line_total', DocumentItem.total_price, 'float'),
+    ('document_subtotal', Document.subtotal, 'float'),
+    ('document_tax', Document.tax_amount, 'float'),
+    ('document_total', Document.total_amount, 'float'),
+)
+ACCOUNTING_FORMATS = FORMATS + ('parquet',)
+PARQUET_ROW_GROUP_SIZE = 10000
+
+
+def parquet_available():
+    try:
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def accounting_rows(start=None, end=None, document_types=None, statuses=None, client_id=None):
+    """Stream filtered documents joined to their client and items in one query"""
+    query = select(*(column for _, column, _ in ACCOUNTING_COLUMNS)).select_from(Document).outerjoin(
+        Client, Client.id == Document.client_id
+    ).outerjoin(
+        DocumentItem, DocumentItem.document_id == Document.id
+    ).order_by(Document.issue_date, Document.id, DocumentItem.order_index, DocumentItem.id)
+
+    if start:
+        query = query.where(Document.issue_date >= start)
+    if end:
+        query = query.where(Document.issue_date <= end)
+    if document_types:
+        query = query.where(Document.document_type.in_(document_types))
+    if statuses:
+        query = query.where(Document.status.in_(statuses))
+    if client_id is not None:
+        query = query.where(Document.client_id == client_id)
+
+    return db.session.execute(query.execution_options(yield_per=EXPORT_BATCH_SIZE))
+
+
+def _parquet_chunks(rows):
+    """Encode rows as Parquet, yielding each row group as soon as it is written"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    types = {'string': pa.string(), 'date': pa.date32(), 'int': pa.int64(), 'float': pa.float64()}
+    schema = pa.schema([(name, types[kind]) for name, _, kind in ACCOUNTING_COLUMNS])
+    sink = ZipStreamBuffer()
+    writer = pq.ParquetWriter(sink, schema)
+
+    def write(batch):
+        columns = zip(*batch)
+        writer.write_table(pa.Table.from_arrays(
+            [pa.array(values, type=field.type) for values, field in zip(columns, schema)], schema=schema
+        ))
+
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= PARQUET_ROW_GROUP_SIZE:
+            write(batch)
+            batch = []
+            yield sink.drain()
+    if batch:
+        write(batch)
+    writer.close()
+    yield sink.drain()
+
+
+def export_accounting(format, **filters):
+    rows = accounting_rows(**filters)
+    names = tuple(name for name, _, _ in ACCOUNTING_COLUMNS)
+
+    if format == 'parquet':
+        return _parquet_chunks(rows)
+    if format == 'csv':
+        return csv_lines(names, rows)
+    return ndjson_lines(dict(zip(names, row)) for row in rows)
+
+
+def validate_client(record):
+    """Normalized client column values from an import or sync record; raises ValueError"""
+    values = {}
+    for name in CLIENT_COLUMNS[1:]:
+        value = record.get(name)
+        value = '' if value is None else str(value).strip()
+        limit = CLIENT_LIMITS.get(name)
+        if limit and len(value) > limit:
+            raise ValueError(f"{name} is longer than {limit} characters")
+        values[name] = value
+    if not values['name']:
+        raise ValueError('name is required')
+
+    client_id = record.get('id')
+    if client_id not in (None, ''):
+        try:
+            values['id'] = int(client_id)
+        except (TypeError, ValueError):
+            raise ValueError('id must be an integer')
+    return values
+
+
+def _write_clients(chunk):
+    """Upsert one chunk of validated clients; return (inserted, updated)"""
+    ids = [values['id'] for _, values in chunk if 'id' in values]
+    existing = set()
+    if ids:
+        existing = set(db.session.execute(select(Client.id).where(Client.id.in_(ids))).scalars())
+
+    updates = [values for _, values in chunk if values.get('id') in existing]
+    with_id = [values for _, values in chunk if 'id' in values and values['id'] not in existing]
+    without_id = [values for _, values in chunk if 'id' not in values]
+
+    changed = [values['id'] for values in updates + with_id]
+    if updates:
+        db.session.execute(update(Client), updates)
+        # Document search rows include the client name
+        index_client_documents(db.session.connection(), [values['id'] for values in updates])
+    if with_id:
+        db.session.execute(insert(Client), with_id)
+    if without_id:
+        changed += db.session.execute(
+            insert(Client).returning(Client.id, sort_by_parameter_order=True), without_id
+        ).scalars().all()
+    record_changes('client', changed)
+    if with_id and db.session.get_bind().dialect.name == 'postgresql':
+        # Explicit ids do not advance the serial sequence
+        db.session.execute(text("SELECT setval(pg_get_serial_sequence('client', 'id'), (SELECT max(id) FROM client))"))
+    return len(with_id) + len(without_id), len(updates)
+
+
+def import_clients(records, chunk_size=1000):
+    """Validate and upsert client records; yield NDJSON-ready progress dicts.
+
+    Records with an ``id`` that exists update that client; all others are
+    inserted (keeping the given ``id`` if there is one).
+    """
+    totals = {'processed': 0, 'inserted': 0, 'updated': 0, 'failed': 0}
+
+    def flush(chunk):
+        try:
+            inserted, updated = _write_clients(chunk)
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            # Retry one record at a time to isolate the conflicting ones
+            inserted = updated = 0
+            for line_number, values in chunk:
+                try:
+                    added, changed = _write_clients([(line_number, values)])
+                    db.session.commit()
+                    inserted += added
+                    updated += changed
+                except IntegrityError:
+                    db.session.rollback()
+                    totals['failed'] += 1
+                    yield {'line': line_number, 'error': f"Client {values.get('id')} conflicts with an existing row"}
+        totals['inserted'] += inserted
+        totals['updated'] += updated
+        yield dict(totals)
+
+    chunk = []
+    for line_number, record, error in records:
+        totals['processed'] += 1
+        if error is None:
+            try:
+                chunk.append((line_number, validate_client(record)))
+            except ValueError as e:
+                error = str(e)
+        if error is not None:
+            totals['failed'] += 1
+            yield {'line': line_number, 'error': error}
+
+        if len(chunk) >= chunk_size:
+            yield from flush(chunk)
+            chunk = []
+
+    if chunk:
+        yield from flush(chunk)
+    yield dict(totals, done=True)
+
+
+def _csv_documents(records):
+    """Group consecutive CSV item rows sharing a document_number into documents"""
+    document = None
+    first_line = None
+    for line_number, record, error in records:
+        if error is not None:
+            yield line_number, None, error
+            continue
+
+        number = record.get('document_number') or None
+        if document is None or not number or number != document.get('document_number'):
+            if document is not None:
+                yield first_line, document, None
+            document = {name: record.get(name) for name in DOCUMENT_COLUMNS}
+            document['document_number'] = number
+            document['items'] = []
+            first_line = line_number
+
+        if record.get('item_description'):
+            document['items'].append({name: record.get(f"item_{name}") for name in ITEM_COLUMNS})
+
+    if document is not None:
+        yield first_line, document, None
+
+
+def import_documents(records, format, tax_rate, currency_code, chunk_size=500):
+    """Validate and insert documents with their items; yield progress dicts.
+
+    Totals are recomputed from the items, using the document's ``tax_rate``
+    when present and the business tax rate otherwise. Document numbers that
+    already exist are reported as failures.
+    """
+    if format == 'csv':
+        records = _csv_documents(records)
+    totals = {'processed': 0, 'inserted': 0, 'failed': 0}
+
+    def flush(chunk):
+        prepared = [pair for _, pair in chunk]
+        missing = check_clients_exist(prepared)
+        valid = []
+        for line_number, pair in chunk:
+            if pair[0]['client_id'] in missing:
+                totals['failed'] += 1
+                yield {'line': line_number, 'error': f"Client {pair[0]['client_id']} not found"}
+            else:
+                valid.append((line_number, pair))
+
+        results = insert_documents([pair for _, pair in valid], chunk_size=len(valid) or 1)
+        for (line_number, _), result in zip(valid, results):
+            if result['success']:
+                totals['inserted'] += 1
+            else:
+                totals['failed'] += 1
+                yield {'line': line_number, 'error': result['error']}
+        yield dict(totals)
+
+    chunk = []
+    for line_number, record, error in records:
+        totals['processed'] += 1
+        if error is None:
+            try:
+                chunk.append((line_number, prepare_document(record, tax_rate, currency_code)))
+            except DocumentValidationError as e:
+                error = str(e)
+        if error is not None:
+            totals['failed'] += 1
+            yield {'line': line_number, 'error': error}
+
+        if len(chunk) >= chunk_size:
+            yield from flush(chunk)
+            chunk = []
+
+    if chunk:
+        yield from flush(chunk)
+    yield dict(totals, done=True)
@@ -0,0 +1,94 @@
+"""Database performance profile.
+
+``DB_PROFILE=tuned`` (the default) configures the engine for several
+gunicorn workers sharing one database:
+
+- SQLite: every new connection switches to WAL (readers no longer block
+  the writer), ``synchronous=NORMAL`` (no fsync per commit in WAL mode;
+  durable up to the last checkpoint), a busy timeout so a writer waits for
+  the lock instead of failing with "database is locked", and larger
+  page-cache and mmap sizes.
+- PostgreSQL: a sized connection pool, a server-side statement timeout and,
+  with the psycopg 3 driver (``postgresql+psycopg://``), server-side
+  prepared statements for queries run more than ``DB_PREPARE_THRESHOLD``
+  times. psycopg2 has no prepared statement support; there SQLAlchemy's
+  compiled-statement cache is all there is.
+
+``DB_PROFILE=baseline`` keeps the driver defaults, for comparison
+(``benchmarks/bench_concurrent_writes.py``).
+"""
+import os
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+PROFILES = ('tuned', 'baseline')
+
+
+def load_config(config):
+    """Read the profile settings from the environment into ``config``"""
+    env = os.environ.get
+    config["DB_PROFILE"] = env("DB_PROFILE", "tuned")
+    config["SQLITE_JOURNAL_MODE"] = env("SQLITE_JOURNAL_MODE", "WAL")
+    config["SQLITE_SYNCHRONOUS"] = env("SQLITE_SYNCHRONOUS", "NORMAL")
+    config["SQLITE_BUSY_TIMEOUT_MS"] = int(env("SQLITE_BUSY_TIMEOUT_MS", 15000))
+    config["SQLITE_CACHE_SIZE_KB"] = int(env("SQLITE_CACHE_SIZE_KB", 65536))
+    config["SQLITE_MMAP_SIZE"] = int(env("SQLITE_MMAP_SIZE", 256 * 1024 * 1024))
+    config["DB_POOL_SIZE"] = int(env("DB_POOL_SIZE", 5))
+    config["DB_MAX_OVERFLOW"] = int(env("DB_MAX_OVERFLOW", 10))
+    config["DB_POOL_TIMEOUT"] = int(env("DB_POOL_TIMEOUT", 30))
+    config["DB_STATEMENT_TIMEOUT_MS"] = int(env("DB_STATEMENT_TIMEOUT_MS", 30000))
+    config["DB_PREPARE_THRESHOLD"] = int(env("DB_PREPARE_THRESHOLD", 5))
+
+
+def engine_options(database_url, config):
+    """SQLALCHEMY_ENGINE_OPTIONS for the configured profile"""
+    options = {
+        "pool_recycle": 300,
+        "pool_pre_ping": True,
+    }
+    if config["DB_PROFILE"] not in PROFILES:
+        raise ValueError(f"DB_PROFILE must be one of {', '.join(PROFILES)}")
+    if config["DB_PROFILE"] == 'baseline':
+        return options
+
+    url = make_url(database_url)
+    if url.get_backend_name() == 'postgresql':
+        options.update(
+            pool_size=config["DB_POOL_SIZE"],
+            max_overflow=config["DB_MAX_OVERFLOW"],
+            pool_timeout=config["DB_POOL_TIMEOUT"],
+        )
+        connect_args = {"options": f"-c statement_timeout={config['DB_STATEMENT_TIMEOUT_MS']}"}
+        if url.get_driver_name() == 'psycopg':
+            connect_args["prepare_threshold"] = config["DB_PREPARE_THRESHOLD"]
+        options["connect_args"] = connect_args
+    elif url.get_backend_name() == 'sqlite':
+        # Pings are pointless for a local file
+        options["pool_pre_ping"] = False
+    return options
+
+
+def sqlite_pragmas(config):
+    return [
+        f"PRAGMA journal_mode={config['SQLITE_JOURNAL_MODE']}",
+        f"PRAGMA synchronous={config['SQLITE_SYNCHRONOUS']}",
+        f"PRAGMA busy_timeout={config['SQLITE_BUSY_TIMEOUT_MS']}",
+        # Negative cache_size is in KiB rather than pages
+        f"PRAGMA cache_size=-{config['SQLITE_CACHE_SIZE_KB']}",
+        f"PRAGMA mmap_size={config['SQLITE_MMAP_SIZE']}",
+    ]
+
+
+def install(engine, config):
+    """Apply per-connection settings; call before the engine's first connection"""
+    if config["DB_PROFILE"] == 'baseline' or engine.dialect.name != 'sqlite':
+        return
+
+    pragmas = sqlite_pragmas(config)
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
@@ -0,0 +1,260 @@
+"""Ranked full-text search over documents.
+
+Each document gets one search row holding its number, its client's name and
+company, its notes and all of its line-item descriptions, weighted in that
+order. SQLite databases use an FTS5 table ranked with bm25; PostgreSQL uses
+a ``document_search`` table of weighted ``simple`` tsvectors under a GIN
+index, ranked with ts_rank_cd. Without either (SQLite built without FTS5)
+searches fall back to unranked LIKE matching.
+
+Rows are rebuilt by ``index_documents`` in the transaction that changes the
+document: an ``after_flush`` hook covers ORM writes, and the Core bulk paths
+(``bulk_documents``, client imports) call it themselves. Rebuilding a row
+costs one pass over that document's items, so it only happens when an
+indexed field changes, not on status or total updates.
+"""
+import logging
+from itertools import chain
+from sqlalchemy import Float, Integer, and_, bindparam, event, exists, inspect, literal, or_, select, text
+from extensions import db
+from models import Client, Document, DocumentItem
+from client_search import search_terms
+
+_backend = None
+
+# Column weights: document number, client, notes, items
+FTS_WEIGHTS = '10.0, 5.0, 2.0, 1.0'
+
+# Rebuilt rows are written in batches of this many documents
+INDEX_BATCH_SIZE = 500
+
+# tsvector values are limited to 1 MB, so only this much item text is indexed per document
+PG_MAX_ITEMS_TEXT = 500000
+
+SQLITE_SETUP = [
+    """CREATE VIRTUAL TABLE document_fts USING fts5(
+        document_number, client, notes, items, prefix='2 3'
+    )""",
+]
+
+PG_SETUP = [
+    """CREATE TABLE IF NOT EXISTS document_search (
+        document_id INTEGER PRIMARY KEY,
+        search_vector TSVECTOR NOT NULL
+    )""",
+    "CREATE INDEX IF NOT EXISTS ix_document_search_vector ON document_search USING gin (search_vector)",
+]
+
+SQLITE_ROWS = """
+    INSERT INTO document_fts(rowid, document_number, client, notes, items)
+    SELECT d.id, coalesce(d.document_number, ''), trim(coalesce(c.name, '') || ' ' || coalesce(c.company, '')),
+           coalesce(d.notes, ''),
+           coalesce((SELECT group_concat(i.description, ' ') FROM document_item i WHERE i.document_id = d.id), '')
+    FROM document d LEFT JOIN client c ON c.id = d.client_id
+"""
+
+PG_ROWS = f"""
+    INSERT INTO document_search (document_id, search_vector)
+    SELECT d.id,
+           setweight(to_tsvector('simple', coalesce(d.document_number, '')), 'A') ||
+           setweight(to_tsvector('simple', coalesce(c.name, '') || ' ' || coalesce(c.company, '')), 'B') ||
+           setweight(to_tsvector('simple', coalesce(d.notes, '')), 'C') ||
+           setweight(to_tsvector('simple', left(coalesce(
+               (SELECT string_agg(i.description, ' ') FROM document_item i WHERE i.document_id = d.id), ''
+           ), {PG_MAX_ITEMS_TEXT})), 'D')
+    FROM document d LEFT JOIN client c ON c.id = d.client_id
+"""
+
+STATEMENTS = {
+    'fts5': (SQLITE_ROWS, "DELETE FROM document_fts WHERE rowid IN :ids", "DELETE FROM document_fts"),
+    'tsvector': (PG_ROWS, "DELETE FROM document_search WHERE document_id IN :ids", "DELETE FROM document_search"),
+}
+
+# The newest :candidates matches, scored
+RANKED_MATCHES = """
+    SELECT {id} AS id, {score} AS score FROM {source} WHERE {match}{filters}
+    ORDER BY {id} DESC LIMIT :candidates
+"""
+
+# Matches older than those, unranked (score 0)
+OLDER_MATCHES = """
+    SELECT {id} AS id, 0.0 AS score FROM {source} WHERE {match}{filters} AND {id} < (
+        SELECT min(id) FROM (SELECT {id} AS id FROM {source} WHERE {match}{filters} ORDER BY {id} DESC LIMIT :candidates) AS newest
+    )
+"""
+
+FTS_SOURCES = {
+    'fts5': ('document_fts.rowid', f"bm25(document_fts, {FTS_WEIGHTS})", 'document_fts', 'document_fts MATCH :match'),
+    'tsvector': ('document_search.document_id', '-ts_rank_cd(search_vector, query)',
+                 "document_search CROSS JOIN to_tsquery('simple', :match) AS query", 'search_vector @@ query'),
+}
+
+
+# Fields whose change requires rebuilding a document's search row
+INDEXED_FIELDS = {Document: ('document_number', 'notes', 'client_id'), DocumentItem: ('description', 'document_id'),
+                  Client: ('name', 'company')}
+
+
+def create_document_search_index(conn):
+    """Create the search index if it is missing and index every document"""
+    dialect = conn.dialect.name
+
+    if dialect == 'sqlite':
+        if not conn.execute(text("SELECT sqlite_compileoption_used('ENABLE_FTS5')")).scalar():
+            logging.warning("SQLite was built without FTS5; document search will use LIKE")
+            return
+        if not _sqlite_fts_exists(conn):
+            for statement in SQLITE_SETUP:
+                conn.execute(text(statement))
+    elif dialect == 'postgresql':
+        for statement in PG_SETUP:
+            conn.execute(text(statement))
+    else:
+        return
+
+    detect_document_search(conn)
+    rebuild_document_search(conn)
+
+
+def rebuild_document_search(conn):
+    """Reindex every document"""
+    if detect_document_search(conn) in STATEMENTS:
+        rows, _, delete_all = STATEMENTS[_backend]
+        conn.execute(text(delete_all))
+        conn.execute(text(rows))
+
+
+def detect_document_search(conn):
+    """Pick the search strategy for this process based on what the schema provides"""
+    global _backend
+    dialect = conn.dialect.name
+
+    if dialect == 'sqlite':
+        _backend = 'fts5' if _sqlite_fts_exists(conn) else 'like'
+    elif dialect == 'postgresql':
+        _backend = 'tsvector' if conn.execute(text("SELECT to_regclass('document_search')")).scalar() else 'like'
+    else:
+        _backend = 'like'
+    return _backend
+
+
+def _sqlite_fts_exists(conn):
+    return conn.execute(text(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'document_fts'"
+    )).first() is not None
+
+
+def index_documents(conn, document_ids):
+    """Rebuild the search rows of ``document_ids``; deleted documents just lose theirs"""
+    document_ids = sorted(set(document_ids))
+    if not document_ids:
+        return
+    if _backend is None:
+        detect_document_search(conn)
+    if _backend not in STATEMENTS:
+        return
+
+    rows, delete, _ = STATEMENTS[_backend]
+    rows = text(rows + " WHERE d.id IN :ids").bindparams(bindparam('ids', expanding=True))
+    delete = text(delete).bindparams(bindparam('ids', expanding=True))
+    for start in range(0, len(document_ids), INDEX_BATCH_SIZE):
+        batch = document_ids[start:start + INDEX_BATCH_SIZE]
+        conn.execute(delete, {'ids': batch})
+        conn.execute(rows, {'ids': batch})
+
+
+def index_client_documents(conn, client_ids):
+    """Rebuild the search rows of every document of ``client_ids`` (after a rename)"""
+    client_ids = list(client_ids)
+    if client_ids and _backend != 'like':
+        index_documents(conn, conn.execute(select(Document.id).where(Document.client_id.in_(client_ids))).scalars())
+
+
+def _changed(obj):
+    state = inspect(obj)
+    return any(state.attrs[name].history.has_changes() for name in INDEXED_FIELDS[type(obj)])
+
+
+@event.listens_for(db.session, 'after_flush')
+def index_flushed_documents(session, flush_context):
+    document_ids = set()
+    client_ids = set()
+    dirty = session.dirty
+    for obj in chain(session.new, dirty, session.deleted):
+        if type(obj) not in INDEXED_FIELDS or (obj in dirty and not _changed(obj)):
+            continue
+        if isinstance(obj, Document):
+            document_ids.add(obj.id)
+        elif isinstance(obj, DocumentItem):
+            document_ids.add(obj.document_id)
+            # An item moved to another document changes both
+            previous = inspect(obj).attrs.document_id.history.deleted
+            document_ids.update(document_id for document_id in previous if document_id is not None)
+        elif obj in dirty:
+            client_ids.add(obj.id)
+
+    if document_ids or client_ids:
+        conn = session.connection()
+        index_documents(conn, document_ids)
+        index_client_documents(conn, client_ids)
+
+
+def search_documents(query, max_candidates=10000, statuses=None, document_types=None):
+    """(ranked, older) subqueries of (id, score) for documents matching every term of ``query``, or None without terms
+
+    Lower scores rank higher; order each by (score, id DESC). Terms match
+    as prefixes, in any indexed field; ``statuses`` and ``document_types``
+    narrow the matches before anything is ranked. Only the newest
+    ``max_candidates`` matches are scored (``ranked``): a term common
+    enough to match more carries almost no weight in the ranking, and
+    scoring every match would make such queries linear in the table size.
+    The rest (``older``, None when nothing is capped) come after all of
+    them, with score 0 and lower ids, so one (score, id) cursor pages
+    through both.
+    """
+    terms = search_terms(query)
+    if not terms:
+        return None
+
+    if _backend is None:
+        with db.engine.connect() as conn:
+            detect_document_search(conn)
+
+    if _backend in FTS_SOURCES:
+        id_column, score, source, condition = FTS_SOURCES[_backend]
+        if _backend == 'fts5':
+            match = ' '.join(f'"{term}"*' for term in terms)
+        else:
+            match = ' & '.join(f'{term}:*' for term in terms)
+        filters = ''
+        params = {'match': match, 'candidates': max_candidates}
+        if statuses or document_types:
+            source += f" JOIN document d ON d.id = {id_column}"
+        if statuses:
+            filters += ' AND d.status IN :statuses'
+            params['statuses'] = list(statuses)
+        if document_types:
+            filters += ' AND d.document_type IN :document_types'
+            params['document_types'] = list(document_types)
+        expanding = [bindparam(name, expanding=True) for name in ('statuses', 'document_types') if name in params]
+        ranked, older = (
+            text(sql.format(id=id_column, score=score, source=source, match=condition, filters=filters)).bindparams(
+                *expanding, **params).columns(id=Integer, score=Float).subquery(name)
+            for sql, name in ((RANKED_MATCHES, 'ranked'), (OLDER_MATCHES, 'older'))
+        )
+        return ranked, older
+
+    conditions = []
+    for term in terms:
+        pattern = f"%{term}%"
+        conditions.append(or_(
+            Document.document_number.ilike(pattern),
+            Document.notes.ilike(pattern),
+            Document.client_id.in_(select(Client.id).where(or_(Client.name.ilike(pattern), Client.company.ilike(pattern)))),
+            exists().where(DocumentItem.document_id == Document.id, DocumentItem.description.ilike(pattern)),
+        ))
+    if statuses:
+        conditions.append(Document.status.in_(statuses))
+    if document_types:
+        conditions.append(Document.document_type.in_(document_types))
+    return select(Document.id.label('id'), literal(0.0, Float).label('score')).where(and_(*conditions)).subquery('ranked'), None
@@ -0,0 +1,14 @@
+"""Extension objects shared by the models and services.
+
+Kept apart from ``app`` so importing a model or a service does not build
+an application; ``create_app`` binds them to one.
+"""
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.orm import DeclarativeBase
+
+
+class Base(DeclarativeBase):
+    pass
+
+
+db = SQLAlchemy(model_class=Base)
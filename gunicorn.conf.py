@@ -0,0 +1,61 @@
+"""Production gunicorn settings (``gunicorn main:app`` picks this file up).
+
+Requests are either cheap JSON/DB work or waits on a PDF render that runs in
+the render pool's processes (``render_pool.py``), so web workers are
+threaded (``gthread``): a thread blocked on a render or the database costs
+little, and a few processes with several threads each serve both kinds of
+request without a slow render holding up a whole worker. Each web worker
+gets its own render pool; PDF_RENDER_WORKERS defaults to an even share of
+the CPUs so the pools together do not oversubscribe them.
+
+The app is preloaded in the master and every worker is warmed up
+(``warmup.py``) before it accepts connections, so restarts and reloads
+never hand a cold worker the first PDF.
+
+Graceful reloads:
+- ``kill -HUP <master>`` rereads this file and replaces the workers. New
+  workers warm up first; old ones finish in-flight requests within
+  ``graceful_timeout``. Application code is not reloaded (it is preloaded).
+- To deploy new code without downtime: ``kill -USR2 <master>`` starts a new
+  master with the new code next to the old one; once its workers are up,
+  ``kill -WINCH <old master>`` then ``kill -QUIT <old master>``.
+"""
+import multiprocessing
+import os
+
+cpus = multiprocessing.cpu_count()
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+worker_class = 'gthread'
+workers = int(os.environ.get('WEB_CONCURRENCY', max(2, min(cpus, 4))))
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+preload_app = True
+
+# Longer than PDF_RENDER_TIMEOUT so a slow render times out in the app, with a proper error
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 90))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+
+# Recycle workers to bound memory growth (0 disables); jitter avoids restarting all at once
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 0))
+max_requests_jitter = max_requests // 10
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-')
+loglevel = os.environ.get('LOG_LEVEL', 'info').lower()
+
+os.environ.setdefault('PDF_RENDER_WORKERS', str(max(1, cpus // workers)))
+
+
+def when_ready(server):
+    # Runs in the master once the app is loaded, before any worker is forked
+    from warmup import preload
+    preload(server.app.wsgi())
+
+
+def post_worker_init(worker):
+    # Runs in each worker before it starts accepting connections
+    from warmup import warm_up
+    try:
+        warm_up(worker.wsgi, connections=threads)
+    except Exception as e:
+        worker.log.error(f"Warm-up failed, serving cold: {e}")
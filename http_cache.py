@@ -0,0 +1,154 @@
+"""Conditional GETs, response compression and fingerprinted static URLs.
+
+- API views compute a weak ETag from the ``updated_at`` of the rows they
+  return (``row_etag``) and answer ``If-None-Match`` with 304 through
+  ``not_modified`` before serializing anything.
+- ``init_app`` compresses JSON, text, JavaScript and SVG responses larger
+  than ``COMPRESS_MIN_SIZE`` with brotli (when the ``brotli`` package is
+  installed and the client accepts it) or gzip.
+- ``url_for('static', ...)`` gets a ``v`` query parameter holding a hash of
+  the file contents. Requests carrying the current hash are served with a
+  one-year ``immutable`` Cache-Control, so browsers never revalidate them;
+  a changed file gets a new URL.
+"""
+import gzip
+import hashlib
+import os
+import threading
+from flask import Response, request
+
+COMPRESSIBLE_MIMETYPES = {
+    'application/json', 'application/javascript', 'application/manifest+json',
+    'application/x-ndjson', 'image/svg+xml', 'text/css', 'text/csv', 'text/html',
+    'text/javascript', 'text/plain',
+}
+
+_brotli = None
+_static_hashes = {}
+_compressed_static = {}
+_lock = threading.Lock()
+
+
+def brotli_module():
+    """The brotli module, or None when it is not installed"""
+    global _brotli
+    if _brotli is None:
+        try:
+            import brotli
+            _brotli = brotli
+        except ImportError:
+            _brotli = False
+    return _brotli or None
+
+
+def row_etag(*rows):
+    """Weak ETag for a response built from ``rows`` of (id, updated_at) plus the request URL"""
+    digest = hashlib.sha1(request.full_path.encode('utf-8'))
+    for row in rows:
+        digest.update(repr(tuple(row)).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def not_modified(etag):
+    """304 response if the client already has ``etag``, else None"""
+    if request.if_none_match.contains_weak(etag):
+        return with_etag(Response(status=304), etag)
+    return None
+
+
+def with_etag(response, etag):
+    """Attach ``etag`` and make clients revalidate before reusing the response"""
+    response.set_etag(etag, weak=True)
+    response.cache_control.no_cache = True
+    response.cache_control.private = True
+    return response
+
+
+def static_hash(static_folder, filename):
+    """Short content hash of a static file, recomputed when its mtime changes"""
+    path = os.path.join(static_folder, filename)
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+    cached = _static_hashes.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    with open(path, 'rb') as f:
+        value = hashlib.sha256(f.read()).hexdigest()[:12]
+    _static_hashes[path] = (mtime, value)
+    return value
+
+
+def _encoding():
+    accepted = request.accept_encodings
+    if brotli_module() and accepted['br']:
+        return 'br'
+    if accepted['gzip']:
+        return 'gzip'
+    return None
+
+
+def _compress(data, encoding, level):
+    if encoding == 'br':
+        return brotli_module().compress(data, quality=min(level, 11))
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+def init_app(app):
+    """Install the static URL fingerprinting and compression hooks"""
+    min_size = app.config['COMPRESS_MIN_SIZE']
+    level = app.config['COMPRESS_LEVEL']
+    static_max_age = app.config['STATIC_MAX_AGE']
+
+    @app.url_defaults
+    def fingerprint_static_urls(endpoint, values):
+        if endpoint == 'static' and 'filename' in values and 'v' not in values:
+            value = static_hash(app.static_folder, values['filename'])
+            if value:
+                values['v'] = value
+
+    @app.after_request
+    def cache_and_compress(response):
+        is_static = request.endpoint == 'static'
+        if is_static and request.args.get('v') and response.status_code in (200, 304):
+            if request.args['v'] == static_hash(app.static_folder, request.view_args['filename']):
+                response.cache_control.no_cache = None
+                response.cache_control.public = True
+                response.cache_control.max_age = static_max_age
+                response.cache_control.immutable = True
+
+        if (response.status_code != 200 or response.mimetype not in COMPRESSIBLE_MIMETYPES
+                or (response.is_streamed and not is_static)
+                or 'Content-Encoding' in response.headers or request.range):
+            return response
+        response.vary.add('Accept-Encoding')
+        encoding = _encoding()
+        if encoding is None:
+            return response
+
+        if is_static:
+            response.direct_passthrough = False
+        body = response.get_data()
+        if len(body) < min_size:
+            return response
+
+        if is_static:
+            # Static files are compressed once per content hash
+            filename = request.view_args['filename']
+            key = (filename, static_hash(app.static_folder, filename), encoding)
+            data = _compressed_static.get(key)
+            if data is None:
+                data = _compress(body, encoding, level)
+                with _lock:
+                    _compressed_static[key] = data
+        else:
+            data = _compress(body, encoding, level)
+
+        response.set_data(data)
+        response.headers['Content-Encoding'] = encoding
+        # The ETag names the uncompressed representation
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
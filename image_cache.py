@@ -0,0 +1,134 @@
+"""Process-wide cache for logo and signature images used in PDFs.
+
+Entries are keyed by URL or file path and evicted least-recently-used once
+the cached bytes exceed ``max_bytes``. Remote images are served from memory
+for ``fresh_for`` seconds and then revalidated with a conditional GET
+(ETag / Last-Modified), so an unchanged letterhead costs a 304 at most.
+Local files are revalidated against their mtime and size. ``requests`` is
+imported on the first remote fetch.
+"""
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+ImageAsset = namedtuple('ImageAsset', ['data', 'digest'])
+
+
+class _Entry:
+    __slots__ = ('asset', 'etag', 'last_modified', 'checked_at', 'stat')
+
+    def __init__(self, asset, etag=None, last_modified=None, stat=None):
+        self.asset = asset
+        self.etag = etag
+        self.last_modified = last_modified
+        self.stat = stat
+        self.checked_at = time.monotonic()
+
+
+class ImageCache:
+    def __init__(self, max_bytes=32 * 1024 * 1024, fresh_for=300, timeout=10, pool_size=10):
+        self.max_bytes = max_bytes
+        self.fresh_for = fresh_for
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.total_bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._session = None
+
+    @property
+    def session(self):
+        if self._session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            self._session = session
+        return self._session
+
+    def get(self, source):
+        """Return the ImageAsset for a URL or file path, fetching it if needed"""
+        with self._lock:
+            entry = self._entries.get(source)
+            if entry is not None:
+                self._entries.move_to_end(source)
+
+        if source.startswith(('http://', 'https://')):
+            entry = self._fetch_url(source, entry)
+        else:
+            entry = self._read_file(source, entry)
+
+        self._store(source, entry)
+        return entry.asset
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.total_bytes = 0
+
+    def _fetch_url(self, url, entry):
+        if entry is not None and time.monotonic() - entry.checked_at < self.fresh_for:
+            return entry
+
+        headers = {}
+        if entry is not None:
+            if entry.etag:
+                headers['If-None-Match'] = entry.etag
+            if entry.last_modified:
+                headers['If-Modified-Since'] = entry.last_modified
+
+        import requests
+        try:
+            response = self.session.get(url, headers=headers, timeout=self.timeout)
+            if response.status_code == 304 and entry is not None:
+                entry.checked_at = time.monotonic()
+                return entry
+            response.raise_for_status()
+        except requests.RequestException as e:
+            if entry is None:
+                raise
+            # Keep serving the last good copy while the image host is down
+            logging.warning(f"Could not revalidate image {url}, using cached copy: {e}")
+            entry.checked_at = time.monotonic()
+            return entry
+
+        return _Entry(
+            _make_asset(response.content),
+            etag=response.headers.get('ETag'),
+            last_modified=response.headers.get('Last-Modified')
+        )
+
+    def _read_file(self, path, entry):
+        st = os.stat(path)
+        stat = (st.st_mtime_ns, st.st_size)
+        if entry is not None and entry.stat == stat:
+            return entry
+
+        with open(path, 'rb') as f:
+            return _Entry(_make_asset(f.read()), stat=stat)
+
+    def _store(self, key, entry):
+        size = len(entry.asset.data)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.total_bytes -= len(old.asset.data)
+
+            # Images larger than the whole budget are served but not kept
+            if size > self.max_bytes:
+                return
+
+            self._entries[key] = entry
+            self.total_bytes += size
+            while self.total_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.total_bytes -= len(evicted.asset.data)
+
+
+def _make_asset(data):
+    return ImageAsset(data, hashlib.sha256(data).hexdigest())
@@ -0,0 +1,156 @@
+"""Letterhead and signature blocks laid out once and reused by every render.
+
+The business header (logo, name, address, email and phone) and the
+signature image only change when BusinessSettings do, so each is built and
+wrapped once per process and cached under a key made of the fields and
+image digests it is drawn from. A settings change produces a new key, so
+stale blocks are never reused and simply age out of the LRU.
+
+Renders get a small ``CachedBlock`` wrapper whose ``wrap`` returns the
+cached size; drawing replays the shared flowable under a lock, since
+ReportLab flowables keep per-draw state. With ``letterhead_every_page`` the
+header is drawn once per document into a form XObject and placed at the
+top of every page instead of flowing with the story.
+"""
+import hashlib
+import io
+import logging
+import threading
+from collections import OrderedDict
+from reportlab.platypus import Flowable, Image, Paragraph, Table
+from reportlab.lib.units import inch
+
+CACHE_SIZE = 32
+
+# Space between a page-level letterhead and the body frame
+PAGE_LETTERHEAD_GAP = 30
+
+FORM_NAME = 'letterhead'
+
+_blocks = OrderedDict()
+_lock = threading.Lock()
+
+
+class _Prepared:
+    __slots__ = ('flowable', 'width', 'height', 'lock')
+
+    def __init__(self, flowable, width, height):
+        self.flowable = flowable
+        self.width = width
+        self.height = height
+        self.lock = threading.Lock()
+
+
+class CachedBlock(Flowable):
+    """Flowable drawing a block that was wrapped ahead of time"""
+
+    def __init__(self, prepared, h_align='CENTER'):
+        super().__init__()
+        self._prepared = prepared
+        self.width = prepared.width
+        self.height = prepared.height
+        self.hAlign = h_align
+
+    def wrap(self, availWidth, availHeight):
+        return self.width, self.height
+
+    def draw(self):
+        self.draw_at(self.canv, 0, 0)
+
+    def draw_at(self, canvas, x, y):
+        with self._prepared.lock:
+            self._prepared.flowable.drawOn(canvas, x, y)
+
+
+def _digest(spec, name):
+    digest = spec.get('image_digests', {}).get(name)
+    data = spec.get('images', {}).get(name)
+    if digest is None and data:
+        digest = hashlib.sha256(data).hexdigest()
+    return digest
+
+
+def _cached(key, build):
+    with _lock:
+        prepared = _blocks.get(key)
+        if prepared is not None:
+            _blocks.move_to_end(key)
+            return prepared
+
+    prepared = build()
+    with _lock:
+        _blocks[key] = prepared
+        while len(_blocks) > CACHE_SIZE:
+            _blocks.popitem(last=False)
+    return prepared
+
+
+def _image(data, name):
+    try:
+        return Image(io.BytesIO(data), width=1.5*inch, height=0.75*inch)
+    except Exception as e:
+        logging.warning(f"Could not load {name} image: {e}")
+        return None
+
+
+def letterhead(spec, template, avail_width):
+    """The business header block for ``spec``"""
+    fields = tuple(spec.get(field, default) or '' for field, default in (
+        ('business_name', 'Business Name'), ('business_address', ''),
+        ('business_email', ''), ('business_phone', '')
+    ))
+    key = ('letterhead', template.key, avail_width, fields, _digest(spec, 'logo'))
+
+    def build():
+        business_name, business_address, business_email, business_phone = fields
+        business_info_lines = [f"<b>{business_name}</b>"]
+        if business_address:
+            business_info_lines.append(business_address.replace('\n', '<br/>'))
+        if business_email:
+            business_info_lines.append(f"Email: {business_email}")
+        if business_phone:
+            business_info_lines.append(f"Phone: {business_phone}")
+        business_info = Paragraph("<br/>".join(business_info_lines), template.styles['body'])
+
+        logo_data = spec.get('images', {}).get('logo')
+        logo = (_image(logo_data, 'logo') if logo_data else None) or ""
+
+        table = Table([[logo, business_info]], colWidths=template.col_widths['header'])
+        table.setStyle(template.table_styles['header'])
+        width, height = table.wrap(avail_width, template.pagesize[1])
+        return _Prepared(table, width, height)
+
+    return CachedBlock(_cached(key, build))
+
+
+def signature(spec):
+    """The right-aligned signature block, or None without a usable image"""
+    data = spec.get('images', {}).get('signature')
+    if not data:
+        return None
+    key = ('signature', _digest(spec, 'signature'))
+
+    def build():
+        image = _image(data, 'signature')
+        if image is None:
+            return None
+        width, height = image.wrap(0, 0)
+        return _Prepared(image, width, height)
+
+    prepared = _cached(key, build)
+    return CachedBlock(prepared, h_align='RIGHT') if prepared else None
+
+
+def page_letterhead(block, top_margin):
+    """onPage callback drawing ``block`` above the body frame of every page"""
+    def draw(canvas, doc):
+        if not canvas.hasForm(FORM_NAME):
+            canvas.beginForm(FORM_NAME, 0, 0, block.width, block.height)
+            block.draw_at(canvas, 0, 0)
+            canvas.endForm()
+        canvas.saveState()
+        canvas.translate(doc.leftMargin + (doc.width - block.width) / 2,
+                         doc.pagesize[1] - top_margin - block.height)
+        canvas.doForm(FORM_NAME)
+        canvas.restoreState()
+    return draw
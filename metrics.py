@@ -0,0 +1,162 @@
+"""Request, SQL and PDF render metrics in Prometheus text format.
+
+``init_app`` times every request per route and counts the SQL statements
+(and time spent in them) each request runs, using SQLAlchemy cursor
+events. PDF renders report their phases through ``observe_pdf_phase``.
+``render_latest`` produces the exposition text served on ``/metrics``.
+Requests slower than ``SLOW_REQUEST_MS`` are logged with their SQL totals.
+
+Metrics live in the process that records them: behind several gunicorn
+workers each scrape sees one worker, so scrape each worker or aggregate
+with ``sum`` in the query.
+"""
+import bisect
+import logging
+import threading
+import time
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+
+_registry = []
+
+
+def _format_labels(names, values):
+    if not names:
+        return ''
+    pairs = ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return '{' + pairs + '}'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, '') for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def collect(self):
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} counter"
+        with self._lock:
+            values = sorted(self._values.items())
+        for key, value in values:
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {value}"
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, '') for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[index] += 1
+            self._values[key] = (counts, total + value)
+
+    def collect(self):
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            values = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+        names = self.labelnames + ('le',)
+        for key, (counts, total) in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                yield f"{self.name}_bucket{_format_labels(names, key + (bound,))} {cumulative}"
+            labels = _format_labels(self.labelnames, key)
+            yield f"{self.name}_sum{labels} {total}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+
+REQUEST_SECONDS = Histogram(
+    'http_request_duration_seconds', 'Time to produce a response, by route', ('method', 'route', 'status'))
+REQUEST_QUERIES = Histogram(
+    'http_request_db_queries', 'SQL statements executed per request', ('route',), QUERY_COUNT_BUCKETS)
+REQUEST_DB_SECONDS = Histogram(
+    'http_request_db_seconds', 'Time spent in SQL per request', ('route',))
+DB_QUERIES = Counter('db_queries_total', 'SQL statements executed')
+DB_SECONDS = Counter('db_query_seconds_total', 'Time spent executing SQL statements')
+PDF_PHASE_SECONDS = Histogram(
+    'pdf_render_phase_seconds', 'Time spent in each phase of a PDF render', ('phase',))
+PDF_RENDERS = Counter('pdf_renders_total', 'PDF render requests, by outcome', ('result',))
+
+
+def observe_pdf_phase(phase, seconds):
+    PDF_PHASE_SECONDS.observe(seconds, phase=phase)
+
+
+def render_latest():
+    return '\n'.join(line for metric in _registry for line in metric.collect()) + '\n'
+
+
+def _route():
+    return request.url_rule.rule if request.url_rule else 'unmatched'
+
+
+def init_app(app, engine):
+    """Install request timing hooks on the app and SQL hooks on the engine"""
+    slow_request_seconds = app.config.get('SLOW_REQUEST_MS', 0) / 1000.0
+
+    # The start time lives on the execution context, so a failed statement leaves nothing behind
+    @event.listens_for(engine, 'before_cursor_execute')
+    def start_query_timer(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context.metrics_query_start = time.perf_counter()
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def stop_query_timer(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, 'metrics_query_start', None)
+        if started is None:
+            return
+        elapsed = time.perf_counter() - started
+        DB_QUERIES.inc()
+        DB_SECONDS.inc(elapsed)
+        if has_request_context() and 'metrics_started' in g:
+            g.metrics_queries += 1
+            g.metrics_query_seconds += elapsed
+
+    @app.before_request
+    def start_request_timer():
+        g.metrics_started = time.perf_counter()
+        g.metrics_queries = 0
+        g.metrics_query_seconds = 0.0
+
+    @app.after_request
+    def record_request(response):
+        if 'metrics_started' not in g:
+            return response
+        elapsed = time.perf_counter() - g.metrics_started
+        route = _route()
+        REQUEST_SECONDS.observe(elapsed, method=request.method, route=route, status=response.status_code)
+        REQUEST_QUERIES.observe(g.metrics_queries, route=route)
+        REQUEST_DB_SECONDS.observe(g.metrics_query_seconds, route=route)
+
+        if slow_request_seconds and elapsed >= slow_request_seconds:
+            logging.warning(
+                f"Slow request: {request.method} {request.full_path.rstrip('?')} took {elapsed * 1000:.0f} ms "
+                f"({g.metrics_queries} queries, {g.metrics_query_seconds * 1000:.0f} ms in SQL)"
+            )
+        return response
@@ -0,0 +1,131 @@
+"""Versioned schema migrations.
+
+``db.create_all()`` only creates missing tables, so anything added to an
+existing table (indexes, columns, triggers) is applied here. Each migration
+is a function taking a connection; ``run_migrations`` applies the ones newer
+than the version recorded in ``schema_version``, each in its own
+transaction, and records them. Migrations must be safe to run on a
+database freshly built by ``create_all`` (use IF NOT EXISTS / checkfirst).
+"""
+import logging
+from datetime import datetime
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, func, inspect, select, text, update
+from models import BusinessSettings, ChangeLog, Client, Document, DocumentItem
+
+metadata = MetaData()
+schema_version = Table(
+    'schema_version', metadata,
+    Column('version', Integer, primary_key=True),
+    Column('description', String(200), nullable=False),
+    Column('applied_at', DateTime, nullable=False, default=datetime.utcnow),
+)
+
+MIGRATIONS = []
+
+
+def migration(version, description):
+    def decorator(func):
+        MIGRATIONS.append((version, description, func))
+        MIGRATIONS.sort(key=lambda m: m[0])
+        return func
+    return decorator
+
+
+def _create_indexes(conn, table, names):
+    for index in table.indexes:
+        if index.name in names:
+            index.create(conn, checkfirst=True)
+
+
+@migration(1, 'Indexes for document, item and client query patterns')
+def add_query_indexes(conn):
+    _create_indexes(conn, Document.__table__, {
+        'ix_document_client_issue', 'ix_document_issue_date',
+        'ix_document_status_issue', 'ix_document_type_issue',
+    })
+    _create_indexes(conn, DocumentItem.__table__, {'ix_document_item_document_order'})
+    _create_indexes(conn, Client.__table__, {'ix_client_name_id', 'ix_client_email'})
+
+
+@migration(2, 'Client full-text search index')
+def add_client_search(conn):
+    from client_search import create_client_search_index
+    create_client_search_index(conn)
+
+
+@migration(3, 'Document currency column')
+def add_document_currency(conn):
+    if 'currency_code' not in {column['name'] for column in inspect(conn).get_columns('document')}:
+        conn.execute(text("ALTER TABLE document ADD COLUMN currency_code VARCHAR(10) DEFAULT 'USD'"))
+    # Existing documents were issued in the business currency
+    currency = conn.execute(select(BusinessSettings.currency_code).limit(1)).scalar() or 'USD'
+    conn.execute(update(Document).where(Document.currency_code.is_(None)).values(currency_code=currency))
+
+
+@migration(4, 'Revenue and receivables summaries')
+def build_summaries(conn):
+    from reporting import rebuild_summaries
+    rebuild_summaries(conn)
+
+
+@migration(5, 'Change log for /api/sync')
+def add_change_log(conn):
+    from changelog import seed_changelog
+    ChangeLog.__table__.create(conn, checkfirst=True)
+    seed_changelog(conn)
+
+
+@migration(6, 'Document full-text search index')
+def add_document_search(conn):
+    from document_search import create_document_search_index
+    create_document_search_index(conn)
+
+
+@migration(7, 'Change log transaction ids')
+def add_change_log_txid(conn):
+    if 'txid' not in {column['name'] for column in inspect(conn).get_columns('change_log')}:
+        conn.execute(text("ALTER TABLE change_log ADD COLUMN txid BIGINT"))
+    if conn.dialect.name == 'postgresql':
+        # Existing entries are committed; 0 sorts them first, in id order
+        conn.execute(text("UPDATE change_log SET txid = 0 WHERE txid IS NULL"))
+        conn.execute(text("ALTER TABLE change_log ALTER COLUMN txid SET DEFAULT pg_current_xact_id()::text::bigint"))
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_change_log_txid ON change_log (txid, id)"))
+
+
+@migration(8, 'Document number sequences back to INCREMENT 1')
+def reset_document_number_sequences(conn):
+    if conn.dialect.name != 'postgresql':
+        return
+    sequences = conn.execute(text(
+        "SELECT sequencename, increment_by, last_value FROM pg_sequences "
+        "WHERE schemaname = current_schema() AND sequencename LIKE 'document\\_number\\_seq\\_%'"
+    )).all()
+    for name, increment, last_value in sequences:
+        if increment == 1:
+            continue
+        conn.execute(text(f"ALTER SEQUENCE {name} INCREMENT BY 1"))
+        if last_value is not None:
+            # The block that began at last_value may still be in use
+            conn.execute(text(f"SELECT setval('{name}', {last_value + increment - 1})"))
+
+
+def current_version(conn):
+    metadata.create_all(conn, tables=[schema_version])
+    return conn.execute(select(func.max(schema_version.c.version))).scalar() or 0
+
+
+def run_migrations(engine):
+    """Apply pending migrations; return the list of versions applied"""
+    with engine.begin() as conn:
+        version = current_version(conn)
+
+    applied = []
+    for number, description, func in MIGRATIONS:
+        if number <= version:
+            continue
+        with engine.begin() as conn:
+            func(conn)
+            conn.execute(schema_version.insert().values(version=number, description=description))
+        logging.info(f"Applied migration {number}: {description}")
+        applied.append(number)
+    return applied
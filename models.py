@@ -1,4 +1,4 @@
-from app import db
+from extensions import db
 from datetime import datetime
 import json
 
@@ -38,6 +38,11 @@ class BusinessSettings(db.Model):
         }
 
 class Client(db.Model):
+    __table_args__ = (
+        db.Index('ix_client_name_id', 'name', 'id'),  # keyset pagination order
+        db.Index('ix_client_email', 'email'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(200), nullable=False)
     email = db.Column(db.String(120), default="")
@@ -58,6 +63,13 @@ class Client(db.Model):
         }
 
 class Document(db.Model):
+    __table_args__ = (
+        db.Index('ix_document_client_issue', 'client_id', 'issue_date'),
+        db.Index('ix_document_issue_date', 'issue_date'),
+        db.Index('ix_document_status_issue', 'status', 'issue_date'),
+        db.Index('ix_document_type_issue', 'document_type', 'issue_date'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     document_type = db.Column(db.String(20), nullable=False)  # invoice, quote, receipt
     document_number = db.Column(db.String(50), nullable=False, unique=True)
@@ -70,10 +82,31 @@ class Document(db.Model):
     total_amount = db.Column(db.Float, default=0.0)
     notes = db.Column(db.Text, default="")
     status = db.Column(db.String(20), default="draft")  # draft, sent, paid, cancelled
+    currency_code = db.Column(db.String(10), default="USD")
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'document_type': self.document_type,
+            'document_number': self.document_number,
+            'client_id': self.client_id,
+            'issue_date': self.issue_date.isoformat() if self.issue_date else None,
+            'due_date': self.due_date.isoformat() if self.due_date else None,
+            'subtotal': self.subtotal,
+            'tax_amount': self.tax_amount,
+            'total_amount': self.total_amount,
+            'notes': self.notes,
+            'status': self.status,
+            'currency_code': self.currency_code
+        }
+
 class DocumentItem(db.Model):
+    __table_args__ = (
+        db.Index('ix_document_item_document_order', 'document_id', 'order_index'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     document_id = db.Column(db.Integer, db.ForeignKey('document.id'), nullable=False)
     document = db.relationship('Document', backref=db.backref('items', lazy=True, cascade='all, delete-orphan'))
@@ -82,3 +115,64 @@ class DocumentItem(db.Model):
     unit_price = db.Column(db.Float, default=0.0)
     total_price = db.Column(db.Float, default=0.0)
     order_index = db.Column(db.Integer, default=0)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'description': self.description,
+            'quantity': self.quantity,
+            'unit_price': self.unit_price,
+            'total_price': self.total_price,
+            'order_index': self.order_index
+        }
+
+class DocumentSequence(db.Model):
+    """Per-document-type counter used by the document number allocator (SQLite and other non-PostgreSQL backends)"""
+    name = db.Column(db.String(50), primary_key=True)
+    next_value = db.Column(db.BigInteger, nullable=False, default=1)
+
+class RevenueSummary(db.Model):
+    """Document totals per client, month, status, currency and type; kept current by reporting.py"""
+    client_id = db.Column(db.Integer, primary_key=True)
+    period = db.Column(db.String(7), primary_key=True)  # YYYY-MM of the issue date
+    status = db.Column(db.String(20), primary_key=True)
+    currency_code = db.Column(db.String(10), primary_key=True)
+    document_type = db.Column(db.String(20), primary_key=True)
+    document_count = db.Column(db.Integer, nullable=False, default=0)
+    subtotal = db.Column(db.Float, nullable=False, default=0.0)
+    tax_amount = db.Column(db.Float, nullable=False, default=0.0)
+    total_amount = db.Column(db.Float, nullable=False, default=0.0)
+
+class ReceivableSummary(db.Model):
+    """Outstanding invoice totals per client, currency and due date; kept current by reporting.py"""
+    client_id = db.Column(db.Integer, primary_key=True)
+    currency_code = db.Column(db.String(10), primary_key=True)
+    due_date = db.Column(db.Date, primary_key=True)
+    document_count = db.Column(db.Integer, nullable=False, default=0)
+    total_amount = db.Column(db.Float, nullable=False, default=0.0)
+
+class ChangeLog(db.Model):
+    """One row per created, updated or deleted client, document or settings row; feeds /api/sync (see changelog.py)"""
+    __table_args__ = (
+        db.Index('ix_change_log_entity', 'entity', 'entity_id', 'id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)  # the sync cursor
+    entity = db.Column(db.String(20), nullable=False)  # client, document, settings
+    entity_id = db.Column(db.Integer, nullable=False)
+    operation = db.Column(db.String(10), nullable=False)  # upsert, delete
+    changed_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    txid = db.Column(db.BigInteger)  # writing transaction, PostgreSQL only (see changelog.py)
+
+
+class SyncRef(db.Model):
+    """Client-generated ref of a record created through POST /api/sync, so a retried upload returns the same row"""
+    __table_args__ = (
+        db.UniqueConstraint('entity', 'ref', name='uq_sync_ref_entity_ref'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    entity = db.Column(db.String(20), nullable=False)  # client, document
+    ref = db.Column(db.String(100), nullable=False)
+    entity_id = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
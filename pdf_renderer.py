@@ -0,0 +1,299 @@
+"""Render business documents to PDF bytes.
+
+Everything in this module works on a plain-data render spec (the JSON body
+posted to /api/generate-pdf after defaults are resolved) so that renders can
+run in a separate worker process without touching the database or Flask.
+Logo and signature images arrive already loaded as bytes in ``spec['images']``.
+Styles and column widths come from the template named by ``spec['template']``.
+The letterhead and signature blocks are cached across renders by
+``letterhead``; ``spec['letterhead_every_page']`` repeats the letterhead at
+the top of every page.
+Pass a dict as ``timings`` to get the story-build and ``doc.build`` seconds.
+"""
+import io
+import math
+import threading
+import time
+from reportlab.platypus import Flowable, SimpleDocTemplate, Paragraph, Spacer, Table
+from letterhead import PAGE_LETTERHEAD_GAP, letterhead, page_letterhead, signature
+from pdf_templates import get_template
+
+ITEMS_HEADER = ['Description', 'Qty', 'Unit Price', 'Total']
+
+_row_metrics = {}
+_row_metrics_lock = threading.Lock()
+
+
+def item_row(item, currency_symbol):
+    qty = float(item.get('quantity', 0))
+    price = float(item.get('unit_price', 0))
+    total = qty * price
+
+    # Format quantity to show as integer if it's a whole number
+    qty_str = f"{qty:g}"
+
+    return [
+        item.get('description', ''),
+        qty_str,
+        f"{currency_symbol}{price:,.2f}",
+        f"{currency_symbol}{total:,.2f}"
+    ]
+
+
+def row_metrics(template):
+    """(header height, single-line row height, extra height per line) for the items table"""
+    metrics = _row_metrics.get(template.key)
+    if metrics is None:
+        sample = Table([ITEMS_HEADER, ['x', '1', '1', '1'], ['x\nx', '1', '1', '1']],
+                       colWidths=template.col_widths['items'])
+        sample.setStyle(template.table_styles['items'])
+        sample.wrap(sum(template.col_widths['items']), template.pagesize[1])
+        header, single, double = sample._rowHeights
+        metrics = (header, single, double - single)
+        with _row_metrics_lock:
+            _row_metrics[template.key] = metrics
+    return metrics
+
+
+class ItemRows(Flowable):
+    """Line items from ``start`` on, split into one fixed-size table per page.
+
+    Row heights come from ``row_metrics`` and the number of lines in each
+    description, so ReportLab never measures cells, and each page's table
+    fits its frame exactly and is never split.
+    """
+
+    def __init__(self, items, template, currency_symbol, start=0):
+        super().__init__()
+        self.items = items
+        self.template = template
+        self.currency_symbol = currency_symbol
+        self.start = start
+        self.header_height, self.row_height, self.line_height = row_metrics(template)
+        self.width = sum(template.col_widths['items'])
+
+    def _row_heights(self, avail_height):
+        """Heights of the rows from ``start`` that fit in ``avail_height``"""
+        heights = []
+        used = self.header_height
+        for index in range(self.start, len(self.items)):
+            lines = str(self.items[index].get('description', '')).count('\n') + 1
+            height = self.row_height + (lines - 1) * self.line_height
+            if used + height > avail_height:
+                break
+            heights.append(height)
+            used += height
+        return heights, used
+
+    def wrap(self, availWidth, availHeight):
+        heights, used = self._row_heights(availHeight)
+        if self.start + len(heights) < len(self.items):
+            # More than fits: report the overflow so the frame calls split
+            used = availHeight + self.row_height
+        self.height = used
+        return self.width, used
+
+    def split(self, availWidth, availHeight):
+        heights, _ = self._row_heights(availHeight)
+        if not heights:
+            return []
+        end = self.start + len(heights)
+        page = self._table(self.items[self.start:end], heights)
+        if end >= len(self.items):
+            return [page]
+        return [page, ItemRows(self.items, self.template, self.currency_symbol, end)]
+
+    def _table(self, items, heights):
+        data = [ITEMS_HEADER] + [item_row(item, self.currency_symbol) for item in items]
+        table = Table(data, colWidths=self.template.col_widths['items'], rowHeights=[self.header_height] + heights)
+        table.setStyle(self.template.table_styles['items'])
+        return table
+
+    def draw(self):
+        # Only reached when every remaining row fits the current frame
+        heights, _ = self._row_heights(self.height)
+        table = self._table(self.items[self.start:], heights)
+        table.wrapOn(self.canv, self.width, self.height)
+        table.drawOn(self.canv, 0, 0)
+
+
+def render_pdf(spec, timings=None):
+    """Render a document spec and return the PDF as bytes"""
+    started = time.perf_counter()
+    template = get_template(spec.get('template'))
+    styles = template.styles
+    table_styles = template.table_styles
+    col_widths = template.col_widths
+
+    # Create PDF buffer
+    buffer = io.BytesIO()
+    left, right, top, bottom = template.margins
+    doc = SimpleDocTemplate(buffer, pagesize=template.pagesize, rightMargin=right, leftMargin=left, topMargin=top, bottomMargin=bottom)
+
+    # Build PDF content
+    story = []
+
+    document_type = spec.get('document_type', 'Document').title()
+    document_number = spec.get('document_number', 'DOC-001')
+    currency_symbol = spec.get('currency_symbol') or '$'
+
+    # Business header, laid out once per letterhead (see letterhead.py)
+    header = letterhead(spec, template, doc.width)
+    if spec.get('letterhead_every_page'):
+        # Drawn above the frame on each page rather than flowing with the story
+        doc.topMargin = top + header.height + PAGE_LETTERHEAD_GAP
+        on_page = page_letterhead(header, top)
+    else:
+        story.append(header)
+        story.append(Spacer(1, 30))
+        on_page = None
+
+    # Document type and number in professional header box
+    doc_header_data = [
+        [f"{document_type}", document_number],
+    ]
+
+    doc_header_table = Table(doc_header_data, colWidths=col_widths['doc_header'])
+    doc_header_table.setStyle(table_styles['doc_header'])
+
+    story.append(doc_header_table)
+    story.append(Spacer(1, 25))
+
+    # Professional client and date info layout with proper alignment
+    client_info = spec.get('client', {})
+    issue_date = spec.get('issue_date', '')
+    due_date = spec.get('due_date', '')
+
+    # Create properly aligned two-column layout for client and date info
+    info_data = []
+
+    # Left column - Client info with consistent formatting
+    client_lines = []
+    if client_info:
+        client_lines.append("<b>BILL TO:</b>")
+        if client_info.get('name'):
+            client_lines.append(client_info.get('name'))
+        if client_info.get('company'):
+            client_lines.append(client_info.get('company'))
+        if client_info.get('address'):
+            # Handle multi-line addresses properly
+            address_lines = client_info.get('address').split('\n')
+            client_lines.extend([line.strip() for line in address_lines if line.strip()])
+        if client_info.get('email'):
+            client_lines.append(client_info.get('email'))
+        if client_info.get('phone'):
+            client_lines.append(client_info.get('phone'))
+
+    client_text = "<br/>".join(client_lines) if client_lines else ""
+
+    # Right column - Date info with consistent formatting
+    date_lines = []
+    if issue_date:
+        date_lines.append(f"<b>Issue Date:</b><br/>{issue_date}")
+    if due_date:
+        date_lines.append(f"<b>Due Date:</b><br/>{due_date}")
+
+    date_text = "<br/><br/>".join(date_lines) if date_lines else ""
+
+    if client_text or date_text:
+        info_data = [[
+            Paragraph(client_text, styles['body']) if client_text else "",
+            Paragraph(date_text, styles['body']) if date_text else ""
+        ]]
+
+        info_table = Table(info_data, colWidths=col_widths['info'])
+        info_table.setStyle(table_styles['info'])
+
+        story.append(info_table)
+        story.append(Spacer(1, 25))
+
+    # Professional items table
+    items = spec.get('items', [])
+    # Set by the caller (build_render_spec uses PDF_LARGE_DOCUMENT_ITEMS)
+    large = spec.get('large_document', False)
+    if items:
+        # Add section header
+        items_header = Paragraph("ITEMS", styles['subheader'])
+        story.append(items_header)
+        story.append(Spacer(1, 10))
+
+        if large:
+            # Laid out a page at a time; see ItemRows
+            story.append(ItemRows(items, template, currency_symbol))
+        else:
+            table_data = [ITEMS_HEADER]
+            for item in items:
+                table_data.append(item_row(item, currency_symbol))
+
+            # Create professional table
+            table = Table(table_data, colWidths=col_widths['items'])
+            table.setStyle(table_styles['items'])
+            story.append(table)
+
+        story.append(Spacer(1, 25))
+
+    # Professional totals section
+    totals = spec.get('totals', {})
+    if large and items and totals.get('subtotal') is None:
+        # One pass with exact float summation over every line
+        totals = dict(totals, subtotal=math.fsum(
+            float(item.get('quantity', 0)) * float(item.get('unit_price', 0)) for item in items))
+        totals.setdefault('total', totals['subtotal'] + totals.get('tax_amount', 0))
+    if totals:
+        subtotal = totals.get('subtotal', 0)
+        tax_amount = totals.get('tax_amount', 0)
+        total = totals.get('total', 0)
+        tax_rate = totals.get('tax_rate', 0)
+
+        # Create totals data with proper formatting
+        totals_data = []
+
+        # Subtotal
+        totals_data.append(['Subtotal:', f"{currency_symbol}{subtotal:,.2f}"])
+
+        # Tax (if applicable)
+        if tax_rate > 0:
+            totals_data.append([f'Tax ({tax_rate:g}%):', f"{currency_symbol}{tax_amount:,.2f}"])
+
+        # Total
+        totals_data.append(['TOTAL:', f"{currency_symbol}{total:,.2f}"])
+
+        # Create professional totals table
+        totals_table = Table(totals_data, colWidths=col_widths['totals'])
+        totals_table.setStyle(table_styles['totals'])
+
+        story.append(totals_table)
+
+    # Professional notes section
+    notes = spec.get('notes', '')
+    if notes:
+        story.append(Spacer(1, 30))
+
+        # Notes header
+        notes_header = Paragraph("NOTES", styles['subheader'])
+        story.append(notes_header)
+        story.append(Spacer(1, 8))
+
+        # Notes content in a subtle box
+        notes_data = [[notes]]
+        notes_table = Table(notes_data, colWidths=col_widths['notes'])
+        notes_table.setStyle(table_styles['notes'])
+
+        story.append(notes_table)
+
+    # Signature section
+    signature_block = signature(spec)
+    if signature_block:
+        story.append(Spacer(1, 40))
+        story.append(signature_block)
+
+    # Build PDF
+    built = time.perf_counter()
+    if on_page:
+        doc.build(story, onFirstPage=on_page, onLaterPages=on_page)
+    else:
+        doc.build(story)
+    if timings is not None:
+        timings['story_build'] = built - started
+        timings['doc_build'] = time.perf_counter() - built
+    return buffer.getvalue()
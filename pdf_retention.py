@@ -0,0 +1,101 @@
+"""Size- and age-bounded retention for the generated PDF directory.
+
+Files are ranked by last use: the access time, which downloads and render
+cache hits bump explicitly (so this works on noatime mounts), or the
+modification time if that is newer. Anything older than ``max_age`` seconds
+is removed, then the least recently used files go until the directory fits
+in ``max_bytes``.
+"""
+import logging
+import os
+import threading
+import time
+
+
+def touch(path):
+    """Mark a file as used without changing its Last-Modified time"""
+    try:
+        st = os.stat(path)
+        os.utime(path, ns=(time.time_ns(), st.st_mtime_ns))
+    except FileNotFoundError:
+        pass
+
+
+def enforce_retention(directory, max_bytes=None, max_age=None, on_remove=None):
+    """Delete expired and least recently used PDFs; return (files, bytes) removed"""
+    now = time.time()
+    files = []
+    try:
+        with os.scandir(directory) as it:
+            for entry in it:
+                if not entry.is_file() or not entry.name.endswith('.pdf'):
+                    continue
+                try:
+                    st = entry.stat()
+                except FileNotFoundError:
+                    continue
+                files.append((max(st.st_atime, st.st_mtime), st.st_size, entry.name))
+    except FileNotFoundError:
+        return 0, 0
+
+    # Oldest first
+    files.sort()
+    total = sum(size for _, size, _ in files)
+    removed = freed = 0
+
+    for last_used, size, name in files:
+        expired = max_age and now - last_used > max_age
+        over_budget = max_bytes and total > max_bytes
+        if not expired and not over_budget:
+            # Sorted by last use, so nothing newer can be expired either
+            break
+        try:
+            os.remove(os.path.join(directory, name))
+        except FileNotFoundError:
+            # Another worker got there first
+            pass
+        else:
+            removed += 1
+            freed += size
+        total -= size
+        if on_remove:
+            on_remove(name)
+
+    if removed:
+        logging.info(f"PDF retention removed {removed} files ({freed} bytes) from {directory}")
+    return removed, freed
+
+
+class RetentionSweeper:
+    """Background thread that runs enforce_retention every ``interval`` seconds"""
+
+    def __init__(self, directory, max_bytes, max_age, interval=300, on_remove=None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.interval = interval
+        self.on_remove = on_remove
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def ensure_started(self):
+        # Threads do not survive a fork, so start one per worker process
+        if self._pid == os.getpid() or not self.interval:
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            thread = threading.Thread(target=self._run, name='pdf-retention', daemon=True)
+            thread.start()
+
+    def sweep(self):
+        return enforce_retention(self.directory, self.max_bytes, self.max_age, self.on_remove)
+
+    def _run(self):
+        while True:
+            try:
+                self.sweep()
+            except Exception as e:
+                logging.error(f"PDF retention sweep failed: {str(e)}")
+            time.sleep(self.interval)
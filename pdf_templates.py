@@ -0,0 +1,278 @@
+"""Registry of PDF layouts built once per process.
+
+A template bundles the page geometry, paragraph styles, table styles and
+column widths used by ``pdf_renderer``. Builders are registered by name and
+only run the first time a template is requested, so ``getSampleStyleSheet``,
+``ParagraphStyle`` and ``HexColor`` parsing happen once per process rather
+than once per document. Bump ``version`` whenever a layout changes so that
+cached renders keyed on it are invalidated.
+
+ReportLab is only imported by the builders, so the web process can compute
+render cache keys (``template_key``) without loading it.
+"""
+import threading
+
+DEFAULT_TEMPLATE = 'classic'
+
+_builders = {}
+_templates = {}
+_lock = threading.Lock()
+
+
+class PdfTemplate:
+    def __init__(self, name, version, styles, table_styles, col_widths,
+                 pagesize=(612.0, 792.0), margins=(72, 72, 72, 18)):
+        self.name = name
+        self.version = version
+        self.styles = styles
+        self.table_styles = table_styles
+        self.col_widths = col_widths
+        # Points; the default is reportlab.lib.pagesizes.letter
+        self.pagesize = pagesize
+        # (left, right, top, bottom) in points
+        self.margins = margins
+
+    @property
+    def key(self):
+        """Identifier that changes whenever the layout does"""
+        return f"{self.name}:{self.version}"
+
+
+class UnknownTemplate(KeyError):
+    """Raised when a render spec names a template that is not registered"""
+
+
+def register_template(name, version=1):
+    """Decorator registering a builder function under ``name``"""
+    def decorator(builder):
+        _builders[name] = (builder, version)
+        with _lock:
+            _templates.pop(name, None)
+        return builder
+    return decorator
+
+
+def get_template(name=None):
+    """Return the built template, building it on first use"""
+    name = name or DEFAULT_TEMPLATE
+    template = _templates.get(name)
+    if template is not None:
+        return template
+
+    with _lock:
+        template = _templates.get(name)
+        if template is None:
+            if name not in _builders:
+                raise UnknownTemplate(name)
+            builder, version = _builders[name]
+            template = builder(name, version)
+            _templates[name] = template
+    return template
+
+
+def template_key(name=None):
+    """``get_template(name).key`` without building the template"""
+    name = name or DEFAULT_TEMPLATE
+    if name not in _builders:
+        raise UnknownTemplate(name)
+    return f"{name}:{_builders[name][1]}"
+
+
+def template_names():
+    return sorted(_builders)
+
+
+def preload_templates():
+    """Build every registered template, e.g. when a render worker starts"""
+    for name in template_names():
+        get_template(name)
+
+
+@register_template('classic', version=1)
+def build_classic(name, version):
+    from reportlab.platypus import TableStyle
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.lib.units import inch
+    from reportlab.lib import colors
+    from reportlab.lib.enums import TA_CENTER
+
+    styles = getSampleStyleSheet()
+
+    dark = colors.HexColor('#2d3748')
+    muted = colors.HexColor('#4a5568')
+    light_bg = colors.HexColor('#f7fafc')
+    light_border = colors.HexColor('#e2e8f0')
+    border = colors.HexColor('#cbd5e0')
+
+    # Custom styles for professional look
+    paragraph_styles = {
+        'title': ParagraphStyle(
+            'CustomTitle',
+            parent=styles['Heading1'],
+            fontSize=28,
+            spaceAfter=30,
+            spaceBefore=20,
+            textColor=colors.HexColor('#1a365d'),
+            alignment=TA_CENTER,
+            fontName='Helvetica-Bold'
+        ),
+        'header': ParagraphStyle(
+            'CustomHeader',
+            parent=styles['Heading2'],
+            fontSize=18,
+            spaceAfter=15,
+            spaceBefore=10,
+            textColor=dark,
+            fontName='Helvetica-Bold'
+        ),
+        'subheader': ParagraphStyle(
+            'SubHeader',
+            parent=styles['Normal'],
+            fontSize=14,
+            spaceAfter=8,
+            textColor=muted,
+            fontName='Helvetica-Bold'
+        ),
+        'body': ParagraphStyle(
+            'BodyText',
+            parent=styles['Normal'],
+            fontSize=11,
+            spaceBefore=4,
+            spaceAfter=4,
+            textColor=dark,
+            fontName='Helvetica'
+        ),
+        'address': ParagraphStyle(
+            'AddressText',
+            parent=styles['Normal'],
+            fontSize=10,
+            spaceBefore=2,
+            spaceAfter=2,
+            textColor=muted,
+            fontName='Helvetica'
+        ),
+    }
+
+    table_styles = {
+        # Business header: logo on the left, business info on the right
+        'header': TableStyle([
+            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+            ('ALIGN', (0, 0), (0, 0), 'LEFT'),
+            ('ALIGN', (1, 0), (1, 0), 'LEFT'),
+            ('LEFTPADDING', (0, 0), (-1, -1), 0),
+            ('RIGHTPADDING', (0, 0), (-1, -1), 0),
+            ('TOPPADDING', (0, 0), (-1, -1), 0),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 0),
+        ]),
+
+        # Document type and number in professional header box
+        'doc_header': TableStyle([
+            ('BACKGROUND', (0, 0), (-1, -1), light_bg),
+            ('TEXTCOLOR', (0, 0), (-1, -1), dark),
+            ('ALIGN', (0, 0), (0, 0), 'LEFT'),
+            ('ALIGN', (1, 0), (1, 0), 'RIGHT'),
+            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, -1), 16),
+            ('LEFTPADDING', (0, 0), (-1, -1), 15),
+            ('RIGHTPADDING', (0, 0), (-1, -1), 15),
+            ('TOPPADDING', (0, 0), (-1, -1), 12),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
+            ('BOX', (0, 0), (-1, -1), 1, light_border),
+        ]),
+
+        # Client and date info
+        'info': TableStyle([
+            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+            ('ALIGN', (0, 0), (0, 0), 'LEFT'),   # Client info left-aligned
+            ('ALIGN', (1, 0), (1, 0), 'RIGHT'),  # Date info right-aligned
+            ('LEFTPADDING', (0, 0), (-1, -1), 0),
+            ('RIGHTPADDING', (0, 0), (-1, -1), 0),
+            ('TOPPADDING', (0, 0), (-1, -1), 0),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 0),
+        ]),
+
+        'items': TableStyle([
+            # Header styling
+            ('BACKGROUND', (0, 0), (-1, 0), dark),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 11),
+            ('LEFTPADDING', (0, 0), (-1, 0), 12),
+            ('RIGHTPADDING', (0, 0), (-1, 0), 12),
+            ('TOPPADDING', (0, 0), (-1, 0), 10),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 10),
+
+            # Body styling
+            ('BACKGROUND', (0, 1), (-1, -1), colors.white),
+            ('TEXTCOLOR', (0, 1), (-1, -1), dark),
+            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+            ('FONTSIZE', (0, 1), (-1, -1), 10),
+            ('LEFTPADDING', (0, 1), (-1, -1), 12),
+            ('RIGHTPADDING', (0, 1), (-1, -1), 12),
+            ('TOPPADDING', (0, 1), (-1, -1), 8),
+            ('BOTTOMPADDING', (0, 1), (-1, -1), 8),
+
+            # Alignment
+            ('ALIGN', (0, 0), (0, -1), 'LEFT'),    # Description
+            ('ALIGN', (1, 0), (-1, -1), 'RIGHT'),  # Numbers
+
+            # Borders
+            ('LINEBELOW', (0, 0), (-1, 0), 2, dark),
+            ('LINEBELOW', (0, 1), (-1, -2), 0.5, light_border),
+            ('BOX', (0, 0), (-1, -1), 1, border),
+
+            # Alternating row colors
+            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, light_bg])
+        ]),
+
+        'totals': TableStyle([
+            # General alignment and spacing
+            ('ALIGN', (0, 0), (-1, -1), 'RIGHT'),
+            ('LEFTPADDING', (0, 0), (-1, -1), 12),
+            ('RIGHTPADDING', (0, 0), (-1, -1), 12),
+            ('TOPPADDING', (0, 0), (-1, -1), 6),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+
+            # Subtotal and tax styling
+            ('FONTNAME', (0, 0), (-1, -2), 'Helvetica'),
+            ('FONTSIZE', (0, 0), (-1, -2), 11),
+            ('TEXTCOLOR', (0, 0), (-1, -2), muted),
+
+            # Total row styling (last row)
+            ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, -1), (-1, -1), 14),
+            ('TEXTCOLOR', (0, -1), (-1, -1), dark),
+            ('BACKGROUND', (0, -1), (-1, -1), light_bg),
+            ('TOPPADDING', (0, -1), (-1, -1), 10),
+            ('BOTTOMPADDING', (0, -1), (-1, -1), 10),
+
+            # Borders
+            ('LINEABOVE', (0, -1), (-1, -1), 2, dark),
+            ('BOX', (0, -1), (-1, -1), 1, border),
+        ]),
+
+        # Notes content in a subtle box
+        'notes': TableStyle([
+            ('BACKGROUND', (0, 0), (-1, -1), light_bg),
+            ('TEXTCOLOR', (0, 0), (-1, -1), muted),
+            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+            ('FONTSIZE', (0, 0), (-1, -1), 10),
+            ('LEFTPADDING', (0, 0), (-1, -1), 15),
+            ('RIGHTPADDING', (0, 0), (-1, -1), 15),
+            ('TOPPADDING', (0, 0), (-1, -1), 12),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
+            ('BOX', (0, 0), (-1, -1), 1, light_border),
+            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+        ]),
+    }
+
+    col_widths = {
+        'header': [1.8*inch, 4.7*inch],
+        'doc_header': [3*inch, 3*inch],
+        'info': [3.8*inch, 2.7*inch],
+        'items': [3.2*inch, 0.8*inch, 1.3*inch, 1.3*inch],
+        'totals': [3.5*inch, 2.5*inch],
+        'notes': [6.5*inch],
+    }
+
+    return PdfTemplate(name, version, paragraph_styles, table_styles, col_widths)
@@ -0,0 +1,43 @@
+"""Count the SQL statements an engine executes inside a block.
+
+    with count_queries(db.engine) as counter:
+        client.get('/api/documents?limit=500')
+    assert counter.count <= 3, counter.statements
+
+``assert_max_queries`` does the comparison and reports the statements that
+ran, which is how endpoint query budgets are checked for N+1 regressions
+(see ``benchmarks/bench_query_counts.py``).
+"""
+from contextlib import contextmanager
+from sqlalchemy import event
+
+
+class QueryCounter:
+    def __init__(self):
+        self.statements = []
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+
+@contextmanager
+def count_queries(engine):
+    counter = QueryCounter()
+    event.listen(engine, 'before_cursor_execute', counter)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, 'before_cursor_execute', counter)
+
+
+@contextmanager
+def assert_max_queries(engine, limit):
+    with count_queries(engine) as counter:
+        yield counter
+    if counter.count > limit:
+        statements = '\n'.join(counter.statements)
+        raise AssertionError(f"Expected at most {limit} queries, ran {counter.count}:\n{statements}")
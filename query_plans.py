@@ -0,0 +1,59 @@
+"""EXPLAIN checks for the application's main queries.
+
+Each entry is a query the app runs on a hot path. ``check_query_plans``
+asks the database for its plan and flags any that would read a whole table,
+so a missing index shows up before the table reaches a million rows.
+PostgreSQL is asked with ``enable_seqscan`` off: on small tables it
+legitimately prefers sequential scans, and we want to know whether an index
+*could* serve the query.
+"""
+from datetime import date
+from sqlalchemy import select, text, tuple_
+from models import Client, Document, DocumentItem
+
+
+def main_queries():
+    start, end = date(2026, 1, 1), date(2026, 12, 31)
+    return {
+        "client's documents by date": select(Document.id)
+            .where(Document.client_id == 1).order_by(Document.issue_date.desc()),
+        "document's items in order": select(DocumentItem)
+            .where(DocumentItem.document_id == 1).order_by(DocumentItem.order_index),
+        'documents by status and date range': select(Document.id)
+            .where(Document.status == 'sent', Document.issue_date.between(start, end)),
+        'documents by type and date range': select(Document.id)
+            .where(Document.document_type == 'invoice', Document.issue_date.between(start, end)),
+        'documents in date range': select(Document.id)
+            .where(Document.issue_date.between(start, end)),
+        'document by number': select(Document.id)
+            .where(Document.document_number == 'INV-1'),
+        'document keyset page': select(Document.id)
+            .where(tuple_(Document.issue_date, Document.id) < (end, 10 ** 9))
+            .order_by(Document.issue_date.desc(), Document.id.desc()).limit(50),
+        'client keyset page': select(Client.id, Client.name)
+            .where(tuple_(Client.name, Client.id) > ('M', 0)).order_by(Client.name, Client.id).limit(50),
+        'client by email': select(Client.id).where(Client.email == 'a@example.com'),
+    }
+
+
+def _full_scans(conn, query):
+    compiled = query.compile(conn, compile_kwargs={'literal_binds': True})
+    if conn.dialect.name == 'sqlite':
+        plan = [row[-1] for row in conn.execute(text(f"EXPLAIN QUERY PLAN {compiled}"))]
+        scans = [step for step in plan if step.startswith('SCAN ') and ' USING ' not in step]
+    elif conn.dialect.name == 'postgresql':
+        conn.execute(text("SET LOCAL enable_seqscan = off"))
+        plan = [row[0] for row in conn.execute(text(f"EXPLAIN {compiled}"))]
+        scans = [step.strip() for step in plan if 'Seq Scan' in step]
+    else:
+        raise NotImplementedError(f"No plan check for {conn.dialect.name}")
+    return plan, scans
+
+
+def check_query_plans(engine):
+    """Return {query name: (plan lines, full-scan lines)} for every main query"""
+    results = {}
+    with engine.begin() as conn:
+        for name, query in main_queries().items():
+            results[name] = _full_scans(conn, query)
+    return results
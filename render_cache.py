@@ -0,0 +1,87 @@
+"""Content-addressed cache of rendered PDFs.
+
+A render is identified by the SHA-256 of its normalized spec, the template
+version and the digests of the images it embeds. The key of the render that
+produced ``temp_pdfs/<filename>`` is stored next to it under ``.render-keys``,
+so a repeat request with the same input can return the existing file without
+running ReportLab. Because the keys live on disk, hits are shared by every
+worker process that uses the same output directory.
+"""
+import hashlib
+import json
+import os
+import threading
+
+KEY_DIR = '.render-keys'
+
+
+def render_key(spec, template_key):
+    """Hash everything that influences the rendered output"""
+    normalized = {k: v for k, v in spec.items() if k != 'images'}
+    normalized['template'] = template_key
+    payload = json.dumps(normalized, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class RenderCache:
+    def __init__(self, directory):
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def path(self, filename):
+        return os.path.join(self.directory, filename)
+
+    def _key_path(self, filename):
+        return os.path.join(self.directory, KEY_DIR, filename)
+
+    def stored_key(self, filename):
+        """Key of the render currently stored under ``filename``, if known"""
+        try:
+            with open(self._key_path(filename)) as f:
+                return f.read().strip()
+        except FileNotFoundError:
+            return None
+
+    def lookup(self, filename, key):
+        """Return the cached file path if it was rendered from ``key``"""
+        hit = self.stored_key(filename) == key and os.path.exists(self.path(filename))
+
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return self.path(filename) if hit else None
+
+    def store(self, filename, key, pdf_bytes):
+        """Atomically write the PDF and remember which input produced it"""
+        os.makedirs(os.path.join(self.directory, KEY_DIR), exist_ok=True)
+        filepath = self.path(filename)
+        _atomic_write(filepath, pdf_bytes)
+        _atomic_write(self._key_path(filename), key.encode('ascii'))
+        return filepath
+
+    def discard(self, filename):
+        """Forget the key for a file that is being removed"""
+        try:
+            os.remove(self._key_path(filename))
+        except FileNotFoundError:
+            pass
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / lookups if lookups else 0.0
+            }
+
+
+def _atomic_write(path, data):
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
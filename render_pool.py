@@ -0,0 +1,116 @@
+"""Process pool for PDF rendering with a bounded submit queue.
+
+ReportLab layout is CPU bound and holds the GIL, so renders are handed to a
+pool of worker processes. At most ``workers + queue_size`` renders may be
+in flight per web worker; once that limit is reached ``submit`` raises
+``RenderQueueFull`` so the caller can answer with 503 instead of piling up
+requests behind a slow render.
+"""
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+
+
+class RenderQueueFull(Exception):
+    """Raised when the render queue has no free slots"""
+
+
+# A one-page document touching every part of the layout, rendered once per
+# process so fonts, styles and ReportLab's lazily imported code are loaded
+# before the first real render
+WARM_UP_SPEC = {
+    'business_name': 'Warm-up', 'business_address': '1 Street\nTown', 'business_email': 'warm@example.com',
+    'document_type': 'invoice', 'document_number': 'WARM-UP', 'issue_date': '2026-01-01', 'due_date': '2026-01-31',
+    'client': {'name': 'Client', 'company': 'Company', 'email': 'client@example.com', 'address': 'Address'},
+    'items': [{'description': f"Item {i}", 'quantity': i, 'unit_price': 9.5} for i in range(1, 4)],
+    'totals': {'subtotal': 57.0, 'tax_amount': 5.7, 'total': 62.7, 'tax_rate': 10},
+    'notes': 'Warm-up render',
+}
+
+
+def _init_worker():
+    # Build the style/template registry and run a sample render once per
+    # worker process instead of on the first render it receives.
+    from pdf_templates import preload_templates
+    from pdf_renderer import render_pdf
+    preload_templates()
+    render_pdf(WARM_UP_SPEC)
+
+
+def _render(spec):
+    # Imported in the worker process so the parent only pays for ReportLab
+    # when it renders inline.
+    from pdf_renderer import render_pdf
+    timings = {}
+    return render_pdf(spec, timings), timings
+
+
+class RenderPool:
+    def __init__(self, workers=None, queue_size=16, start_method='spawn'):
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.queue_size = queue_size
+        self.start_method = start_method
+        self._slots = threading.BoundedSemaphore(max(self.workers, 1) + queue_size)
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        # Executors do not survive a fork (e.g. gunicorn --preload), so each
+        # process lazily creates its own.
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context(self.start_method),
+                    initializer=_init_worker
+                )
+                self._pid = os.getpid()
+                logging.info(f"Started PDF render pool with {self.workers} workers")
+            return self._executor
+
+    def submit(self, spec):
+        """Queue a render; the Future resolves to (PDF bytes, phase timings)"""
+        if not self._slots.acquire(blocking=False):
+            raise RenderQueueFull('PDF render queue is full')
+
+        try:
+            if self.workers == 0:
+                # Inline mode for development and single-core hosts
+                future = Future()
+                try:
+                    future.set_result(_render(spec))
+                except Exception as e:
+                    future.set_exception(e)
+            else:
+                future = self._get_executor().submit(_render, spec)
+        except Exception:
+            self._slots.release()
+            raise
+
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def render(self, spec, timeout=None):
+        """Render synchronously through the pool; return (PDF bytes, phase timings)"""
+        return self.submit(spec).result(timeout=timeout)
+
+    def warm_up(self, spec, timeout=None):
+        """Start every worker process and render ``spec`` once per worker
+
+        Caches keyed by the spec (letterhead, signature) are per process, so
+        warming them with the real business settings needs a render in each.
+        Spawned processes come up one per pending task, so submitting one
+        render per worker starts them all.
+        """
+        futures = [self.submit(spec) for _ in range(max(self.workers, 1))]
+        for future in futures:
+            future.result(timeout=timeout)
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            if self._executor is not None and self._pid == os.getpid():
+                self._executor.shutdown(wait=wait)
+            self._executor = None
@@ -0,0 +1,260 @@
+"""Revenue and receivables reporting backed by summary tables.
+
+``revenue_summary`` holds one row per (client, month, status, currency,
+document type) and ``receivable_summary`` one row per (client, currency,
+due date) of outstanding invoices. Every write path that creates a document
+or changes its status calls ``record_documents`` in the same transaction,
+which folds the change into the affected rows with an upsert, so reports
+read a handful of pre-aggregated rows instead of scanning ``document``.
+``rebuild_summaries`` recomputes both tables from scratch.
+"""
+from collections import defaultdict
+from datetime import date, timedelta
+from sqlalchemy import and_, case, delete, func, insert, literal, select, update
+from extensions import db
+from models import Client, Document, ReceivableSummary, RevenueSummary
+
+# Invoices in these statuses count as receivables
+OUTSTANDING_STATUSES = ('sent',)
+
+REVENUE_KEYS = ('client_id', 'period', 'status', 'currency_code', 'document_type')
+REVENUE_VALUES = ('document_count', 'subtotal', 'tax_amount', 'total_amount')
+RECEIVABLE_KEYS = ('client_id', 'currency_code', 'due_date')
+RECEIVABLE_VALUES = ('document_count', 'total_amount')
+
+# group_by names accepted by the revenue report
+REVENUE_GROUPS = {
+    'client': RevenueSummary.client_id,
+    'month': RevenueSummary.period,
+    'status': RevenueSummary.status,
+    'currency': RevenueSummary.currency_code,
+    'type': RevenueSummary.document_type,
+}
+
+AGING_BUCKETS = ('current', '1-30', '31-60', '61-90', '90+')
+
+
+def document_values(document):
+    """The columns of a Document that the summaries depend on"""
+    return {
+        'client_id': document.client_id,
+        'issue_date': document.issue_date,
+        'due_date': document.due_date,
+        'status': document.status or 'draft',
+        'currency_code': document.currency_code or 'USD',
+        'document_type': document.document_type,
+        'subtotal': document.subtotal or 0.0,
+        'tax_amount': document.tax_amount or 0.0,
+        'total_amount': document.total_amount or 0.0,
+    }
+
+
+def is_receivable(values):
+    return values['document_type'] == 'invoice' and values['status'] in OUTSTANDING_STATUSES
+
+
+def record_documents(documents, sign=1):
+    """Add (sign=1) or remove (sign=-1) documents from the summaries.
+
+    ``documents`` are dicts with the keys returned by ``document_values``.
+    Changes are aggregated per summary row first, so a chunk of a few
+    hundred documents costs a couple of statements.
+    """
+    revenue = defaultdict(lambda: dict.fromkeys(REVENUE_VALUES, 0))
+    receivables = defaultdict(lambda: dict.fromkeys(RECEIVABLE_VALUES, 0))
+
+    for values in documents:
+        key = (values['client_id'], values['issue_date'].strftime('%Y-%m'), values['status'] or 'draft',
+               values['currency_code'] or 'USD', values['document_type'])
+        row = revenue[key]
+        row['document_count'] += sign
+        row['subtotal'] += sign * (values['subtotal'] or 0.0)
+        row['tax_amount'] += sign * (values['tax_amount'] or 0.0)
+        row['total_amount'] += sign * (values['total_amount'] or 0.0)
+
+        if is_receivable(values):
+            key = (values['client_id'], values['currency_code'] or 'USD', values['due_date'] or values['issue_date'])
+            row = receivables[key]
+            row['document_count'] += sign
+            row['total_amount'] += sign * (values['total_amount'] or 0.0)
+
+    _apply(RevenueSummary.__table__, REVENUE_KEYS, revenue)
+    _apply(ReceivableSummary.__table__, RECEIVABLE_KEYS, receivables)
+
+
+def change_status(document, status):
+    """Set a document's status and move its totals to the matching summary rows"""
+    if document.status == status:
+        return
+    record_documents([document_values(document)], -1)
+    document.status = status
+    record_documents([document_values(document)], 1)
+
+
+def _apply(table, key_columns, deltas):
+    if not deltas:
+        return
+    rows = [dict(zip(key_columns, key), **values) for key, values in deltas.items()]
+    value_columns = [name for name in rows[0] if name not in key_columns]
+    dialect = db.session.get_bind().dialect.name
+
+    if dialect in ('sqlite', 'postgresql'):
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert as upsert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as upsert
+        statement = upsert(table)
+        statement = statement.on_conflict_do_update(
+            index_elements=list(key_columns),
+            set_={name: table.c[name] + statement.excluded[name] for name in value_columns}
+        )
+        db.session.execute(statement, rows)
+    else:
+        for row in rows:
+            match = and_(*(table.c[name] == row[name] for name in key_columns))
+            changed = db.session.execute(
+                update(table).where(match).values({name: table.c[name] + row[name] for name in value_columns})
+            ).rowcount
+            if not changed:
+                db.session.execute(insert(table).values(row))
+
+    for row in rows:
+        if row['document_count'] < 0:
+            # Drop the row once it no longer summarises any document
+            match = and_(*(table.c[name] == row[name] for name in key_columns))
+            db.session.execute(delete(table).where(match, table.c.document_count <= 0))
+
+
+def _month(column, dialect):
+    if dialect == 'sqlite':
+        return func.strftime('%Y-%m', column)
+    return func.to_char(column, 'YYYY-MM')
+
+
+def rebuild_summaries(conn):
+    """Recompute both summary tables from the document table"""
+    dialect = conn.dialect.name
+    revenue = RevenueSummary.__table__
+    receivables = ReceivableSummary.__table__
+    status = func.coalesce(Document.status, 'draft')
+    currency = func.coalesce(Document.currency_code, 'USD')
+
+    conn.execute(delete(revenue))
+    conn.execute(delete(receivables))
+
+    period = _month(Document.issue_date, dialect)
+    conn.execute(insert(revenue).from_select(
+        list(REVENUE_KEYS) + list(REVENUE_VALUES),
+        select(
+            Document.client_id, period, status, currency, Document.document_type,
+            func.count(), func.coalesce(func.sum(Document.subtotal), 0.0),
+            func.coalesce(func.sum(Document.tax_amount), 0.0), func.coalesce(func.sum(Document.total_amount), 0.0)
+        ).group_by(Document.client_id, period, status, currency, Document.document_type)
+    ))
+
+    due_date = func.coalesce(Document.due_date, Document.issue_date)
+    conn.execute(insert(receivables).from_select(
+        list(RECEIVABLE_KEYS) + list(RECEIVABLE_VALUES),
+        select(
+            Document.client_id, currency, due_date,
+            func.count(), func.coalesce(func.sum(Document.total_amount), 0.0)
+        ).where(
+            Document.document_type == 'invoice', status.in_(OUTSTANDING_STATUSES)
+        ).group_by(Document.client_id, currency, due_date)
+    ))
+
+
+def revenue_report(group_by=('month',), start=None, end=None, statuses=None, document_types=None, client_id=None):
+    """Totals from the revenue summary, always split by currency.
+
+    ``start``/``end`` are inclusive YYYY-MM periods.
+    """
+    columns = [REVENUE_GROUPS[name].label(name) for name in group_by if name != 'currency']
+    columns.append(RevenueSummary.currency_code.label('currency'))
+
+    query = select(
+        *columns,
+        func.sum(RevenueSummary.document_count).label('document_count'),
+        func.sum(RevenueSummary.subtotal).label('subtotal'),
+        func.sum(RevenueSummary.tax_amount).label('tax_amount'),
+        func.sum(RevenueSummary.total_amount).label('total_amount'),
+    ).group_by(*columns).order_by(*columns)
+
+    if 'client' in group_by:
+        query = query.add_columns(Client.name.label('client_name')).join(
+            Client, Client.id == RevenueSummary.client_id, isouter=True
+        ).group_by(Client.name)
+    if start:
+        query = query.where(RevenueSummary.period >= start)
+    if end:
+        query = query.where(RevenueSummary.period <= end)
+    if statuses:
+        query = query.where(RevenueSummary.status.in_(statuses))
+    if document_types:
+        query = query.where(RevenueSummary.document_type.in_(document_types))
+    if client_id is not None:
+        query = query.where(RevenueSummary.client_id == client_id)
+
+    rows = []
+    for row in db.session.execute(query).mappings():
+        row = dict(row)
+        for name in ('subtotal', 'tax_amount', 'total_amount'):
+            row[name] = round(row[name] or 0.0, 2)
+        rows.append(row)
+    return rows
+
+
+def aging_report(as_of=None, by_client=False):
+    """Outstanding invoice totals per currency (and client) in 30-day overdue buckets"""
+    as_of = as_of or date.today()
+    due = ReceivableSummary.due_date
+    bucket = case(
+        (due >= as_of, literal('current')),
+        (due >= as_of - timedelta(days=30), literal('1-30')),
+        (due >= as_of - timedelta(days=60), literal('31-60')),
+        (due >= as_of - timedelta(days=90), literal('61-90')),
+        else_=literal('90+')
+    ).label('bucket')
+
+    columns = [ReceivableSummary.currency_code.label('currency')]
+    if by_client:
+        columns.insert(0, ReceivableSummary.client_id.label('client_id'))
+
+    query = select(
+        *columns, bucket,
+        func.sum(ReceivableSummary.document_count).label('document_count'),
+        func.sum(ReceivableSummary.total_amount).label('total_amount'),
+    ).group_by(*columns, bucket)
+
+    groups = {}
+    for row in db.session.execute(query).mappings():
+        key = tuple(row[column.key] for column in columns)
+        if key not in groups:
+            groups[key] = dict(
+                {column.key: value for column, value in zip(columns, key)},
+                buckets={name: {'document_count': 0, 'total_amount': 0.0} for name in AGING_BUCKETS},
+                document_count=0, total_amount=0.0
+            )
+        group = groups[key]
+        group['buckets'][row['bucket']] = {
+            'document_count': row['document_count'],
+            'total_amount': round(row['total_amount'] or 0.0, 2)
+        }
+        group['document_count'] += row['document_count']
+        group['total_amount'] = round(group['total_amount'] + (row['total_amount'] or 0.0), 2)
+
+    return [groups[key] for key in sorted(groups, key=lambda k: tuple(str(v) for v in k))]
+
+
+def dashboard_figures(today=None):
+    """Headline figures for the home page, read from the summary tables"""
+    today = today or date.today()
+    invoiced = revenue_report(
+        group_by=(), start=today.strftime('%Y-%m'), end=today.strftime('%Y-%m'),
+        statuses=('sent', 'paid'), document_types=('invoice',)
+    )
+    return {
+        'period': today.strftime('%B %Y'),
+        'invoiced': invoiced,
+        'receivables': aging_report(today),
+    }
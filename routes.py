@@ -1,61 +1,124 @@
-from flask import render_template, request, jsonify, redirect, url_for, flash, send_file
-from app import app, db
-from models import BusinessSettings, Client, Document, DocumentItem
-from utils import generate_document_number, export_to_csv, export_to_json, import_from_csv, import_from_json
+from flask import Blueprint, current_app, make_response, render_template, request, jsonify, redirect, url_for, flash, send_file, Response, stream_with_context
+from werkzeug.exceptions import RequestedRangeNotSatisfiable
+from werkzeug.local import LocalProxy
+from werkzeug.security import safe_join
+from extensions import db
+from models import BusinessSettings, Client, Document, DocumentItem, SyncRef
+from utils import generate_document_number, export_to_csv, export_to_json, import_from_csv, import_from_json, ZipStreamBuffer
+from utils import encode_cursor, decode_cursor, parse_page_size
+from client_search import client_search_filter
+from document_search import search_documents
+from settings_cache import settings_cache
+from bulk_documents import DOCUMENT_STATUSES, DOCUMENT_TYPES, DocumentValidationError, check_clients_exist, insert_documents, prepare_document
+import data_transfer
+from changelog import changes_since, record_changes
+from reporting import REVENUE_GROUPS, aging_report, change_status, dashboard_figures, revenue_report
+import hashlib
 import json
 from datetime import datetime, date
 import logging
-import io
 import os
-import requests
-from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from reportlab.lib import colors
-from reportlab.lib.enums import TA_LEFT, TA_RIGHT, TA_CENTER
-
-@app.route('/')
+import time
+import zipfile
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, wait, TimeoutError as RenderTimeout
+from sqlalchemy import and_, insert, or_, select, tuple_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload, load_only, raiseload, selectinload
+from render_pool import RenderPool, RenderQueueFull
+from image_cache import ImageCache
+from pdf_templates import UnknownTemplate, template_key
+from render_cache import RenderCache, render_key
+from pdf_retention import RetentionSweeper, touch
+import http_cache
+import metrics
+
+bp = Blueprint('main', __name__)
+
+
+def init_app(app):
+    """Register the routes and build this process's PDF services from the config"""
+    render_cache = RenderCache(app.config['PDF_OUTPUT_DIR'])
+    app.extensions['render_pool'] = RenderPool(
+        workers=app.config['PDF_RENDER_WORKERS'],
+        queue_size=app.config['PDF_RENDER_QUEUE_SIZE']
+    )
+    app.extensions['image_cache'] = ImageCache(
+        max_bytes=app.config['IMAGE_CACHE_MAX_BYTES'],
+        fresh_for=app.config['IMAGE_CACHE_FRESH_FOR']
+    )
+    app.extensions['render_cache'] = render_cache
+    app.extensions['retention_sweeper'] = RetentionSweeper(
+        app.config['PDF_OUTPUT_DIR'],
+        max_bytes=app.config['PDF_RETENTION_MAX_BYTES'],
+        max_age=app.config['PDF_RETENTION_MAX_AGE'],
+        interval=app.config['PDF_RETENTION_INTERVAL'],
+        on_remove=render_cache.discard
+    )
+    app.register_blueprint(bp)
+
+
+def _extension(name):
+    return LocalProxy(lambda: current_app.extensions[name])
+
+
+render_pool = _extension('render_pool')
+image_cache = _extension('image_cache')
+render_cache = _extension('render_cache')
+retention_sweeper = _extension('retention_sweeper')
+
+@bp.before_app_request
+def start_background_tasks():
+    retention_sweeper.ensure_started()
+
+@bp.route('/')
 def index():
-    return render_template('index.html')
+    # Reads a few pre-aggregated summary rows, not the document table
+    return render_template('index.html', figures=dashboard_figures())
 
-@app.route('/generate')
+@bp.route('/generate')
 def document_generator():
-    clients = Client.query.all()
-    business_settings = BusinessSettings.query.first()
-    if not business_settings:
-        business_settings = BusinessSettings()
-        db.session.add(business_settings)
-        db.session.commit()
+    business_settings = settings_cache.get()
 
     return render_template('document_generator.html', 
-                         clients=clients, 
                          business_settings=business_settings)
 
-@app.route('/settings')
+@bp.route('/settings')
 def business_settings():
-    settings = BusinessSettings.query.first()
-    if not settings:
-        settings = BusinessSettings()
-        db.session.add(settings)
-        db.session.commit()
+    settings = settings_cache.get()
 
     return render_template('business_settings.html', settings=settings)
 
-@app.route('/clients')
+@bp.route('/clients')
 def client_management():
-    clients = Client.query.all()
-    return render_template('client_management.html', clients=clients)
-
-@app.route('/api/business-settings', methods=['GET', 'POST'])
+    # Rows are loaded page by page from /api/clients
+    return render_template('client_management.html')
+
+# Static files the service worker precaches, under their fingerprinted URLs
+SERVICE_WORKER_ASSETS = ('css/custom.css', 'js/app.js', 'js/sync.js', 'js/document_generator.js', 'js/currency_data.js',
+                         'manifest.json', 'icons/icon-192x192.svg', 'icons/icon-512x512.svg')
+
+@bp.route('/sw.js')
+def service_worker():
+    # Served from the root so its scope covers every page
+    static_urls = [url_for('static', filename=filename) for filename in SERVICE_WORKER_ASSETS]
+    version = hashlib.sha256('\n'.join(static_urls).encode('utf-8')).hexdigest()[:12]
+    response = make_response(render_template('sw.js', version=version, static_urls=static_urls,
+                                             sync_script=url_for('static', filename='js/sync.js')))
+    response.mimetype = 'application/javascript'
+    response.cache_control.no_cache = True
+    return response
+
+@bp.route('/metrics')
+def prometheus_metrics():
+    return Response(metrics.render_latest(), mimetype='text/plain; version=0.0.4')
+
+@bp.route('/api/business-settings', methods=['GET', 'POST'])
 def api_business_settings():
     if request.method == 'GET':
-        settings = BusinessSettings.query.first()
-        if not settings:
-            settings = BusinessSettings()
-            db.session.add(settings)
-            db.session.commit()
-        return jsonify(settings.to_dict())
+        settings = settings_cache.get()
+        etag = http_cache.row_etag((settings.id, settings.updated_at))
+        return http_cache.not_modified(etag) or http_cache.with_etag(jsonify(settings.to_dict()), etag)
 
     elif request.method == 'POST':
         data = request.get_json()
@@ -71,14 +134,14 @@ def api_business_settings():
 
         settings.updated_at = datetime.utcnow()
         db.session.commit()
+        settings_cache.invalidate()
 
         return jsonify({'success': True, 'message': 'Settings updated successfully'})
 
-@app.route('/api/clients', methods=['GET', 'POST'])
+@bp.route('/api/clients', methods=['GET', 'POST'])
 def api_clients():
     if request.method == 'GET':
-        clients = Client.query.all()
-        return jsonify([client.to_dict() for client in clients])
+        return list_clients()
 
     elif request.method == 'POST':
         data = request.get_json()
@@ -94,7 +157,47 @@ def api_clients():
 
         return jsonify({'success': True, 'client': client.to_dict()})
 
-@app.route('/api/clients/<int:client_id>', methods=['PUT', 'DELETE'])
+CLIENT_FIELDS = ('id', 'name', 'email', 'phone', 'address', 'company')
+
+def list_clients():
+    """Keyset-paginated client listing ordered by (name, id)
+
+    Query parameters: ``q`` (prefix search over name, company and email),
+    ``fields`` (comma-separated projection), ``limit`` and ``cursor`` (the
+    ``next_cursor`` of the previous page).
+    """
+    try:
+        limit = parse_page_size(request.args.get('limit'), current_app.config['API_PAGE_SIZE'], current_app.config['API_MAX_PAGE_SIZE'])
+        fields = [f for f in request.args.get('fields', '').split(',') if f] or list(CLIENT_FIELDS)
+        unknown = set(fields) - set(CLIENT_FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+        cursor = decode_cursor(request.args['cursor']) if request.args.get('cursor') else None
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    # The sort key is always selected so the next cursor can be built,
+    # and updated_at for the ETag
+    columns = [getattr(Client, f) for f in dict.fromkeys(fields + ['name', 'id', 'updated_at'])]
+    query = select(*columns).order_by(Client.name, Client.id).limit(limit + 1)
+
+    search = client_search_filter(request.args.get('q'))
+    if search is not None:
+        query = query.where(search)
+    if cursor:
+        query = query.where(tuple_(Client.name, Client.id) > tuple(cursor))
+
+    rows = db.session.execute(query).mappings().all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    etag = http_cache.row_etag(*((row['id'], row['updated_at']) for row in rows), (has_more,))
+    return http_cache.not_modified(etag) or http_cache.with_etag(jsonify({
+        'clients': [{f: row[f] for f in fields} for row in rows],
+        'next_cursor': encode_cursor([rows[-1]['name'], rows[-1]['id']]) if has_more else None
+    }), etag)
+
+@bp.route('/api/clients/<int:client_id>', methods=['PUT', 'DELETE'])
 def api_client_detail(client_id):
     client = Client.query.get_or_404(client_id)
 
@@ -115,64 +218,462 @@ def api_client_detail(client_id):
         db.session.commit()
         return jsonify({'success': True, 'message': 'Client deleted successfully'})
 
-@app.route('/api/documents', methods=['POST'])
+def split_param(name):
+    return [value for value in request.args.get(name, '').split(',') if value]
+
+DOCUMENT_FIELDS = ('id', 'document_type', 'document_number', 'client_id', 'issue_date', 'due_date',
+                   'subtotal', 'tax_amount', 'total_amount', 'notes', 'status', 'currency_code')
+DOCUMENT_INCLUDES = ('client', 'items')
+# Columns of the client embedded in document listings
+DOCUMENT_CLIENT_FIELDS = ('id', 'name', 'company', 'email')
+DOCUMENT_CLIENT_COLUMNS = DOCUMENT_CLIENT_FIELDS + ('updated_at',)
+
+def document_loader_options(include):
+    """Eager-load the requested relationships and forbid lazy loads of the rest"""
+    options = []
+    if 'client' in include:
+        options.append(joinedload(Document.client).load_only(*(getattr(Client, f) for f in DOCUMENT_CLIENT_COLUMNS)))
+    if 'items' in include:
+        # One IN query for the items of the whole page
+        options.append(selectinload(Document.items))
+    # A relationship touched without being loaded raises instead of issuing one query per row
+    options.append(raiseload('*'))
+    return options
+
+def document_version(document, include=DOCUMENT_INCLUDES):
+    """Row versions a serialized document depends on; line items are never edited in place"""
+    client = document.client if 'client' in include else None
+    return (document.id, document.updated_at, client.id if client else None, client.updated_at if client else None)
+
+def serialize_document(document, fields, include):
+    data = {}
+    for f in fields:
+        value = getattr(document, f)
+        data[f] = value.isoformat() if isinstance(value, date) else value
+    if 'client' in include:
+        data['client'] = {f: getattr(document.client, f) for f in DOCUMENT_CLIENT_FIELDS} if document.client else None
+    if 'items' in include:
+        data['items'] = [item.to_dict() for item in sorted(document.items, key=lambda item: (item.order_index or 0, item.id))]
+    return data
+
+@bp.route('/api/documents', methods=['GET'])
+def api_list_documents():
+    """Keyset-paginated document listing, newest first
+
+    Query parameters: ``fields`` (comma-separated projection), ``include``
+    (``client`` and/or ``items``), ``status``, ``type``, ``client_id``,
+    ``limit`` and ``cursor``. A page costs at most one query for the
+    documents (with their clients joined) plus one for their items.
+    """
+    try:
+        limit = parse_page_size(request.args.get('limit'), current_app.config['API_PAGE_SIZE'], current_app.config['API_MAX_PAGE_SIZE'])
+        fields = split_param('fields') or list(DOCUMENT_FIELDS)
+        include = split_param('include')
+        unknown = (set(fields) - set(DOCUMENT_FIELDS)) | (set(include) - set(DOCUMENT_INCLUDES))
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+        cursor = decode_cursor(request.args['cursor']) if request.args.get('cursor') else None
+        if cursor:
+            cursor = (datetime.strptime(cursor[0], '%Y-%m-%d').date(), int(cursor[1]))
+    except (ValueError, TypeError, IndexError) as e:
+        return jsonify({'error': str(e)}), 400
+
+    # Only the requested columns are loaded, plus the sort key, the client key and updated_at for the ETag
+    columns = dict.fromkeys(fields + ['id', 'issue_date', 'updated_at'] + (['client_id'] if 'client' in include else []))
+    query = select(Document).options(
+        load_only(*(getattr(Document, f) for f in columns), raiseload=True), *document_loader_options(include)
+    ).order_by(Document.issue_date.desc(), Document.id.desc()).limit(limit + 1)
+
+    statuses = split_param('status')
+    document_types = split_param('type')
+    if statuses:
+        query = query.where(Document.status.in_(statuses))
+    if document_types:
+        query = query.where(Document.document_type.in_(document_types))
+    if request.args.get('client_id', type=int) is not None:
+        query = query.where(Document.client_id == request.args.get('client_id', type=int))
+    if cursor:
+        query = query.where(tuple_(Document.issue_date, Document.id) < cursor)
+
+    documents = db.session.execute(query).unique().scalars().all()
+    has_more = len(documents) > limit
+    documents = documents[:limit]
+
+    etag = http_cache.row_etag(*(document_version(document, include) for document in documents), (has_more,))
+    return http_cache.not_modified(etag) or http_cache.with_etag(jsonify({
+        'documents': [serialize_document(document, fields, include) for document in documents],
+        'next_cursor': encode_cursor([documents[-1].issue_date.isoformat(), documents[-1].id]) if has_more else None
+    }), etag)
+
+@bp.route('/api/documents/search', methods=['GET'])
+def api_search_documents():
+    """Ranked full-text search over document numbers, client names, notes and line items
+
+    Query parameters: ``q`` (every term must match, as a prefix), ``fields``,
+    ``include``, ``status`` and ``type`` as for the listing, ``limit`` and
+    ``cursor``. The newest SEARCH_MAX_CANDIDATES matches come first, by
+    relevance, then any older ones, newest first; each carries its
+    ``score`` (lower is better, 0 for the unranked older matches).
+    """
+    try:
+        limit = parse_page_size(request.args.get('limit'), current_app.config['SEARCH_PAGE_SIZE'], current_app.config['SEARCH_MAX_PAGE_SIZE'])
+        fields = split_param('fields') or list(DOCUMENT_FIELDS)
+        include = split_param('include')
+        unknown = (set(fields) - set(DOCUMENT_FIELDS)) | (set(include) - set(DOCUMENT_INCLUDES))
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+        cursor = decode_cursor(request.args['cursor']) if request.args.get('cursor') else None
+        if cursor:
+            cursor = (float(cursor[0]), int(cursor[1]))
+    except (ValueError, TypeError, IndexError) as e:
+        return jsonify({'error': str(e)}), 400
+
+    searched = search_documents(request.args.get('q'), current_app.config['SEARCH_MAX_CANDIDATES'],
+                                split_param('status'), split_param('type'))
+    if searched is None:
+        return jsonify({'error': 'q must contain at least one word'}), 400
+
+    # Rank and paginate on (score, id DESC) first, then load just this page;
+    # matches older than the ranked ones are only read once those run out
+    matches = []
+    for matched in searched:
+        if matched is None or len(matches) > limit:
+            continue
+        query = select(matched.c.id, matched.c.score).order_by(matched.c.score, matched.c.id.desc()).limit(limit + 1 - len(matches))
+        if cursor:
+            query = query.where(or_(matched.c.score > cursor[0], and_(matched.c.score == cursor[0], matched.c.id < cursor[1])))
+        matches.extend(db.session.execute(query).all())
+    has_more = len(matches) > limit
+    matches = matches[:limit]
+
+    columns = dict.fromkeys(fields + ['id'] + (['client_id'] if 'client' in include else []))
+    documents = {document.id: document for document in db.session.execute(
+        select(Document).where(Document.id.in_([match.id for match in matches])).options(
+            load_only(*(getattr(Document, f) for f in columns), raiseload=True), *document_loader_options(include)
+        )
+    ).unique().scalars()}
+
+    results = []
+    for match in matches:
+        document = documents.get(match.id)
+        if document is not None:
+            results.append(dict(serialize_document(document, fields, include), score=match.score))
+    return jsonify({
+        'documents': results,
+        'next_cursor': encode_cursor([matches[-1].score, matches[-1].id]) if has_more else None
+    })
+
+@bp.route('/api/documents/<int:document_id>', methods=['GET'])
+def api_document_detail(document_id):
+    # Client and items come back in the same query
+    document = db.session.execute(
+        select(Document).where(Document.id == document_id).options(
+            joinedload(Document.client), joinedload(Document.items), raiseload('*')
+        )
+    ).unique().scalar_one_or_none()
+    if document is None:
+        return jsonify({'success': False, 'error': 'Document not found'}), 404
+
+    etag = http_cache.row_etag(document_version(document))
+    response = http_cache.not_modified(etag)
+    if response:
+        return response
+
+    data = document.to_dict()
+    data['client'] = document.client.to_dict() if document.client else None
+    data['items'] = [item.to_dict() for item in sorted(document.items, key=lambda item: (item.order_index or 0, item.id))]
+    return http_cache.with_etag(jsonify(data), etag)
+
+@bp.route('/api/documents', methods=['POST'])
 def api_create_document():
     data = request.get_json()
 
     try:
-        # Create document
-        document = Document(
-            document_type=data.get('document_type'),
-            document_number=generate_document_number(data.get('document_type')),
-            client_id=data.get('client_id'),
-            issue_date=datetime.strptime(data.get('issue_date'), '%Y-%m-%d').date(),
-            due_date=datetime.strptime(data.get('due_date'), '%Y-%m-%d').date() if data.get('due_date') else None,
-            notes=data.get('notes', ''),
-            status=data.get('status', 'draft')
-        )
-
-        db.session.add(document)
-        db.session.flush()  # Get the document ID
-
-        # Create document items
-        subtotal = 0
-        for item_data in data.get('items', []):
-            total_price = float(item_data['quantity']) * float(item_data['unit_price'])
-            item = DocumentItem(
-                document_id=document.id,
-                description=item_data['description'],
-                quantity=float(item_data['quantity']),
-                unit_price=float(item_data['unit_price']),
-                total_price=total_price,
-                order_index=item_data.get('order_index', 0)
-            )
-            db.session.add(item)
-            subtotal += total_price
-
-        # Calculate totals
-        business_settings = BusinessSettings.query.first()
-        tax_rate = business_settings.tax_rate if business_settings else 0.0
-        tax_amount = subtotal * (tax_rate / 100)
-        total_amount = subtotal + tax_amount
-
-        document.subtotal = subtotal
-        document.tax_amount = tax_amount
-        document.total_amount = total_amount
+        # A number previously reserved through /api/next-document-number is
+        # kept if the client sends one
+        settings = settings_cache.get()
+        prepared = [prepare_document(data, settings.tax_rate or 0.0, settings.currency_code or 'USD')]
+        if check_clients_exist(prepared):
+            raise DocumentValidationError('Client not found')
 
-        db.session.commit()
+        result = insert_documents(prepared)[0]
+        if not result['success']:
+            return jsonify({'success': False, 'error': result['error']}), 409
 
         return jsonify({
             'success': True, 
-            'document_number': document.document_number,
+            'document_number': result['document_number'],
             'message': 'Document created successfully'
         })
 
+    except DocumentValidationError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
     except Exception as e:
         db.session.rollback()
         logging.error(f"Error creating document: {str(e)}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
-@app.route('/api/export-settings/<format>')
+@bp.route('/api/documents/bulk', methods=['POST'])
+def api_bulk_create_documents():
+    data = request.get_json() or {}
+    entries = data.get('documents')
+
+    if not isinstance(entries, list) or not entries:
+        return jsonify({'success': False, 'error': 'documents must be a non-empty list'}), 400
+    if len(entries) > current_app.config['BULK_MAX_DOCUMENTS']:
+        return jsonify({'success': False, 'error': f"At most {current_app.config['BULK_MAX_DOCUMENTS']} documents per request"}), 400
+
+    try:
+        # Validate the whole batch and compute totals before writing anything
+        settings = settings_cache.get()
+        tax_rate = settings.tax_rate or 0.0
+        currency_code = settings.currency_code or 'USD'
+        results = [None] * len(entries)
+        prepared = []
+        positions = []
+        for index, entry in enumerate(entries):
+            try:
+                prepared.append(prepare_document(entry, tax_rate, currency_code))
+                positions.append(index)
+            except DocumentValidationError as e:
+                results[index] = {'success': False, 'error': str(e)}
+
+        missing_clients = check_clients_exist(prepared)
+        if missing_clients:
+            valid = []
+            for index, pair in zip(positions, prepared):
+                if pair[0]['client_id'] in missing_clients:
+                    results[index] = {'success': False, 'error': f"Client {pair[0]['client_id']} not found"}
+                else:
+                    valid.append((index, pair))
+            positions = [index for index, _ in valid]
+            prepared = [pair for _, pair in valid]
+
+        for index, result in zip(positions, insert_documents(prepared, current_app.config['BULK_CHUNK_SIZE'])):
+            results[index] = result
+
+        for index, result in enumerate(results):
+            result['index'] = index
+        created = sum(1 for result in results if result['success'])
+
+        return jsonify({
+            'success': created == len(results),
+            'created': created,
+            'failed': len(results) - created,
+            'results': results
+        })
+
+    except Exception as e:
+        db.session.rollback()
+        logging.error(f"Error creating documents in bulk: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@bp.route('/api/sync', methods=['GET', 'POST'])
+def api_sync():
+    """Delta sync for the PWA (see changelog.py)
+
+    GET returns the clients, documents and settings changed since ``since``
+    (the ``cursor`` of the previous response; omit it for a full snapshot),
+    with deleted ids as tombstones. Repeat while ``has_more`` is true. POST
+    uploads records created offline.
+    """
+    if request.method == 'POST':
+        return sync_upload()
+
+    try:
+        limit = parse_page_size(request.args.get('limit'), current_app.config['SYNC_PAGE_SIZE'], current_app.config['SYNC_MAX_PAGE_SIZE'])
+        since = []
+        if request.args.get('since'):
+            since = decode_cursor(request.args['since'])
+            if not isinstance(since, list) or len(since) not in (1, 2) or not all(isinstance(value, int) for value in since):
+                raise ValueError('Invalid cursor')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    changes = changes_since(since, limit)
+    changes['cursor'] = encode_cursor(changes['cursor'])
+    return jsonify(changes)
+
+def sync_upload():
+    """Create clients and documents recorded offline, in one request
+
+    Every record carries a client-generated ``ref`` that is echoed back with
+    its server id. Refs are stored (SyncRef) with the rows they created, so
+    an upload retried after a lost response returns the original ids,
+    marked ``replayed``, instead of creating the records twice. Documents
+    may name a client from this or an earlier upload with ``client_ref``
+    instead of ``client_id``.
+    """
+    data = request.get_json() or {}
+    clients = data.get('clients') or []
+    documents = data.get('documents') or []
+    if not isinstance(clients, list) or not isinstance(documents, list):
+        return jsonify({'success': False, 'error': 'clients and documents must be lists'}), 400
+    if len(clients) + len(documents) > current_app.config['SYNC_MAX_UPLOAD']:
+        return jsonify({'success': False, 'error': f"At most {current_app.config['SYNC_MAX_UPLOAD']} records per upload"}), 400
+    records = clients + documents
+    if not all(isinstance(record, dict) and isinstance(record.get('ref'), str) and 0 < len(record['ref']) <= 100
+               for record in records):
+        return jsonify({'success': False, 'error': 'Every record needs a ref of 1 to 100 characters'}), 400
+
+    try:
+        # Records a previous attempt already created
+        client_refs = {record['ref'] for record in clients} | {
+            record['client_ref'] for record in documents if isinstance(record.get('client_ref'), str)}
+        document_refs = {record['ref'] for record in documents}
+        known = {(row.entity, row.ref): row.entity_id for row in db.session.execute(
+            select(SyncRef.entity, SyncRef.ref, SyncRef.entity_id).where(or_(
+                and_(SyncRef.entity == 'client', SyncRef.ref.in_(client_refs)),
+                and_(SyncRef.entity == 'document', SyncRef.ref.in_(document_refs)),
+            ))
+        )}
+        client_ids = {ref: entity_id for (entity, ref), entity_id in known.items() if entity == 'client'}
+
+        client_results = {}
+        valid = []
+        for record in clients:
+            ref = record['ref']
+            if ref in client_ids:
+                client_results[ref] = {'ref': ref, 'success': True, 'id': client_ids[ref], 'replayed': True}
+                continue
+            try:
+                values = data_transfer.validate_client(record)
+                values.pop('id', None)
+                valid.append((ref, values))
+            except ValueError as e:
+                client_results[ref] = {'ref': ref, 'success': False, 'error': str(e)}
+
+        if valid:
+            inserted = db.session.execute(
+                insert(Client).returning(Client.id, sort_by_parameter_order=True),
+                [values for _, values in valid]
+            ).scalars().all()
+            db.session.execute(insert(SyncRef), [
+                {'entity': 'client', 'ref': ref, 'entity_id': client_id} for (ref, _), client_id in zip(valid, inserted)
+            ])
+            record_changes('client', inserted)
+            db.session.commit()
+            for (ref, _), client_id in zip(valid, inserted):
+                client_ids[ref] = client_id
+                client_results[ref] = {'ref': ref, 'success': True, 'id': client_id}
+
+        settings = settings_cache.get()
+        tax_rate = settings.tax_rate or 0.0
+        currency_code = settings.currency_code or 'USD'
+        document_results = {}
+        replayed = {ref: entity_id for (entity, ref), entity_id in known.items() if entity == 'document'}
+        if replayed:
+            numbers = dict(db.session.execute(
+                select(Document.id, Document.document_number).where(Document.id.in_(replayed.values()))
+            ).all())
+            for ref, document_id in replayed.items():
+                document_results[ref] = {'ref': ref, 'success': True, 'id': document_id,
+                                         'document_number': numbers.get(document_id), 'replayed': True}
+        prepared = []
+        refs = []
+        for record in documents:
+            ref = record['ref']
+            if ref in replayed:
+                continue
+            try:
+                if record.get('client_ref') is not None:
+                    if record['client_ref'] not in client_ids:
+                        raise DocumentValidationError(f"Client {record['client_ref']} was not created")
+                    record = dict(record, client_id=client_ids[record['client_ref']])
+                prepared.append(prepare_document(record, tax_rate, currency_code))
+                refs.append(ref)
+            except DocumentValidationError as e:
+                document_results[ref] = {'ref': ref, 'success': False, 'error': str(e)}
+
+        missing_clients = check_clients_exist(prepared)
+        if missing_clients:
+            kept = [(ref, pair) for ref, pair in zip(refs, prepared) if pair[0]['client_id'] not in missing_clients]
+            for ref, pair in zip(refs, prepared):
+                if pair[0]['client_id'] in missing_clients:
+                    document_results[ref] = {'ref': ref, 'success': False, 'error': f"Client {pair[0]['client_id']} not found"}
+            refs = [ref for ref, _ in kept]
+            prepared = [pair for _, pair in kept]
+
+        for ref, result in zip(refs, insert_documents(prepared, current_app.config['BULK_CHUNK_SIZE'], refs=refs)):
+            document_results[ref] = dict(result, ref=ref)
+
+        client_results = [client_results[record['ref']] for record in clients]
+        document_results = [document_results[record['ref']] for record in documents]
+        return jsonify({
+            'success': all(result['success'] for result in client_results + document_results),
+            'clients': client_results,
+            'documents': document_results
+        })
+
+    except IntegrityError:
+        # Another request is creating the same client refs; a retry will replay its results
+        db.session.rollback()
+        return jsonify({'success': False, 'error': 'These records are being uploaded by another request; retry'}), 409
+
+    except Exception as e:
+        db.session.rollback()
+        logging.error(f"Error uploading offline records: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@bp.route('/api/documents/<int:document_id>/status', methods=['PUT'])
+def api_document_status(document_id):
+    data = request.get_json() or {}
+    status = data.get('status')
+    if status not in DOCUMENT_STATUSES:
+        return jsonify({'success': False, 'error': f"status must be one of {', '.join(DOCUMENT_STATUSES)}"}), 400
+
+    try:
+        # Lock the row so concurrent status changes move its totals once
+        document = db.session.get(Document, document_id, with_for_update=True)
+        if document is None:
+            return jsonify({'success': False, 'error': 'Document not found'}), 404
+
+        change_status(document, status)
+        document.updated_at = datetime.utcnow()
+        db.session.commit()
+
+        return jsonify({'success': True, 'id': document.id, 'status': document.status})
+
+    except Exception as e:
+        db.session.rollback()
+        logging.error(f"Error updating document status: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@bp.route('/api/reports/revenue')
+def api_revenue_report():
+    group_by = split_param('group_by') or ['month']
+    unknown = [name for name in group_by if name not in REVENUE_GROUPS]
+    if unknown:
+        return jsonify({'success': False, 'error': f"group_by must be among {', '.join(REVENUE_GROUPS)}"}), 400
+
+    statuses = split_param('status')
+    document_types = split_param('type')
+    if any(status not in DOCUMENT_STATUSES for status in statuses):
+        return jsonify({'success': False, 'error': f"status must be among {', '.join(DOCUMENT_STATUSES)}"}), 400
+    if any(document_type not in DOCUMENT_TYPES for document_type in document_types):
+        return jsonify({'success': False, 'error': f"type must be among {', '.join(DOCUMENT_TYPES)}"}), 400
+
+    # Periods are YYYY-MM; a full date is accepted and truncated
+    start = request.args.get('start', '')[:7] or None
+    end = request.args.get('end', '')[:7] or None
+    client_id = request.args.get('client_id', type=int)
+
+    rows = revenue_report(group_by, start, end, statuses, document_types, client_id)
+    return jsonify({'group_by': group_by, 'rows': rows})
+
+@bp.route('/api/reports/aging')
+def api_aging_report():
+    as_of = request.args.get('as_of')
+    try:
+        as_of = datetime.strptime(as_of, '%Y-%m-%d').date() if as_of else date.today()
+    except ValueError:
+        return jsonify({'success': False, 'error': 'as_of must be a YYYY-MM-DD date'}), 400
+
+    by_client = request.args.get('group_by') == 'client'
+    return jsonify({'as_of': as_of.isoformat(), 'rows': aging_report(as_of, by_client)})
+
+@bp.route('/api/export-settings/<format>')
 def api_export_settings(format):
     settings = BusinessSettings.query.first()
     if not settings:
@@ -185,7 +686,7 @@ def api_export_settings(format):
     else:
         return jsonify({'error': 'Invalid format'}), 400
 
-@app.route('/api/import-settings', methods=['POST'])
+@bp.route('/api/import-settings', methods=['POST'])
 def api_import_settings():
     if 'file' not in request.files:
         return jsonify({'error': 'No file uploaded'}), 400
@@ -214,6 +715,7 @@ def api_import_settings():
 
         settings.updated_at = datetime.utcnow()
         db.session.commit()
+        settings_cache.invalidate()
 
         return jsonify({'success': True, 'message': 'Settings imported successfully'})
 
@@ -221,418 +723,376 @@ def api_import_settings():
         logging.error(f"Error importing settings: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/next-document-number/<document_type>')
-def api_next_document_number(document_type):
-    number = generate_document_number(document_type)
-    return jsonify({'document_number': number})
+@bp.route('/api/export/<any(clients, documents):kind>')
+def api_export_data(kind):
+    format = request.args.get('format', 'csv')
+    if format not in data_transfer.FORMATS:
+        return jsonify({'error': 'Invalid format'}), 400
 
-@app.route('/api/generate-pdf', methods=['POST'])
-def api_generate_pdf():
-    data = request.get_json()
+    # Rows are read from a server-side cursor and encoded as they are sent
+    export = data_transfer.export_clients if kind == 'clients' else data_transfer.export_documents
+    extension = 'csv' if format == 'csv' else 'ndjson'
+    return Response(
+        stream_with_context(export(format)),
+        mimetype=data_transfer.MIMETYPES[format],
+        headers={'Content-Disposition': f'attachment; filename={kind}.{extension}'}
+    )
+
+@bp.route('/api/export/accounting')
+def api_export_accounting():
+    format = request.args.get('format', 'csv')
+    if format not in data_transfer.ACCOUNTING_FORMATS:
+        return jsonify({'error': 'Invalid format'}), 400
+    if format == 'parquet' and not data_transfer.parquet_available():
+        return jsonify({'error': 'Parquet export requires pyarrow to be installed'}), 400
 
     try:
-        # Create PDF buffer
-        buffer = io.BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=letter, rightMargin=72, leftMargin=72, topMargin=72, bottomMargin=18)
-
-        # Build PDF content
-        story = []
-        styles = getSampleStyleSheet()
-
-        # Custom styles for professional look
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=28,
-            spaceAfter=30,
-            spaceBefore=20,
-            textColor=colors.HexColor('#1a365d'),
-            alignment=TA_CENTER,
-            fontName='Helvetica-Bold'
-        )
-
-        header_style = ParagraphStyle(
-            'CustomHeader',
-            parent=styles['Heading2'],
-            fontSize=18,
-            spaceAfter=15,
-            spaceBefore=10,
-            textColor=colors.HexColor('#2d3748'),
-            fontName='Helvetica-Bold'
+        start, end = (
+            datetime.strptime(request.args[name], '%Y-%m-%d').date() if request.args.get(name) else None
+            for name in ('start', 'end')
         )
+    except ValueError:
+        return jsonify({'error': 'start and end must be YYYY-MM-DD dates'}), 400
+
+    document_types = split_param('type')
+    statuses = split_param('status')
+    if any(document_type not in DOCUMENT_TYPES for document_type in document_types):
+        return jsonify({'error': f"type must be among {', '.join(DOCUMENT_TYPES)}"}), 400
+    if any(status not in DOCUMENT_STATUSES for status in statuses):
+        return jsonify({'error': f"status must be among {', '.join(DOCUMENT_STATUSES)}"}), 400
+
+    chunks = data_transfer.export_accounting(
+        format, start=start, end=end, document_types=document_types, statuses=statuses,
+        client_id=request.args.get('client_id', type=int)
+    )
+    return Response(
+        stream_with_context(chunks),
+        mimetype=data_transfer.MIMETYPES[format],
+        headers={'Content-Disposition': f'attachment; filename=accounting.{format}'}
+    )
+
+@bp.route('/api/import/<any(clients, documents):kind>', methods=['POST'])
+def api_import_data(kind):
+    if 'file' not in request.files:
+        return jsonify({'error': 'No file uploaded'}), 400
 
-        subheader_style = ParagraphStyle(
-            'SubHeader',
-            parent=styles['Normal'],
-            fontSize=14,
-            spaceAfter=8,
-            textColor=colors.HexColor('#4a5568'),
-            fontName='Helvetica-Bold'
-        )
+    file = request.files['file']
+    if file.filename == '':
+        return jsonify({'error': 'No file selected'}), 400
 
-        body_style = ParagraphStyle(
-            'BodyText',
-            parent=styles['Normal'],
-            fontSize=11,
-            spaceBefore=4,
-            spaceAfter=4,
-            textColor=colors.HexColor('#2d3748'),
-            fontName='Helvetica'
-        )
+    format = data_transfer.import_format(file, request.form.get('format') or request.args.get('format'))
+    if format is None:
+        return jsonify({'error': 'Invalid file format'}), 400
 
-        address_style = ParagraphStyle(
-            'AddressText',
-            parent=styles['Normal'],
-            fontSize=10,
-            spaceBefore=2,
-            spaceAfter=2,
-            textColor=colors.HexColor('#4a5568'),
-            fontName='Helvetica'
+    records = data_transfer.read_records(data_transfer.detach_upload(file), format)
+    chunk_size = current_app.config['IMPORT_CHUNK_SIZE']
+    if kind == 'clients':
+        progress = data_transfer.import_clients(records, chunk_size)
+    else:
+        settings = settings_cache.get()
+        progress = data_transfer.import_documents(
+            records, format, settings.tax_rate or 0.0, settings.currency_code or 'USD', chunk_size
         )
 
-        # Get business settings for PDF generation
-        business_settings = BusinessSettings.query.first()
-        if not business_settings:
-            business_settings = BusinessSettings()
-
-        # Business info and document header
-        business_name = data.get('business_name', 'Business Name')
-        business_email = data.get('business_email', '')
-        business_phone = data.get('business_phone', '')
-        business_address = data.get('business_address', '')
-        business_logo = data.get('business_logo', '')
-        business_signature = data.get('business_signature', '')
-        document_type = data.get('document_type', 'Document').title()
-        document_number = data.get('document_number', 'DOC-001')
-
-        # Professional header with business name and logo in aligned layout
-        header_data = []
-
-        # Create business info section
-        business_info_lines = [f"<b>{business_name}</b>"]
-        if business_address:
-            business_info_lines.append(business_address.replace('\n', '<br/>'))
-        if business_email:
-            business_info_lines.append(f"Email: {business_email}")
-        if business_phone:
-            business_info_lines.append(f"Phone: {business_phone}")
-
-        business_info_text = "<br/>".join(business_info_lines)
-
-        # Handle logo and business info layout
-        if business_logo:
-            try:
-                # Download image from URL if it's a URL, otherwise treat as file path
-                if business_logo.startswith(('http://', 'https://')):
-                    response = requests.get(business_logo, timeout=10)
-                    response.raise_for_status()
-                    logo_buffer = io.BytesIO(response.content)
-                    logo = Image(logo_buffer, width=1.5*inch, height=0.75*inch)
-                else:
-                    logo = Image(business_logo, width=1.5*inch, height=0.75*inch)
-                header_data.append([logo, Paragraph(business_info_text, body_style)])
-            except Exception as e:
-                logging.warning(f"Could not load logo image: {e}")
-                header_data.append(["", Paragraph(business_info_text, body_style)])
-        else:
-            header_data.append(["", Paragraph(business_info_text, body_style)])
-
-        if header_data:
-            header_table = Table(header_data, colWidths=[1.8*inch, 4.7*inch])
-            header_table.setStyle(TableStyle([
-                ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-                ('ALIGN', (0, 0), (0, 0), 'LEFT'),
-                ('ALIGN', (1, 0), (1, 0), 'LEFT'),
-                ('LEFTPADDING', (0, 0), (-1, -1), 0),
-                ('RIGHTPADDING', (0, 0), (-1, -1), 0),
-                ('TOPPADDING', (0, 0), (-1, -1), 0),
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 0),
-            ]))
-            story.append(header_table)
-
-        story.append(Spacer(1, 30))
-
-        # Document type and number in professional header box
-        doc_header_data = [
-            [f"{document_type}", document_number],
-        ]
-
-        doc_header_table = Table(doc_header_data, colWidths=[3*inch, 3*inch])
-        doc_header_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, -1), colors.HexColor('#f7fafc')),
-            ('TEXTCOLOR', (0, 0), (-1, -1), colors.HexColor('#2d3748')),
-            ('ALIGN', (0, 0), (0, 0), 'LEFT'),
-            ('ALIGN', (1, 0), (1, 0), 'RIGHT'),
-            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 16),
-            ('LEFTPADDING', (0, 0), (-1, -1), 15),
-            ('RIGHTPADDING', (0, 0), (-1, -1), 15),
-            ('TOPPADDING', (0, 0), (-1, -1), 12),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
-            ('BOX', (0, 0), (-1, -1), 1, colors.HexColor('#e2e8f0')),
-        ]))
-
-        story.append(doc_header_table)
-        story.append(Spacer(1, 25))
-
-        # Professional client and date info layout with proper alignment
-        client_info = data.get('client', {})
-        issue_date = data.get('issue_date', '')
-        due_date = data.get('due_date', '')
-
-        # Create properly aligned two-column layout for client and date info
-        info_data = []
-
-        # Left column - Client info with consistent formatting
-        client_lines = []
-        if client_info:
-            client_lines.append("<b>BILL TO:</b>")
-            if client_info.get('name'):
-                client_lines.append(client_info.get('name'))
-            if client_info.get('company'):
-                client_lines.append(client_info.get('company'))
-            if client_info.get('address'):
-                # Handle multi-line addresses properly
-                address_lines = client_info.get('address').split('\n')
-                client_lines.extend([line.strip() for line in address_lines if line.strip()])
-            if client_info.get('email'):
-                client_lines.append(client_info.get('email'))
-            if client_info.get('phone'):
-                client_lines.append(client_info.get('phone'))
-
-        client_text = "<br/>".join(client_lines) if client_lines else ""
-
-        # Right column - Date info with consistent formatting
-        date_lines = []
-        if issue_date:
-            date_lines.append(f"<b>Issue Date:</b><br/>{issue_date}")
-        if due_date:
-            date_lines.append(f"<b>Due Date:</b><br/>{due_date}")
-
-        date_text = "<br/><br/>".join(date_lines) if date_lines else ""
-
-        if client_text or date_text:
-            info_data = [[
-                Paragraph(client_text, body_style) if client_text else "",
-                Paragraph(date_text, body_style) if date_text else ""
-            ]]
-
-            info_table = Table(info_data, colWidths=[3.8*inch, 2.7*inch])
-            info_table.setStyle(TableStyle([
-                ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-                ('ALIGN', (0, 0), (0, 0), 'LEFT'),   # Client info left-aligned
-                ('ALIGN', (1, 0), (1, 0), 'RIGHT'),  # Date info right-aligned
-                ('LEFTPADDING', (0, 0), (-1, -1), 0),
-                ('RIGHTPADDING', (0, 0), (-1, -1), 0),
-                ('TOPPADDING', (0, 0), (-1, -1), 0),
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 0),
-            ]))
-
-            story.append(info_table)
-            story.append(Spacer(1, 25))
-
-        # Professional items table
-        items = data.get('items', [])
-        if items:
-            # Add section header
-            items_header = Paragraph("ITEMS", subheader_style)
-            story.append(items_header)
-            story.append(Spacer(1, 10))
-
-            table_data = [['Description', 'Qty', 'Unit Price', 'Total']]
-            currency_symbol = data.get('currency_symbol') or business_settings.currency_symbol or '$'
-
-            for item in items:
-                qty = float(item.get('quantity', 0))
-                price = float(item.get('unit_price', 0))
-                total = qty * price
-
-                # Format quantity to show as integer if it's a whole number
-                qty_str = f"{qty:g}"
-
-                table_data.append([
-                    item.get('description', ''),
-                    qty_str,
-                    f"{currency_symbol}{price:,.2f}",
-                    f"{currency_symbol}{total:,.2f}"
-                ])
-
-            # Create professional table
-            table = Table(table_data, colWidths=[3.2*inch, 0.8*inch, 1.3*inch, 1.3*inch])
-            table.setStyle(TableStyle([
-                # Header styling
-                ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2d3748')),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 11),
-                ('LEFTPADDING', (0, 0), (-1, 0), 12),
-                ('RIGHTPADDING', (0, 0), (-1, 0), 12),
-                ('TOPPADDING', (0, 0), (-1, 0), 10),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 10),
-
-                # Body styling
-                ('BACKGROUND', (0, 1), (-1, -1), colors.white),
-                ('TEXTCOLOR', (0, 1), (-1, -1), colors.HexColor('#2d3748')),
-                ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-                ('FONTSIZE', (0, 1), (-1, -1), 10),
-                ('LEFTPADDING', (0, 1), (-1, -1), 12),
-                ('RIGHTPADDING', (0, 1), (-1, -1), 12),
-                ('TOPPADDING', (0, 1), (-1, -1), 8),
-                ('BOTTOMPADDING', (0, 1), (-1, -1), 8),
-
-                # Alignment
-                ('ALIGN', (0, 0), (0, -1), 'LEFT'),    # Description
-                ('ALIGN', (1, 0), (-1, -1), 'RIGHT'),  # Numbers
-
-                # Borders
-                ('LINEBELOW', (0, 0), (-1, 0), 2, colors.HexColor('#2d3748')),
-                ('LINEBELOW', (0, 1), (-1, -2), 0.5, colors.HexColor('#e2e8f0')),
-                ('BOX', (0, 0), (-1, -1), 1, colors.HexColor('#cbd5e0')),
-
-                # Alternating row colors
-                ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f7fafc')])
-            ]))
-
-            story.append(table)
-            story.append(Spacer(1, 25))
-
-        # Professional totals section
-        totals = data.get('totals', {})
-        if totals:
-            currency_symbol = data.get('currency_symbol') or business_settings.currency_symbol or '$'
-            subtotal = totals.get('subtotal', 0)
-            tax_amount = totals.get('tax_amount', 0)
-            total = totals.get('total', 0)
-            tax_rate = totals.get('tax_rate', 0)
-
-            # Create totals data with proper formatting
-            totals_data = []
-
-            # Subtotal
-            totals_data.append(['Subtotal:', f"{currency_symbol}{subtotal:,.2f}"])
-
-            # Tax (if applicable)
-            if tax_rate > 0:
-                totals_data.append([f'Tax ({tax_rate:g}%):', f"{currency_symbol}{tax_amount:,.2f}"])
-
-            # Total
-            totals_data.append(['TOTAL:', f"{currency_symbol}{total:,.2f}"])
-
-            # Create professional totals table
-            totals_table = Table(totals_data, colWidths=[3.5*inch, 2.5*inch])
-            totals_table.setStyle(TableStyle([
-                # General alignment and spacing
-                ('ALIGN', (0, 0), (-1, -1), 'RIGHT'),
-                ('LEFTPADDING', (0, 0), (-1, -1), 12),
-                ('RIGHTPADDING', (0, 0), (-1, -1), 12),
-                ('TOPPADDING', (0, 0), (-1, -1), 6),
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-
-                # Subtotal and tax styling
-                ('FONTNAME', (0, 0), (-1, -2), 'Helvetica'),
-                ('FONTSIZE', (0, 0), (-1, -2), 11),
-                ('TEXTCOLOR', (0, 0), (-1, -2), colors.HexColor('#4a5568')),
-
-                # Total row styling (last row)
-                ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, -1), (-1, -1), 14),
-                ('TEXTCOLOR', (0, -1), (-1, -1), colors.HexColor('#2d3748')),
-                ('BACKGROUND', (0, -1), (-1, -1), colors.HexColor('#f7fafc')),
-                ('TOPPADDING', (0, -1), (-1, -1), 10),
-                ('BOTTOMPADDING', (0, -1), (-1, -1), 10),
-
-                # Borders
-                ('LINEABOVE', (0, -1), (-1, -1), 2, colors.HexColor('#2d3748')),
-                ('BOX', (0, -1), (-1, -1), 1, colors.HexColor('#cbd5e0')),
-            ]))
-
-            story.append(totals_table)
-
-        # Professional notes section
-        notes = data.get('notes', '')
-        if notes:
-            story.append(Spacer(1, 30))
-
-            # Notes header
-            notes_header = Paragraph("NOTES", subheader_style)
-            story.append(notes_header)
-            story.append(Spacer(1, 8))
-
-            # Notes content in a subtle box
-            notes_data = [[notes]]
-            notes_table = Table(notes_data, colWidths=[6.5*inch])
-            notes_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, -1), colors.HexColor('#f7fafc')),
-                ('TEXTCOLOR', (0, 0), (-1, -1), colors.HexColor('#4a5568')),
-                ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-                ('FONTSIZE', (0, 0), (-1, -1), 10),
-                ('LEFTPADDING', (0, 0), (-1, -1), 15),
-                ('RIGHTPADDING', (0, 0), (-1, -1), 15),
-                ('TOPPADDING', (0, 0), (-1, -1), 12),
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
-                ('BOX', (0, 0), (-1, -1), 1, colors.HexColor('#e2e8f0')),
-                ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-            ]))
-
-            story.append(notes_table)
-
-        # Signature section
-        if business_signature:
-            try:
-                # Download image from URL if it's a URL, otherwise treat as file path
-                if business_signature.startswith(('http://', 'https://')):
-                    response = requests.get(business_signature, timeout=10)
-                    response.raise_for_status()
-                    signature_buffer = io.BytesIO(response.content)
-                    signature = Image(signature_buffer, width=1.5*inch, height=0.75*inch)
-                else:
-                    signature = Image(business_signature, width=1.5*inch, height=0.75*inch)
-                signature.hAlign = 'RIGHT'
-                story.append(Spacer(1, 40))
-                story.append(signature)
-            except Exception as e:
-                logging.warning(f"Could not load signature image: {e}")
+    def report():
+        try:
+            yield from data_transfer.ndjson_lines(progress)
+        except Exception as e:
+            db.session.rollback()
+            logging.error(f"Error importing {kind}: {str(e)}")
+            yield json.dumps({'done': True, 'error': str(e)}) + '\n'
 
-        # Build PDF
-        doc.build(story)
-        buffer.seek(0)
+    # One line per chunk written and per rejected record, then a final summary
+    return Response(stream_with_context(report()), mimetype='application/x-ndjson')
 
-        # Save PDF to temp directory
-        temp_dir = os.path.join(os.getcwd(), 'temp_pdfs')
-        os.makedirs(temp_dir, exist_ok=True)
+@bp.route('/api/next-document-number/<document_type>')
+def api_next_document_number(document_type):
+    # The number is taken from the allocator, so it is never handed out again
+    # and can be sent back when the document is saved
+    number = generate_document_number(document_type)
+    return jsonify({'document_number': number})
 
-        filename = f"{document_number}.pdf"
-        filepath = os.path.join(temp_dir, filename)
+def build_render_spec(data):
+    """Resolve request defaults into a plain-data spec for the render pool"""
+    spec = dict(data)
+    if not spec.get('currency_symbol'):
+        spec['currency_symbol'] = settings_cache.get().currency_symbol or '$'
+    spec['large_document'] = bool(spec.get(
+        'large_document', len(spec.get('items') or []) >= current_app.config['PDF_LARGE_DOCUMENT_ITEMS']))
+    spec['letterhead_every_page'] = bool(spec.get('letterhead_every_page', current_app.config['PDF_LETTERHEAD_EVERY_PAGE']))
+
+    # Load logo and signature through the shared cache so the render
+    # workers never touch the network
+    started = time.perf_counter()
+    spec['images'] = {}
+    spec['image_digests'] = {}
+    for name, key in (('logo', 'business_logo'), ('signature', 'business_signature')):
+        source = spec.get(key)
+        if not source:
+            continue
+        try:
+            asset = image_cache.get(source)
+            spec['images'][name] = asset.data
+            spec['image_digests'][name] = asset.digest
+        except Exception as e:
+            logging.warning(f"Could not load {name} image: {e}")
+    metrics.observe_pdf_phase('image_fetch', time.perf_counter() - started)
+
+    return spec
+
+def pdf_filename(spec):
+    return f"{spec.get('document_number', 'DOC-001')}.pdf"
+
+def document_render_payload(document, settings):
+    """Build the /api/generate-pdf payload for a stored document"""
+    return {
+        'business_name': settings.business_name,
+        'business_email': settings.email,
+        'business_phone': settings.phone,
+        'business_address': settings.address,
+        'business_logo': settings.logo_url,
+        'business_signature': settings.signature_url,
+        'currency_symbol': settings.currency_symbol,
+        'document_type': document.document_type,
+        'document_number': document.document_number,
+        'client': document.client.to_dict() if document.client else {},
+        'issue_date': document.issue_date.isoformat() if document.issue_date else '',
+        'due_date': document.due_date.isoformat() if document.due_date else '',
+        'notes': document.notes or '',
+        'items': [
+            {'description': item.description, 'quantity': item.quantity, 'unit_price': item.unit_price}
+            for item in sorted(document.items, key=lambda item: item.order_index or 0)
+        ],
+        'totals': {
+            'subtotal': document.subtotal or 0,
+            'tax_amount': document.tax_amount or 0,
+            'total': document.total_amount or 0,
+            'tax_rate': settings.tax_rate or 0
+        }
+    }
+
+def render_to_file(spec):
+    """Render a spec into the output directory unless an identical render exists"""
+    filename = pdf_filename(spec)
+    key = render_key(spec, template_key(spec.get('template')))
+
+    filepath = render_cache.lookup(filename, key)
+    if filepath:
+        touch(filepath)
+        metrics.PDF_RENDERS.inc(result='cached')
+        return filename, True
+
+    submitted = time.perf_counter()
+    pdf_bytes, timings = render_pool.render(spec, timeout=current_app.config['PDF_RENDER_TIMEOUT'])
+    rendered = time.perf_counter()
+    render_cache.store(filename, key, pdf_bytes)
+
+    # Whatever the worker did not spend rendering was spent queued or in transit
+    metrics.observe_pdf_phase('queue_wait', max(rendered - submitted - sum(timings.values()), 0.0))
+    for phase, seconds in timings.items():
+        metrics.observe_pdf_phase(phase, seconds)
+    metrics.observe_pdf_phase('disk_write', time.perf_counter() - rendered)
+    metrics.PDF_RENDERS.inc(result='rendered')
+    return filename, False
+
+@bp.route('/api/generate-pdf', methods=['POST'])
+def api_generate_pdf():
+    data = request.get_json()
 
-        with open(filepath, 'wb') as f:
-            f.write(buffer.getvalue())
+    try:
+        spec = build_render_spec(data)
+        filename, cached = render_to_file(spec)
 
         return jsonify({
             'success': True,
             'filename': filename,
+            'cached': cached,
             'message': 'PDF generated successfully'
         })
 
+    except RenderQueueFull:
+        response = jsonify({'success': False, 'error': 'PDF renderer is busy, please retry shortly'})
+        response.status_code = 503
+        response.headers['Retry-After'] = str(current_app.config['PDF_RENDER_RETRY_AFTER'])
+        return response
+
+    except RenderTimeout:
+        logging.error("PDF render timed out")
+        return jsonify({'success': False, 'error': 'PDF generation timed out'}), 504
+
+    except UnknownTemplate as e:
+        return jsonify({'success': False, 'error': f"Unknown PDF template: {e.args[0]}"}), 400
+
     except Exception as e:
         logging.error(f"Error generating PDF: {str(e)}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
-@app.route('/api/download-pdf/<filename>')
+@bp.route('/api/generate-pdf/batch', methods=['POST'])
+def api_generate_pdf_batch():
+    data = request.get_json() or {}
+    entries = data.get('documents') or []
+
+    if not isinstance(entries, list) or not entries:
+        return jsonify({'success': False, 'error': 'documents must be a non-empty list'}), 400
+    if len(entries) > current_app.config['PDF_BATCH_MAX_DOCUMENTS']:
+        return jsonify({'success': False, 'error': f"At most {current_app.config['PDF_BATCH_MAX_DOCUMENTS']} documents per batch"}), 400
+
+    # Resolve everything that needs the database before the response starts
+    # streaming; entries are either stored document IDs or full render payloads
+    document_ids = [entry['document_id'] for entry in entries if isinstance(entry, dict) and 'document_id' in entry]
+    documents = {}
+    if document_ids:
+        query = Document.query.options(joinedload(Document.client), selectinload(Document.items))
+        documents = {document.id: document for document in query.filter(Document.id.in_(document_ids))}
+    settings = settings_cache.get()
+
+    jobs = []
+    failures = []
+    for index, entry in enumerate(entries):
+        try:
+            if not isinstance(entry, dict):
+                raise ValueError('Each entry must be an object')
+            if 'document_id' in entry:
+                document = documents.get(entry['document_id'])
+                if document is None:
+                    raise LookupError(f"Document {entry['document_id']} not found")
+                entry = document_render_payload(document, settings)
+            spec = build_render_spec(entry)
+            jobs.append((index, spec, render_key(spec, template_key(spec.get('template')))))
+        except Exception as e:
+            failures.append({'index': index, 'error': str(e)})
+
+    archive_name = f"documents-{datetime.now().strftime('%Y-%m-%d-%H-%M-%S')}.zip"
+    return Response(
+        stream_with_context(stream_batch_zip(jobs, failures)),
+        mimetype='application/zip',
+        headers={'Content-Disposition': f'attachment; filename={archive_name}'}
+    )
+
+def stream_batch_zip(jobs, failures):
+    """Render jobs through the pool and yield a ZIP archive as each PDF finishes
+
+    At most one PDF per render worker is in flight, so memory stays bounded
+    by the pool size rather than the batch size. Failed items are listed in
+    manifest.json at the end of the archive instead of aborting the batch.
+    """
+    buffer = ZipStreamBuffer()
+    queue = deque(jobs)
+    pending = {}
+    rendered = []
+    names = set()
+    max_in_flight = max(render_pool.workers, 1)
+    timeout = current_app.config['PDF_RENDER_TIMEOUT']
+
+    def add_to_archive(archive, index, spec, pdf_bytes, cached):
+        filename = pdf_filename(spec)
+        if filename in names:
+            filename = f"{filename[:-4]}-{index}.pdf"
+        names.add(filename)
+        archive.writestr(filename, pdf_bytes)
+        rendered.append({'index': index, 'filename': filename, 'cached': cached})
+
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        busy_since = None
+        while queue or pending:
+            # Top up the in-flight renders, serving cache hits straight from disk
+            while queue and len(pending) < max_in_flight:
+                index, spec, key = queue[0]
+                filepath = render_cache.lookup(pdf_filename(spec), key)
+                if filepath:
+                    queue.popleft()
+                    touch(filepath)
+                    metrics.PDF_RENDERS.inc(result='cached')
+                    with open(filepath, 'rb') as f:
+                        add_to_archive(archive, index, spec, f.read(), True)
+                    yield buffer.drain()
+                    continue
+
+                try:
+                    future = render_pool.submit(spec)
+                except RenderQueueFull:
+                    # The pool is shared with other requests: wait for our own
+                    # renders to finish, or back off if we have none in flight
+                    if pending:
+                        break
+                    busy_since = busy_since or time.monotonic()
+                    if time.monotonic() - busy_since > timeout:
+                        queue.popleft()
+                        failures.append({'index': index, 'document_number': spec.get('document_number'), 'error': 'PDF renderer is busy'})
+                        busy_since = None
+                    else:
+                        time.sleep(0.1)
+                    continue
+
+                busy_since = None
+                queue.popleft()
+                pending[future] = (index, spec, key)
+
+            if not pending:
+                continue
+
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                for index, spec, key in pending.values():
+                    failures.append({'index': index, 'document_number': spec.get('document_number'), 'error': 'PDF generation timed out'})
+                pending.clear()
+                continue
+
+            for future in done:
+                index, spec, key = pending.pop(future)
+                try:
+                    pdf_bytes, timings = future.result()
+                    render_cache.store(pdf_filename(spec), key, pdf_bytes)
+                    for phase, seconds in timings.items():
+                        metrics.observe_pdf_phase(phase, seconds)
+                    metrics.PDF_RENDERS.inc(result='rendered')
+                    add_to_archive(archive, index, spec, pdf_bytes, False)
+                except Exception as e:
+                    logging.error(f"Error generating PDF in batch: {str(e)}")
+                    failures.append({'index': index, 'document_number': spec.get('document_number'), 'error': str(e)})
+            yield buffer.drain()
+
+        manifest = {
+            'rendered': rendered,
+            'failed': sorted(failures, key=lambda failure: failure['index'])
+        }
+        archive.writestr('manifest.json', json.dumps(manifest, indent=2))
+
+    yield buffer.drain()
+
+@bp.route('/api/download-pdf/<filename>')
 def api_download_pdf(filename):
     try:
-        temp_dir = os.path.join(os.getcwd(), 'temp_pdfs')
-        filepath = os.path.join(temp_dir, filename)
+        temp_dir = current_app.config['PDF_OUTPUT_DIR']
+        filepath = safe_join(temp_dir, filename)
 
-        if not os.path.exists(filepath):
+        if filepath is None or not filename.endswith('.pdf') or not os.path.isfile(filepath):
             return jsonify({'error': 'PDF file not found'}), 404
 
-        return send_file(
+        touch(filepath)
+
+        # Conditional send: ETag/Last-Modified validators answer 304, Range
+        # requests answer 206, and the body goes out through the server's
+        # file wrapper (sendfile) or X-Sendfile when enabled.
+        response = send_file(
             filepath,
             as_attachment=True,
             download_name=filename,
-            mimetype='application/pdf'
+            mimetype='application/pdf',
+            conditional=True,
+            etag=render_cache.stored_key(filename) or True,
+            max_age=0
         )
+        response.cache_control.private = True
+        return response
+
+    except RequestedRangeNotSatisfiable:
+        raise
 
     except Exception as e:
         logging.error(f"Error downloading PDF: {str(e)}")
-        return jsonify({'error': str(e)}), 500
\ No newline at end of file
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/api/pdf-cache/stats')
+def api_pdf_cache_stats():
+    return jsonify(render_cache.stats())
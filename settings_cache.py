@@ -0,0 +1,74 @@
+"""Read-through cache for the single BusinessSettings row.
+
+Each process keeps a snapshot of the row's column values. Writers call
+``invalidate()``, which bumps the mtime of a stamp file; every reader
+compares that mtime (one ``stat`` call) with the one seen at load time, so
+an update in any gunicorn worker is picked up by all of them on their next
+request. A TTL bounds staleness where workers do not share a filesystem.
+"""
+import os
+import threading
+import time
+from extensions import db
+from models import BusinessSettings
+
+
+class SettingsCache:
+    def __init__(self, stamp_path=None, max_age=60):
+        self.stamp_path = stamp_path
+        self.max_age = max_age
+        self._values = None
+        self._version = None
+        self._loaded_at = 0
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.stamp_path = app.config['SETTINGS_STAMP_PATH']
+        self.max_age = app.config['SETTINGS_CACHE_TTL']
+
+    @property
+    def version(self):
+        """Changes whenever the settings are written through ``invalidate``"""
+        try:
+            return os.stat(self.stamp_path).st_mtime_ns
+        except FileNotFoundError:
+            return 0
+
+    def get(self):
+        """Return a detached BusinessSettings copy, creating the row if needed"""
+        version = self.version
+        values = self._values
+        if values is None or version != self._version or time.monotonic() - self._loaded_at > self.max_age:
+            values = self._load(version)
+        return BusinessSettings(**values)
+
+    def _load(self, version):
+        with self._lock:
+            settings = BusinessSettings.query.first()
+            if not settings:
+                settings = BusinessSettings()
+                db.session.add(settings)
+                db.session.commit()
+
+            values = {column.name: getattr(settings, column.name) for column in BusinessSettings.__table__.columns}
+            self._values = values
+            self._version = version
+            self._loaded_at = time.monotonic()
+            return values
+
+    def invalidate(self):
+        """Drop cached settings in this and every other worker process"""
+        os.makedirs(os.path.dirname(self.stamp_path), exist_ok=True)
+        with open(self.stamp_path, 'a'):
+            pass
+        now = time.time_ns()
+        # Never reuse the previous stamp, even on coarse-grained filesystems
+        if now <= self.version:
+            now = self.version + 1
+        os.utime(self.stamp_path, ns=(now, now))
+        with self._lock:
+            self._values = None
+
+
+# Configured by create_app
+settings_cache = SettingsCache()
@@ -51,6 +51,36 @@ function formatDate(dateString) {
     });
 }
 
+// Escape text for insertion into HTML templates
+function escapeHtml(value) {
+    const div = document.createElement('div');
+    div.textContent = value ?? '';
+    return div.innerHTML;
+}
+
+// Delay a call until input has settled
+function debounce(fn, wait = 250) {
+    let timer = null;
+    return function(...args) {
+        clearTimeout(timer);
+        timer = setTimeout(() => fn.apply(this, args), wait);
+    };
+}
+
+// Fetch one page of clients from the keyset-paginated API
+async function fetchClients({ q = '', cursor = null, limit = 50, fields = null } = {}) {
+    const params = new URLSearchParams({ limit });
+    if (q) params.set('q', q);
+    if (cursor) params.set('cursor', cursor);
+    if (fields) params.set('fields', fields.join(','));
+
+    const response = await fetch(`/api/clients?${params}`);
+    if (!response.ok) {
+        throw new Error('Failed to load clients');
+    }
+    return response.json();
+}
+
 // Validate form fields
 function validateRequired(form) {
     const requiredFields = form.querySelectorAll('[required]');
@@ -195,7 +225,7 @@ if (installButton) {
 // Service Worker registration
 if ('serviceWorker' in navigator) {
     window.addEventListener('load', function() {
-        navigator.serviceWorker.register('/static/sw.js')
+        navigator.serviceWorker.register('/sw.js')
             .then(function(registration) {
                 console.log('ServiceWorker registration successful with scope: ', registration.scope);
             })
@@ -205,9 +235,28 @@ if ('serviceWorker' in navigator) {
     });
 }
 
+// Upload records saved while offline (sync.js); pages refresh on 'sync:uploaded'
+function uploadOfflineRecords() {
+    syncPush().then(function(result) {
+        const uploaded = result.clients.concat(result.documents);
+        if (!uploaded.length) return;
+        const failed = uploaded.filter(item => !item.success).length;
+        showAlert(`Uploaded ${uploaded.length - failed} record(s) saved offline` +
+            (failed ? `; ${failed} could not be saved` : ''), failed ? 'warning' : 'success');
+        window.dispatchEvent(new CustomEvent('sync:uploaded', { detail: result }));
+    }).catch(error => console.log('Sync failed:', error));
+}
+
 // Online/Offline status
 window.addEventListener('online', function() {
     showAlert('You are back online!', 'success');
+    uploadOfflineRecords();
+});
+
+window.addEventListener('load', function() {
+    if (navigator.onLine) {
+        uploadOfflineRecords();
+    }
 });
 
 window.addEventListener('offline', function() {
@@ -6,6 +6,8 @@ class DocumentGenerator {
         this.documentType = '';
         this.generatedPdfBlob = null;
         this.generatedPdfFilename = null;
+        this.clientSearch = '';
+        this.clientCursor = null;
         
         this.init();
     }
@@ -13,6 +15,7 @@ class DocumentGenerator {
     async init() {
         await this.loadBusinessSettings();
         this.setupEventListeners();
+        this.loadClients(true);
         this.addInitialItem();
     }
     
@@ -31,6 +34,47 @@ class DocumentGenerator {
         }
     }
     
+    // Fill the client dropdown one page at a time
+    async loadClients(reset = false) {
+        const clientSelect = document.getElementById('clientSelect');
+        if (reset) {
+            this.clientCursor = null;
+        }
+
+        try {
+            const page = await fetchClients({ q: this.clientSearch, cursor: this.clientCursor });
+            if (reset) {
+                const selected = clientSelect.selectedOptions[0];
+                clientSelect.querySelectorAll('option[value]:not([value=""])').forEach(option => {
+                    if (option !== selected) option.remove();
+                });
+            }
+            page.clients.forEach(client => {
+                if (!clientSelect.querySelector(`option[value="${client.id}"]`)) {
+                    this.appendClientOption(client);
+                }
+            });
+            this.clientCursor = page.next_cursor;
+            document.getElementById('loadMoreClientsBtn').classList.toggle('d-none', !this.clientCursor);
+        } catch (error) {
+            console.error('Error loading clients:', error);
+        }
+    }
+    
+    appendClientOption(client) {
+        const option = document.createElement('option');
+        option.value = client.id;
+        option.textContent = `${client.name}${client.company ? ' - ' + client.company : ''}`;
+        option.dataset.name = client.name;
+        option.dataset.email = client.email;
+        option.dataset.phone = client.phone;
+        option.dataset.address = client.address;
+        option.dataset.company = client.company;
+        
+        document.getElementById('clientSelect').appendChild(option);
+        return option;
+    }
+    
     setupEventListeners() {
         // Document type change
         document.getElementById('documentType').addEventListener('change', (e) => {
@@ -57,6 +101,13 @@ class DocumentGenerator {
             this.updatePreview();
         });
         
+        // Client search and paging
+        document.getElementById('clientSearch').addEventListener('input', debounce((e) => {
+            this.clientSearch = e.target.value.trim();
+            this.loadClients(true);
+        }));
+        document.getElementById('loadMoreClientsBtn').addEventListener('click', () => this.loadClients());
+        
         // Date changes
         document.getElementById('issueDate').addEventListener('change', () => this.updatePreview());
         document.getElementById('dueDate').addEventListener('change', () => this.updatePreview());
@@ -482,16 +533,7 @@ class DocumentGenerator {
                 
                 // Add to select dropdown
                 const clientSelect = document.getElementById('clientSelect');
-                const option = document.createElement('option');
-                option.value = result.client.id;
-                option.textContent = `${result.client.name}${result.client.company ? ' - ' + result.client.company : ''}`;
-                option.dataset.name = result.client.name;
-                option.dataset.email = result.client.email;
-                option.dataset.phone = result.client.phone;
-                option.dataset.address = result.client.address;
-                option.dataset.company = result.client.company;
-                
-                clientSelect.appendChild(option);
+                this.appendClientOption(result.client);
                 clientSelect.value = result.client.id;
                 
                 // Update selected client
@@ -0,0 +1,108 @@
+// Offline uploads through /api/sync
+// Records created while offline wait in an IndexedDB outbox and are uploaded in one
+// batch when the connection returns (page load, the online event, or background
+// sync in the service worker). Loaded by the pages and by the service worker.
+
+const SYNC_DB_NAME = 'bizdoc-sync';
+
+function syncOpenDb() {
+    return new Promise(function(resolve, reject) {
+        const request = indexedDB.open(SYNC_DB_NAME, 2);
+        request.onupgradeneeded = function() {
+            const db = request.result;
+            // Version 1 also mirrored clients, documents and settings; nothing read them
+            ['clients', 'documents', 'meta'].forEach(function(store) {
+                if (db.objectStoreNames.contains(store)) db.deleteObjectStore(store);
+            });
+            if (!db.objectStoreNames.contains('outbox')) {
+                db.createObjectStore('outbox', { keyPath: 'ref' });
+            }
+        };
+        request.onsuccess = () => resolve(request.result);
+        request.onerror = () => reject(request.error);
+    });
+}
+
+// Run work(tx) in one transaction; resolves with its result once committed
+function syncTransaction(db, stores, mode, work) {
+    return new Promise(function(resolve, reject) {
+        const tx = db.transaction(stores, mode);
+        let result;
+        tx.oncomplete = () => resolve(result);
+        tx.onerror = tx.onabort = () => reject(tx.error);
+        result = work(tx);
+    });
+}
+
+function syncRead(store, key) {
+    return syncOpenDb().then(db => syncTransaction(db, [store], 'readonly', function(tx) {
+        const request = key === undefined ? tx.objectStore(store).getAll() : tx.objectStore(store).get(key);
+        const result = {};
+        request.onsuccess = () => { result.value = request.result; };
+        return result;
+    })).then(result => result.value);
+}
+
+// Queue a client or document created offline; returns its ref.
+// A document can name a queued client with client_ref instead of client_id.
+async function syncQueue(kind, record) {
+    const ref = record.ref || `${kind}-${Date.now()}-${Math.random().toString(36).slice(2, 10)}`;
+    const db = await syncOpenDb();
+    await syncTransaction(db, ['outbox'], 'readwrite', function(tx) {
+        tx.objectStore('outbox').put({ ref, kind, record: Object.assign({}, record, { ref }), queuedAt: Date.now() });
+    });
+    // Lets the service worker upload it even if the page is closed first
+    if (typeof window !== 'undefined' && 'serviceWorker' in navigator) {
+        navigator.serviceWorker.ready
+            .then(registration => registration.sync && registration.sync.register('background-sync-documents'))
+            .catch(() => {});
+    }
+    return ref;
+}
+
+// Upload the outbox in one request. Accepted records leave the outbox;
+// rejected ones stay with their error so the user can fix them.
+async function syncPush() {
+    const entries = (await syncRead('outbox')) || [];
+    if (!entries.length) {
+        return { clients: [], documents: [] };
+    }
+
+    const response = await fetch('/api/sync', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({
+            clients: entries.filter(entry => entry.kind === 'client').map(entry => entry.record),
+            documents: entries.filter(entry => entry.kind === 'document').map(entry => entry.record)
+        })
+    });
+    if (!response.ok) {
+        throw new Error('Failed to upload offline records');
+    }
+    const result = await response.json();
+
+    const clientIds = {};
+    result.clients.filter(item => item.success).forEach(item => { clientIds[item.ref] = item.id; });
+    const outcomes = {};
+    result.clients.concat(result.documents).forEach(item => { outcomes[item.ref] = item; });
+
+    const db = await syncOpenDb();
+    await syncTransaction(db, ['outbox'], 'readwrite', function(tx) {
+        const outbox = tx.objectStore('outbox');
+        entries.forEach(function(entry) {
+            const outcome = outcomes[entry.ref];
+            if (outcome && outcome.success) {
+                outbox.delete(entry.ref);
+                return;
+            }
+            // Point documents that stay queued at clients that now exist
+            const record = Object.assign({}, entry.record);
+            if (record.client_ref in clientIds) {
+                record.client_id = clientIds[record.client_ref];
+                delete record.client_ref;
+            }
+            outbox.put(Object.assign({}, entry, { record, error: outcome ? outcome.error : null }));
+        });
+    });
+    return result;
+}
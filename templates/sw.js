@@ -1,18 +1,18 @@
 // Service Worker for Business Documents Generator PWA
+// Served by the /sw.js route: the cache name changes whenever a static asset does
 
-const CACHE_NAME = 'business-docs-generator-v1';
+const CACHE_NAME = 'business-docs-generator-{{ version }}';
+
+// syncPush() for background sync
+importScripts({{ sync_script|tojson }});
 const urlsToCache = [
     '/',
     '/generate',
     '/clients',
     '/settings',
-    '/static/css/custom.css',
-    '/static/js/app.js',
-    '/static/js/document_generator.js',
-    '/static/js/currency_data.js',
-    '/static/manifest.json',
-    '/static/icons/icon-192x192.svg',
-    '/static/icons/icon-512x512.svg',
+{%- for url in static_urls %}
+    {{ url|tojson }},
+{%- endfor %}
     // External resources
     'https://cdn.replit.com/agent/bootstrap-agent-dark-theme.min.css',
     'https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.4.0/css/all.min.css',
@@ -59,6 +59,11 @@ self.addEventListener('fetch', function(event) {
         return;
     }
 
+    // The sync feed is cursor-based; a cached page would only replay old changes
+    if (event.request.url.includes('/api/sync')) {
+        return;
+    }
+
     // Skip API calls that should always go to network
     if (event.request.url.includes('/api/')) {
         event.respondWith(
@@ -81,6 +86,29 @@ self.addEventListener('fetch', function(event) {
         return;
     }
 
+    // Pages go to the network first so they are never stale while online
+    if (event.request.mode === 'navigate') {
+        event.respondWith(
+            fetch(event.request)
+                .then(function(response) {
+                    if (response.status === 200) {
+                        const responseClone = response.clone();
+                        caches.open(CACHE_NAME).then(function(cache) {
+                            cache.put(event.request, responseClone);
+                        });
+                    }
+                    return response;
+                })
+                .catch(function() {
+                    return caches.match(event.request).then(function(response) {
+                        return response || offlinePage();
+                    });
+                })
+        );
+        return;
+    }
+
+    // Static asset URLs carry a content hash, so a cached copy is always current
     event.respondWith(
         caches.match(event.request)
             .then(function(response) {
@@ -110,47 +138,52 @@ self.addEventListener('fetch', function(event) {
                     .catch(function() {
                         // If both cache and network fail, return offline page for HTML requests
                         if (event.request.headers.get('accept').includes('text/html')) {
-                            return new Response(
-                                `<!DOCTYPE html>
-                                <html lang="en" data-bs-theme="dark">
-                                <head>
-                                    <meta charset="UTF-8">
-                                    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-                                    <title>Offline - Business Document Generator</title>
-                                    <link href="https://cdn.replit.com/agent/bootstrap-agent-dark-theme.min.css" rel="stylesheet">
-                                    <link rel="stylesheet" href="https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.4.0/css/all.min.css">
-                                </head>
-                                <body class="bg-dark text-light">
-                                    <div class="container mt-5">
-                                        <div class="row justify-content-center">
-                                            <div class="col-md-6 text-center">
-                                                <i class="fas fa-wifi fa-3x text-muted mb-4"></i>
-                                                <h2>You're Offline</h2>
-                                                <p class="text-muted mb-4">
-                                                    It looks like you're not connected to the internet. 
-                                                    Some features may be limited while offline.
-                                                </p>
-                                                <button onclick="window.location.reload()" class="btn btn-primary">
-                                                    <i class="fas fa-sync-alt me-2"></i>Try Again
-                                                </button>
-                                            </div>
-                                        </div>
-                                    </div>
-                                </body>
-                                </html>`,
-                                {
-                                    headers: {
-                                        'Content-Type': 'text/html',
-                                        'Cache-Control': 'no-cache'
-                                    }
-                                }
-                            );
+                            return offlinePage();
                         }
                     });
             })
     );
 });
 
+// Offline fallback for pages that are neither online nor cached
+function offlinePage() {
+    return new Response(
+        `<!DOCTYPE html>
+        <html lang="en" data-bs-theme="dark">
+        <head>
+            <meta charset="UTF-8">
+            <meta name="viewport" content="width=device-width, initial-scale=1.0">
+            <title>Offline - Business Document Generator</title>
+            <link href="https://cdn.replit.com/agent/bootstrap-agent-dark-theme.min.css" rel="stylesheet">
+            <link rel="stylesheet" href="https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.4.0/css/all.min.css">
+        </head>
+        <body class="bg-dark text-light">
+            <div class="container mt-5">
+                <div class="row justify-content-center">
+                    <div class="col-md-6 text-center">
+                        <i class="fas fa-wifi fa-3x text-muted mb-4"></i>
+                        <h2>You're Offline</h2>
+                        <p class="text-muted mb-4">
+                            It looks like you're not connected to the internet. 
+                            Some features may be limited while offline.
+                        </p>
+                        <button onclick="window.location.reload()" class="btn btn-primary">
+                            <i class="fas fa-sync-alt me-2"></i>Try Again
+                        </button>
+                    </div>
+                </div>
+            </div>
+        </body>
+        </html>`,
+        {
+            headers: {
+                'Content-Type': 'text/html',
+                'Cache-Control': 'no-cache'
+            }
+        }
+    );
+}
+
 // Background sync for offline document creation
 self.addEventListener('sync', function(event) {
     if (event.tag === 'background-sync-documents') {
@@ -203,21 +236,14 @@ self.addEventListener('notificationclick', function(event) {
     }
 });
 
-// Sync documents when back online
+// Upload records queued offline (see static/js/sync.js)
 async function syncDocuments() {
     try {
-        // This would sync any offline-created documents
-        // Implementation would depend on offline storage strategy
         console.log('Syncing documents...');
-        
-        // Get offline documents from IndexedDB (if implemented)
-        // Send them to server
-        // Clear offline storage
-        
-        return Promise.resolve();
+        return await syncPush();
     } catch (error) {
         console.error('Document sync failed:', error);
-        return Promise.reject(error);
+        throw error;
     }
 }
 
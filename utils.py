@@ -1,15 +1,21 @@
 from flask import jsonify, make_response
 from models import BusinessSettings, Document
-from app import db
+from extensions import db
+from settings_cache import settings_cache
+from document_numbers import DocumentNumberAllocator
+import base64
 import csv
 import json
 import io
 
+# Block size is set from DOCUMENT_NUMBER_BLOCK_SIZE by create_app
+document_number_allocator = DocumentNumberAllocator()
+
 def generate_document_number(document_type):
-    """Generate document number with timestamp format: Year-Month-Day-Hour-Minute-Seconds"""
+    """Allocate a unique document number: {prefix}{Year-Month-Day}-{sequence}"""
     from datetime import datetime
     
-    business_settings = BusinessSettings.query.first()
+    business_settings = settings_cache.get()
     
     if document_type == 'invoice':
         prefix = business_settings.invoice_prefix if business_settings else 'INV-'
@@ -20,10 +26,50 @@ def generate_document_number(document_type):
     else:
         prefix = 'DOC-'
     
-    # Generate timestamp in format: Year-Month-Day-Hour-Minute-Seconds
-    timestamp = datetime.now().strftime("%Y-%m-%d-%H-%M-%S")
+    # The date is informational; uniqueness comes from the per-type sequence
+    sequence = document_number_allocator.next_value(document_type)
     
-    return f"{prefix}{timestamp}"
+    return f"{prefix}{datetime.now().strftime('%Y-%m-%d')}-{sequence:06d}"
+
+def encode_cursor(values):
+    """Opaque keyset pagination cursor for the sort key of the last row"""
+    return base64.urlsafe_b64encode(json.dumps(values, default=str).encode('utf-8')).decode('ascii')
+
+def decode_cursor(cursor):
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except (ValueError, UnicodeError):
+        raise ValueError('Invalid cursor')
+
+def parse_page_size(value, default, maximum):
+    try:
+        return max(1, min(int(value), maximum)) if value else default
+    except ValueError:
+        raise ValueError('limit must be an integer')
+
+class ZipStreamBuffer(io.RawIOBase):
+    """Write-only sink for zipfile that hands back whatever was written since the last drain"""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
 
 def export_to_csv(data):
     """Export business settings to CSV"""
@@ -54,8 +100,7 @@ def export_to_json(data):
 def import_from_csv(file):
     """Import business settings from CSV"""
     data = {}
-    content = file.read().decode('utf-8')
-    reader = csv.reader(io.StringIO(content))
+    reader = csv.reader(io.TextIOWrapper(file.stream, encoding='utf-8-sig', newline=''))
     
     # Skip header row
     next(reader, None)
@@ -76,6 +121,5 @@ def import_from_csv(file):
 
 def import_from_json(file):
     """Import business settings from JSON"""
-    content = file.read().decode('utf-8')
-    data = json.loads(content)
+    data = json.load(io.TextIOWrapper(file.stream, encoding='utf-8-sig'))
     return data
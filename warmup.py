@@ -0,0 +1,61 @@
+"""Warm a server process before it takes traffic.
+
+gunicorn.conf.py calls ``preload`` in the master after the app is loaded,
+so forked workers share what it imports, and ``warm_up`` in every worker
+before it accepts connections (on start, after a reload, and when a worker
+is replaced). Without this the first requests after a deploy pay for
+opening database connections, loading the settings and images, and
+ReportLab's font, style and code loading on top of the render itself.
+"""
+import logging
+import time
+from sqlalchemy import text
+from extensions import db
+from render_pool import WARM_UP_SPEC
+
+
+def preload(app):
+    """Import the PDF stack in the master when renders run inline in the web workers"""
+    if app.config['PDF_RENDER_WORKERS'] == 0:
+        from pdf_templates import preload_templates
+        import pdf_renderer  # noqa: F401
+        preload_templates()
+
+
+def warm_up(app, connections=1):
+    """Open ``connections`` pooled connections, prime the caches and render once; return phase seconds"""
+    from routes import build_render_spec, render_pool
+    from settings_cache import settings_cache
+
+    timings = {}
+    started = time.perf_counter()
+    with app.app_context():
+        # The master's pool must not be shared with forked workers
+        db.engine.dispose(close=False)
+        size = getattr(db.engine.pool, 'size', None)
+        opened = [db.engine.connect() for _ in range(min(connections, size()) if size else 1)]
+        for conn in opened:
+            conn.execute(text('SELECT 1'))
+            conn.close()
+        timings['database'] = _lap(timings, started)
+
+        settings = settings_cache.get()
+        spec = build_render_spec(dict(
+            WARM_UP_SPEC,
+            business_name=settings.business_name, business_email=settings.email,
+            business_phone=settings.phone, business_address=settings.address,
+            business_logo=settings.logo_url, business_signature=settings.signature_url,
+            currency_symbol=settings.currency_symbol,
+        ))
+        timings['settings_and_images'] = _lap(timings, started)
+
+        render_pool.warm_up(spec, timeout=app.config['PDF_RENDER_TIMEOUT'])
+        timings['render'] = _lap(timings, started)
+
+    logging.info(f"Warmed up in {time.perf_counter() - started:.2f}s "
+                 f"({', '.join(f'{phase} {seconds:.2f}s' for phase, seconds in timings.items())})")
+    return timings
+
+
+def _lap(timings, started):
+    return time.perf_counter() - started - sum(timings.values())